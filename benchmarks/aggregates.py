@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: a repeated dashboard of aggregates over N places.
+
+Builds N places in 1000 cities with a review each, then refreshes a
+dashboard (average price per city, review count per place) with:
+- naive: loops over storage.all() grouping by hand;
+- aggregate: storage.aggregate(), materialized by the first call and
+  then kept up to date, so that each refresh costs one step per group.
+Between two refreshes 100 places change price, as a live store would.
+
+Usage:
+    python3 benchmarks/aggregates.py [N] [ROUNDS]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.review import Review
+
+
+def naive(storage):
+    """The dashboard, by grouping every object by hand."""
+    totals, reviews = {}, {}
+    for obj in storage.all(Place).values():
+        total = totals.setdefault(obj.city_id, [0, 0])
+        total[0] += obj.price_by_night
+        total[1] += 1
+    for obj in storage.all(Review).values():
+        reviews[obj.place_id] = reviews.get(obj.place_id, 0) + 1
+    return ({city: total / count for city, (total, count) in totals.items()},
+            reviews)
+
+
+def aggregated(storage):
+    """The dashboard, from the materialized aggregates."""
+    return (storage.aggregate(Place, "avg", "price_by_night", by="city_id"),
+            storage.aggregate(Review, "count", by="place_id"))
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    FileStorage._FileStorage__file_path = os.path.join(tempfile.mkdtemp(),
+                                                       "file.json")
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    places = []
+    for i in range(count):
+        place = Place()
+        place.city_id = f"city{i % 1000}"
+        place.price_by_night = random.randrange(1000)
+        Review().place_id = place.id
+        places.append(place)
+    print(f"{storage.count()} objects")
+    start = time.perf_counter()
+    aggregated(storage)
+    print(f"{'first':>9}: {(time.perf_counter() - start) * 1000:9.3f} ms "
+          "to materialize")
+    for name, dashboard in (("naive", naive), ("aggregate", aggregated)):
+        elapsed = 0
+        for _ in range(rounds):
+            for place in random.sample(places, 100):
+                place.price_by_night = random.randrange(1000)
+            start = time.perf_counter()
+            averages, reviews = dashboard(storage)
+            elapsed += time.perf_counter() - start
+        print(f"{name:>9}: {elapsed / rounds * 1000:9.3f} ms per refresh "
+              f"({len(averages)} cities, {len(reviews)} places)")
+    assert naive(storage) == aggregated(storage)
+
+
+if __name__ == "__main__":
+    main()
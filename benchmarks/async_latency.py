@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: request latency of an async service under concurrent load.
+
+CLIENTS coroutines each run REQUESTS requests against a store of N
+places; a request reads a place, renames it and saves. Requests are
+served:
+- blocking: storage.get() and storage.save() called on the event loop;
+- async: through AsyncStorage, which runs them on a storage thread and
+  coalesces the concurrent saves.
+
+Prints the latency percentiles of the requests (from when they are
+issued, so including the time spent waiting for the event loop), the
+throughput, and the longest stall of the loop, seen by a 1 ms ticker.
+Stalls of the async run come from the attribute changes waiting for a
+save to encode the store; use a large N for writes that take long.
+
+Usage:
+    python3 benchmarks/async_latency.py [N] [CLIENTS] [REQUESTS]
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.async_storage import AsyncStorage
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+async def ticker(stalls, done):
+    """Records how late each 1 ms sleep wakes up."""
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stalls.append(time.perf_counter() - start - 0.001)
+
+
+async def run(clients, requests, ids, handle):
+    """Runs the clients; returns latencies, total time and loop stalls."""
+    latencies, stalls = [], []
+    done = asyncio.Event()
+    watcher = asyncio.ensure_future(ticker(stalls, done))
+
+    async def client():
+        for _ in range(requests):
+            start = time.perf_counter()
+            # Issued now, served once the loop gets to it
+            await asyncio.sleep(0)
+            await handle(random.choice(ids))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await watcher
+    return latencies, elapsed, max(stalls, default=0)
+
+
+async def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    ids = [Place().id for _ in range(count)]
+    storage.save()
+
+    async def blocking(place_id):
+        place = storage.get(Place, place_id)
+        place.name = "renamed"
+        storage.save()
+
+    async def facaded(place_id):
+        place = await facade.aget(Place, place_id)
+        place.name = "renamed"
+        await facade.asave()
+
+    results = [("blocking", await run(clients, requests, ids, blocking))]
+    facade = AsyncStorage(storage)
+    results.append(("async", await run(clients, requests, ids, facaded)))
+    await facade.aclose()
+    total = clients * requests
+    for name, (latencies, elapsed, stall) in results:
+        latencies.sort()
+        p50 = statistics.median(latencies)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{name:>8}: p50 {p50 * 1000:7.1f} ms, p99 "
+              f"{p99 * 1000:7.1f} ms, {total / elapsed:7.0f} req/s, "
+              f"loop stalled up to {stall * 1000:6.1f} ms")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: cost of crash-safe saves.
+
+Compares save() on a store of N objects whose encodings are already
+cached, writing:
+- in place: the previous path, truncating file.json and writing it;
+- atomic: temp file and rename, without fsync;
+- atomic + fsync: the default save();
+- batch of 100: 100 save() calls grouped by begin()/commit().
+
+Usage:
+    python3 benchmarks/atomic_save.py [N] [ROUNDS]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine import file_storage
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.user import User
+
+
+def write_in_place(files, fsync=True):
+    """The unsafe write save() did before: truncate, then write."""
+    for path, data in files.items():
+        with open(path, "wb") as file:
+            file.write(data)
+
+
+def timed(rounds, function):
+    """Returns the mean time of function over rounds calls."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    for i in range(count):
+        (Place, User)[i % 2]()
+    storage.save()
+
+    def batch():
+        with storage.batch():
+            for _ in range(100):
+                storage.save()
+
+    atomic = file_storage.write_files
+    file_storage.write_files = write_in_place
+    results = [("in place", timed(rounds, storage.save))]
+    file_storage.write_files = atomic
+    storage.disable_fsync()
+    results.append(("atomic", timed(rounds, storage.save)))
+    storage.enable_fsync()
+    results.append(("atomic + fsync", timed(rounds, storage.save)))
+    results.append(("batch of 100", timed(rounds, batch)))
+    size = os.path.getsize(path) / 1e6
+    for name, elapsed in results:
+        print(f"{name:>15}: {elapsed * 1000:8.1f} ms per write "
+              f"({size:.1f} MB)")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: memory held per 100k objects, regular versus compact
+(__slots__-backed) instances built from the same records.
+
+to_dict() is called on every instance, as save() does, so regular
+instances have materialized their __dict__. Attribute values are shared
+between both runs, so the figures measure the instances themselves.
+
+Usage:
+    python3 benchmarks/compact_models.py [N]
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.compact import compact_model
+from models.place import Place
+from models.review import Review
+from models.user import User
+
+
+def measure(model, records):
+    """Returns the bytes held by instances of model built from records."""
+    gc.collect()
+    tracemalloc.start()
+    instances = [model(**record) for record in records]
+    for obj in instances:
+        obj.to_dict()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del instances
+    return current
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    fields = {
+            Review: {"place_id": "place", "user_id": "user", "text": "ok"},
+            Place: {"city_id": "city", "user_id": "user", "name": "loft",
+                    "max_guest": 4, "price_by_night": 80},
+            User: {"email": "a@b.c", "first_name": "Ada"},
+    }
+    for model, values in fields.items():
+        records = []
+        for i in range(count):
+            record = {"id": str(i), "created_at": "2024-01-01T00:00:00.000001",
+                      "updated_at": "2024-01-01T00:00:00.000002",
+                      "__class__": model.__name__}
+            record.update(values)
+            records.append(record)
+        regular = measure(model, records)
+        compact = measure(compact_model(model), records)
+        scale = 100000 / count / 1e6
+        print(f"{model.__name__:>7}: regular {regular * scale:6.1f} MB, "
+              f"compact {compact * scale:6.1f} MB per 100k")
+
+
+if __name__ == "__main__":
+    main()
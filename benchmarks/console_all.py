@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: time to first row and peak memory of the console all command.
+
+Builds N places and prints them all to a sink that only counts what it
+is written, with:
+- list: the list of every string representation, built then printed,
+  as the command used to;
+- stream: the all command, which formats and prints one at a time;
+- json: the all command printing JSON lines (--json).
+
+Prints the time to the first row, the total time, and the peak memory
+allocated while printing (tracemalloc, in a second run).
+
+Usage:
+    python3 benchmarks/console_all.py [N]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from console import HBNBCommand
+from models import storage
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+class Sink:
+    """Counts the characters written, and when the first one was."""
+
+    def __init__(self):
+        """Starts the clock."""
+        self.start = time.perf_counter()
+        self.first = None
+        self.size = 0
+
+    def write(self, text):
+        """Counts text."""
+        if self.first is None:
+            self.first = time.perf_counter() - self.start
+        self.size += len(text)
+
+    def flush(self):
+        """Nothing to flush."""
+
+
+def as_list():
+    """Prints the places as the all command used to."""
+    print([str(obj) for obj in storage.all("Place").values()])
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    FileStorage._FileStorage__file_path = os.path.join(tempfile.mkdtemp(),
+                                                       "file.json")
+    FileStorage._FileStorage__objects = {}
+    for _ in range(count):
+        Place().description = "x" * 200
+    console = HBNBCommand()
+    print(f"{storage.count()} places")
+    for name, run in (("list", as_list),
+                      ("stream", lambda: console.do_all("Place")),
+                      ("json", lambda: console.do_all("Place --json"))):
+        sink = Sink()
+        with redirect_stdout(sink):
+            run()
+        elapsed = time.perf_counter() - sink.start
+        tracemalloc.start()
+        with redirect_stdout(Sink()):
+            run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:>6}: first row {sink.first * 1000:9.3f} ms, total "
+              f"{elapsed:6.2f} s, {sink.size / 2 ** 20:6.0f} MiB printed, "
+              f"peak {peak / 2 ** 20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
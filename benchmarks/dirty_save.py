@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: save() after updating one object, with the per-object encoding
+cache (only the changed object is re-encoded) and with the cache dropped
+before each save (every object re-encoded, as save() used to do).
+
+Usage:
+    python3 benchmarks/dirty_save.py [N]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.review import Review
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = 5
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    reviews = [Review() for _ in range(count)]
+    storage.save()
+
+    for cached in (False, True):
+        elapsed = 0
+        for i in range(rounds):
+            reviews[i].text = f"update {i}"
+            if not cached:
+                FileStorage._FileStorage__encoded = {}
+            start = time.perf_counter()
+            storage.save()
+            elapsed += time.perf_counter() - start
+        label = "cached encodings" if cached else "full re-encode  "
+        print(f"{label}: {elapsed / rounds * 1000:8.1f} ms per save "
+              f"({count} objects, 1 changed)")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
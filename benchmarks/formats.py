@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: snapshot size, save and reload time per storage format.
+
+Usage:
+    python3 benchmarks/formats.py [N]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.engine.formats import FORMATS
+from models.place import Place
+from models.review import Review
+from models.user import User
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+
+    models = (Place, Review, User)
+    for i in range(count):
+        models[i % len(models)]()
+
+    for name in FORMATS:
+        storage.set_format(name)
+        start = time.perf_counter()
+        storage.save()
+        saved = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        FileStorage._FileStorage__objects = {}
+        start = time.perf_counter()
+        storage.reload(lazy=True)
+        decoded = time.perf_counter() - start
+        storage.all()
+        print(f"{name:>12}: {size / 1e6:7.2f} MB  save {saved * 1000:7.1f} ms"
+              f"  decode {decoded * 1000:7.1f} ms  ({count} objects)")
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: eager versus lazy FileStorage.reload().
+
+Writes a store of N Place/Review/User objects to a temporary file, then
+times a full reload against a lazy one, and the first show-style get()
+after the lazy reload.
+
+Usage:
+    python3 benchmarks/lazy_reload.py [N]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.review import Review
+from models.user import User
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+
+    models = (Place, Review, User)
+    for i in range(count):
+        models[i % len(models)]()
+    probe = next(iter(storage.all(Review).values()))
+    storage.save()
+
+    for lazy in (False, True):
+        FileStorage._FileStorage__objects = {}
+        start = time.perf_counter()
+        storage.reload(lazy=lazy)
+        elapsed = time.perf_counter() - start
+        print(f"reload lazy={lazy}: {elapsed * 1000:.1f} ms "
+              f"for {count} objects")
+
+    start = time.perf_counter()
+    storage.get(Review, probe.id)
+    print(f"first get after lazy reload: "
+          f"{(time.perf_counter() - start) * 1000:.3f} ms")
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
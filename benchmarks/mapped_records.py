@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: lazy reload of a compact JSON store versus a memory-mapped
+records store, each followed by a show-style get() and a count().
+
+Usage:
+    python3 benchmarks/mapped_records.py [N]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.review import Review
+from models.user import User
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+
+    models = (Place, Review, User)
+    for i in range(count):
+        models[i % len(models)]()
+    probe = next(iter(storage.all(Review).values()))
+
+    for name in ("compact-json", "records"):
+        storage.migrate(name)
+        FileStorage._FileStorage__objects = {}
+        start = time.perf_counter()
+        storage.reload(lazy=True)
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        storage.get(Review, probe.id)
+        fetched = time.perf_counter() - start
+        start = time.perf_counter()
+        storage.count(Review)
+        counted = time.perf_counter() - start
+        print(f"{name:>12}: reload {loaded * 1000:8.1f} ms, "
+              f"get {fetched * 1000:.3f} ms, count {counted * 1000:.3f} ms")
+
+    storage.reload(lazy=False)
+    for suffix in ("", ".idx"):
+        os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: reload() time against dataset size and worker count.
+
+For stores of N/4, N/2 and N Place/Review/User objects, in the JSON and
+records formats, times a full reload decoded in this process (0
+workers) and across pools of 2, 4 and one worker per CPU.
+
+The gain depends on the cores available: the parent still builds every
+instance, and the decoded records are sent back through pickles.
+
+Usage:
+    python3 benchmarks/parallel_reload.py [N]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.review import Review
+from models.user import User
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    storage = FileStorage()
+    storage.disable_fsync()
+    worker_counts = sorted({0, 2, 4, os.cpu_count() or 1})
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'objects':>8} {'format':>8} " +
+          " ".join(f"{workers:>5} workers" for workers in worker_counts))
+    models = (Place, Review, User)
+    for size in (count // 4, count // 2, count):
+        FileStorage._FileStorage__objects = {}
+        for i in range(size):
+            models[i % len(models)]()
+        for name in ("json", "records"):
+            storage.migrate(name)
+            times = []
+            for workers in worker_counts:
+                storage.enable_parallel_reload(workers)
+                FileStorage._FileStorage__objects = {}
+                start = time.perf_counter()
+                storage.reload()
+                times.append(time.perf_counter() - start)
+            print(f"{size:>8} {name:>8} " +
+                  " ".join(f"{elapsed * 1000:>10.0f} ms"
+                           for elapsed in times))
+    storage.disable_parallel_reload()
+    for leftover in (path, path + ".idx"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: "places under $X with at least N guests in a bounding box",
+as a loop over Place objects versus storage.filter() over the columns.
+
+Usage:
+    python3 benchmarks/place_columns.py [N]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine import columns
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    rand = random.Random(0)
+    for _ in range(count):
+        place = Place()
+        place.price_by_night = rand.randint(20, 500)
+        place.max_guest = rand.randint(1, 10)
+        place.latitude = rand.uniform(-90, 90)
+        place.longitude = rand.uniform(-180, 180)
+
+    start = time.perf_counter()
+    looped = [obj.id for obj in storage.all(Place).values()
+              if obj.price_by_night <= 100 and obj.max_guest >= 4 and
+              -10 <= obj.latitude <= 30 and 0 <= obj.longitude <= 60]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    filtered = storage.filter(Place, price_by_night=(None, 100),
+                              max_guest=(4, None), latitude=(-10, 30),
+                              longitude=(0, 60))
+    filter_time = time.perf_counter() - start
+
+    assert sorted(looped) == sorted(filtered)
+    backend = "numpy" if columns.numpy is not None else "array loop"
+    print(f"object loop:       {loop_time * 1000:8.2f} ms")
+    print(f"columns ({backend}): {filter_time * 1000:8.2f} ms"
+          f"  ({len(filtered)} of {count} places)")
+
+
+if __name__ == "__main__":
+    main()
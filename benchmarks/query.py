@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: filtered, ordered pages of places against sorting all().
+
+Builds N places in 100 cities, then fetches, cheapest first:
+- the third page of 20 places under 100 a night, answered by the price
+  column when NumPy is installed, by a scan otherwise;
+- the first page of 20 places of one city, answered by the city_id
+  index;
+with a scan of storage.all() and a sort of every match (naive), and
+with storage.query(), which keeps only the page and those before it in
+a heap.
+
+Usage:
+    python3 benchmarks/query.py [N] [ROUNDS]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def naive_price(storage):
+    """Third page of cheap places, by sorting every match."""
+    matches = [obj for obj in storage.all(Place).values()
+               if obj.price_by_night < 100]
+    matches.sort(key=lambda obj: obj.price_by_night)
+    return matches[40:60]
+
+
+def query_price(storage):
+    """Third page of cheap places, through storage.query()."""
+    return (storage.query(Place).where(price_by_night__lt=100)
+            .order_by("price_by_night").limit(20).offset(40).all())
+
+
+def naive_city(storage):
+    """First page of the places of a city, by sorting every match."""
+    matches = [obj for obj in storage.all(Place).values()
+               if obj.city_id == "city7"]
+    matches.sort(key=lambda obj: obj.price_by_night)
+    return matches[:20]
+
+
+def query_city(storage):
+    """First page of the places of a city, through storage.query()."""
+    return (storage.query(Place).where(city_id="city7")
+            .order_by("price_by_night").limit(20).all())
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    FileStorage._FileStorage__file_path = os.path.join(tempfile.mkdtemp(),
+                                                       "file.json")
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    for i in range(count):
+        place = Place()
+        place.price_by_night = random.randrange(1000)
+        place.city_id = f"city{i % 100}"
+    print(f"{storage.count()} places")
+    for page, naive, query in (("price", naive_price, query_price),
+                               ("city", naive_city, query_city)):
+        expected = [obj.price_by_night for obj in naive(storage)]
+        assert [obj.price_by_night for obj in query(storage)] == expected
+        for name, run in (("naive", naive), ("query", query)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                run(storage)
+            elapsed = (time.perf_counter() - start) / rounds
+            print(f"{page:>5} {name:>5}: {elapsed * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: relationship accessors against scans of storage.all().
+
+Builds STATES states of 10 cities each, 10 places per city and 5
+reviews per place, then answers "all reviews for places in one state":
+- naive: the nested scans of storage.all() the id strings required;
+- accessors: state.cities, city.places and place.reviews, answered by
+  the reverse-reference indexes FileStorage maintains.
+
+Usage:
+    python3 benchmarks/relationships.py [STATES] [ROUNDS]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.state import State
+
+
+def naive(storage, state):
+    """Reviews of the places of state, by scanning every object."""
+    objects = storage.all().values()
+    city_ids = {obj.id for obj in objects
+                if isinstance(obj, City) and obj.state_id == state.id}
+    place_ids = {obj.id for obj in objects
+                 if isinstance(obj, Place) and obj.city_id in city_ids}
+    return [obj for obj in objects
+            if isinstance(obj, Review) and obj.place_id in place_ids]
+
+
+def accessors(storage, state):
+    """Reviews of the places of state, through the accessors."""
+    return [review for city in state.cities for place in city.places
+            for review in place.reviews]
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    FileStorage._FileStorage__file_path = os.path.join(tempfile.mkdtemp(),
+                                                       "file.json")
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    states = [State() for _ in range(count)]
+    for state in states:
+        for _ in range(10):
+            city = City()
+            city.state_id = state.id
+            for _ in range(10):
+                place = Place()
+                place.city_id = city.id
+                for _ in range(5):
+                    Review().place_id = place.id
+    print(f"{storage.count()} objects")
+    probe = states[len(states) // 2]
+    expected = sorted(review.id for review in naive(storage, probe))
+    for name, query in (("naive", naive), ("accessors", accessors)):
+        assert sorted(review.id for review in query(storage, probe)) \
+            == expected
+        start = time.perf_counter()
+        for _ in range(rounds):
+            query(storage, probe)
+        elapsed = (time.perf_counter() - start) / rounds
+        print(f"{name:>10}: {elapsed * 1000:8.3f} ms for "
+              f"{len(expected)} reviews")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: full-text search over N reviews.
+
+Builds N reviews of 10 to 40 words drawn from a Zipf-like vocabulary,
+then times:
+- build: the first search, which indexes every review;
+- naive: a scan of storage.all() for reviews containing every term;
+- search: BM25-ranked searches of the top 10, on the built index;
+- save: saving one edited review once the index is built, which leaves
+  the index to compact();
+- restore: the first search after a reload, from the index saved next
+  to the storage file by compact().
+
+Usage:
+    python3 benchmarks/search.py [N] [ROUNDS]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import accumulate
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.engine.search import tokenize
+from models.review import Review
+
+WORDS = [f"word{i}" for i in range(20000)]
+# Cumulative Zipf weights, so that random.choices() does not sum them
+# again for every review
+CUM_WEIGHTS = list(accumulate(1 / (rank + 1) for rank in range(len(WORDS))))
+QUERIES = ["word50 word900", "word7 word3000 word12000", "word150",
+           "word2 word19999"]
+
+
+def naive(storage, text):
+    """Ids of the reviews containing every term, by scanning them all."""
+    terms = set(tokenize(text))
+    return [obj.id for obj in storage.all(Review).values()
+            if terms.issubset(tokenize(obj.text))]
+
+
+def timed(function, *args):
+    """Returns the result of function and the seconds it took."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    storage.disable_fsync()
+    random.seed(0)
+    for _ in range(count):
+        Review().text = " ".join(random.choices(
+            WORDS, cum_weights=CUM_WEIGHTS, k=random.randint(10, 40)))
+    print(f"{storage.count()} reviews")
+    _, elapsed = timed(storage.search, Review, "word1")
+    print(f"{'build':>8}: {elapsed:9.3f} s")
+    for name, run in (("naive", naive), ("search", storage.search)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in QUERIES:
+                if name == "search":
+                    run(Review, text, 10)
+                else:
+                    run(storage, text)
+        elapsed = (time.perf_counter() - start) / rounds / len(QUERIES)
+        print(f"{name:>8}: {elapsed * 1000:9.3f} ms per query")
+    storage.compact()
+    review = next(iter(storage.all(Review).values()))
+    review.text = "word1 word2"
+    _, elapsed = timed(review.save)
+    print(f"{'save':>8}: {elapsed * 1000:9.3f} ms")
+    FileStorage._FileStorage__objects = {}
+    storage.reload()
+    _, elapsed = timed(storage.search, Review, "word1")
+    print(f"{'restore':>8}: {elapsed:9.3f} s")
+    for leftover in (path, path + ".Review.search"):
+        os.remove(leftover)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: save() after updating one Review, and lazy startup up to the
+first `count User`, in the single-file and sharded layouts.
+
+Usage:
+    python3 benchmarks/sharded_save.py [N] [BUCKETS]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.review import Review
+from models.user import User
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    buckets = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    storage.set_format("compact-json")
+    for i in range(count):
+        (Review, Review, Place, User)[i % 4]()
+    storage.save()
+
+    for layout in ("single file", f"{buckets} buckets"):
+        if layout != "single file":
+            storage.enable_sharding(buckets)
+        review = next(iter(storage.all(Review).values()))
+        start = time.perf_counter()
+        for i in range(5):
+            review.text = f"update {i}"
+            review.save()
+        saved = (time.perf_counter() - start) / 5
+
+        FileStorage._FileStorage__objects = {}
+        start = time.perf_counter()
+        storage.reload(lazy=True)
+        storage.count(User)
+        started = time.perf_counter() - start
+        storage.reload(lazy=False)
+        print(f"{layout:>12}: save {saved * 1000:7.1f} ms, "
+              f"lazy startup + count User {started * 1000:7.1f} ms")
+    storage.disable_sharding()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
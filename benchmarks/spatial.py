@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: nearby() and within() on the Place grid index versus a full
+scan of storage.all(), at 1M places by default.
+
+Usage:
+    python3 benchmarks/spatial.py [N]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.engine.spatial import haversine
+from models.place import Place
+
+
+def timed(function, *args):
+    """Returns (result, milliseconds) of function(*args)."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    rand = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(count):
+        place = Place()
+        place.latitude = rand.uniform(-60, 70)
+        place.longitude = rand.uniform(-180, 180)
+    print(f"built {count} indexed places in "
+          f"{time.perf_counter() - start:.1f} s")
+
+    def scan_nearby(lat, lon, radius):
+        return [obj.id for obj in storage.all(Place).values()
+                if haversine(lat, lon, obj.latitude, obj.longitude) <= radius]
+
+    def scan_within(min_lat, min_lon, max_lat, max_lon):
+        return [obj.id for obj in storage.all(Place).values()
+                if min_lat <= obj.latitude <= max_lat and
+                min_lon <= obj.longitude <= max_lon]
+
+    found, indexed = timed(storage.nearby, 48.85, 2.35, 100)
+    scanned, scan = timed(scan_nearby, 48.85, 2.35, 100)
+    assert sorted(place_id for place_id, _ in found) == sorted(scanned)
+    print(f"nearby 100 km: index {indexed:9.2f} ms, scan {scan:9.2f} ms "
+          f"({len(found)} places)")
+
+    found, indexed = timed(storage.within, 40, -10, 50, 10)
+    scanned, scan = timed(scan_within, 40, -10, 50, 10)
+    assert sorted(found) == sorted(scanned)
+    print(f"within box:    index {indexed:9.2f} ms, scan {scan:9.2f} ms "
+          f"({len(found)} places)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: peak memory of reload() on a large JSON store.
+
+Writes a JSON store of about SIZE_MB megabytes of Place records, then
+reloads it, eagerly and lazily, each time in a fresh process, with:
+- whole: the document decoded at once (json.loads), as before;
+- streamed: one record read and built at a time, the default.
+
+Prints the reload time, the memory held once reloaded, and the peak
+memory (maximum resident set size) of each process. Reloading 1 GB
+eagerly needs several GB of memory for the instances alone.
+
+Usage:
+    python3 benchmarks/streaming_reload.py [SIZE_MB]
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine import formats
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def write_store(path, size):
+    """Writes about size bytes of Place records as a JSON store."""
+    fmt = formats.get_format("json")
+    record = Place().to_dict()
+    record["description"] = "x" * 400
+    written = 0
+    with open(path, "wb") as file:
+        file.write(b"{\n")
+        separator = b""
+        while written < size:
+            record["id"] = str(uuid.uuid4())
+            fragment = (fmt.fragment(f"Place.{record['id']}", record)
+                        .encode("utf-8"))
+            file.write(separator + fragment)
+            separator = b",\n"
+            written += len(fragment) + 2
+        file.write(b"\n}")
+
+
+def child(path, mode, lazy):
+    """Reloads path in this process and prints the results as JSON."""
+    if mode == "whole":
+        formats.JSONFormat.stream = formats.Format.stream
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    start = time.perf_counter()
+    storage.reload(lazy=lazy)
+    elapsed = time.perf_counter() - start
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Both in MiB: ru_maxrss is in KiB
+    print(json.dumps({"elapsed": elapsed, "count": storage.count(),
+                      "resident": pages * os.sysconf("SC_PAGESIZE") / 2 ** 20,
+                      "peak": peak / 2 ** 10}))
+
+
+def main():
+    """Runs the benchmark."""
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2], sys.argv[3], sys.argv[4] == "lazy")
+        return
+    size = int(float(sys.argv[1] if len(sys.argv) > 1 else 1024) * 1e6)
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    write_store(path, size)
+    print(f"{os.path.getsize(path) / 1e6:.0f} MB store")
+    for lazy in ("eager", "lazy"):
+        for mode in ("whole", "streamed"):
+            output = subprocess.run(
+                    [sys.executable, __file__, "--child", path, mode, lazy],
+                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            print(f"{lazy:>5} {mode:>8}: {result['elapsed']:6.1f} s, "
+                  f"{result['count']} objects, "
+                  f"held {result['resident']:7.0f} MiB, "
+                  f"peak {result['peak']:7.0f} MiB")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
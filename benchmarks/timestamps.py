@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+
+"""
+Benchmark: timestamp parsing and reload throughput.
+
+Compares the strptime() parsing BaseModel used to do with the
+fromisoformat() path it uses now, then measures end-to-end reload
+throughput of the current code.
+
+Usage:
+    python3 benchmarks/timestamps.py [N]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+from models.engine.file_storage import FileStorage
+from models.review import Review
+
+
+def main():
+    """Runs the benchmark."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    stamps = [datetime.now().isoformat() for _ in range(count)]
+
+    start = time.perf_counter()
+    for stamp in stamps:
+        datetime.strptime(stamp, '%Y-%m-%dT%H:%M:%S.%f')
+    before = time.perf_counter() - start
+    start = time.perf_counter()
+    for stamp in stamps:
+        datetime.fromisoformat(stamp)
+    after = time.perf_counter() - start
+    print(f"strptime:      {count / before:12,.0f} timestamps/s")
+    print(f"fromisoformat: {count / after:12,.0f} timestamps/s")
+
+    path = os.path.join(tempfile.mkdtemp(), "file.json")
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    for _ in range(count):
+        Review()
+    start = time.perf_counter()
+    storage.save()
+    saved = time.perf_counter() - start
+    FileStorage._FileStorage__objects = {}
+    start = time.perf_counter()
+    storage.reload()
+    loaded = time.perf_counter() - start
+    print(f"save:   {count / saved:12,.0f} objects/s")
+    print(f"reload: {count / loaded:12,.0f} objects/s")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
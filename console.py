@@ -33,11 +33,13 @@ Quit command to exit the console
 example@user:/AirBnB_clone$
 """
 
+import ast
 import cmd
 import json
+import re
 import shlex
+from itertools import islice
 from models import storage
-from models.engine.file_storage import FileStorage
 from models.base_model import BaseModel
 from models.user import User
 from models.place import Place
@@ -45,6 +47,21 @@ from models.state import State
 from models.city import City
 from models.amenity import Amenity
 from models.review import Review
+from models.engine.aggregates import AGGREGATES
+from models.engine.locking import ConflictError
+from models.engine.search import TEXT_ATTRIBUTES
+
+# <class_name>.where(...) and the other query chains, see help where
+QUERY_SYNTAX = re.compile(r"\s*\w+\.(where|order_by|limit|offset)\(")
+QUERY_METHODS = ("where", "order_by", "limit", "offset")
+# <class_name>.avg("<name>", by="<name>") and the other aggregates;
+# count() without arguments is the count command
+AGGREGATE_SYNTAX = re.compile(
+        r"\s*\w+\.(sum|avg|min|max)\(|\s*\w+\.count\(\s*[^\s)]")
+# Instances per page of the all command's --page option
+PAGE_SIZE = 20
+# Instances printed by the search command unless it is given a limit
+SEARCH_LIMIT = 10
 
 
 class HBNBCommand(cmd.Cmd):
@@ -67,6 +84,8 @@ class HBNBCommand(cmd.Cmd):
     help_EOF(self): Provides information about the EOF command.
     emptyline(self): Upon encountering blank line + `Enter` key, does nothing.
     precmd(self, line): Preprocesses each command line before execution.
+    onecmd(self, line): Runs a command, reporting changes lost to another
+    process.
     do_help(self, args): Custom handling for the help command.
     help_help(self): Provides information about the help command.
     do_create(self, args): Creates a new instance of a specified class.
@@ -78,10 +97,33 @@ class HBNBCommand(cmd.Cmd):
     (save the change into the JSON file).
     help_destroy(self): Provides information about the destroy command.
     do_all(self, args): Prints all string representation of all instances based
-    or not on the class name.
+    or not on the class name, streamed, optionally paginated or as JSON lines.
+    __all_options(self, args): Parses the options of the all command.
     help_all(self): Provides information about the all command.
     do_update(self, args): Updates an instance based on the class name and id.
     help_update(self): Displays information about the update command.
+    do_begin(self, args): Starts a batch deferring saves until commit.
+    help_begin(self): Provides information about the begin command.
+    do_commit(self, args): Ends a batch, writing its changes once.
+    help_commit(self): Provides information about the commit command.
+    do_migrate(self, args): Rewrites the storage file in another format.
+    help_migrate(self): Provides information about the migrate command.
+    do_shard(self, args): Switches the storage between the single file
+    and the sharded layout.
+    help_shard(self): Provides information about the shard command.
+    do_nearby(self, args): Prints the places within a radius of a point.
+    help_nearby(self): Provides information about the nearby command.
+    do_within(self, args): Prints the places inside a bounding box.
+    help_within(self): Provides information about the within command.
+    do_search(self, args): Prints the instances whose text matches search
+    terms, best first.
+    help_search(self): Provides information about the search command.
+    __calls(self, line, methods): Parses a <class_name>.<method>(...)
+    chain.
+    __query(self, line): Runs a <class_name>.where(...) query chain.
+    __aggregate(self, line): Runs a <class_name>.avg(...) aggregate.
+    help_aggregate(self): Provides information about the aggregate syntax.
+    help_where(self): Provides information about the where query syntax.
     """
 
     prompt = ("(hbnb) ")
@@ -95,17 +137,33 @@ class HBNBCommand(cmd.Cmd):
             'Review': Review,
             }
 
+    def onecmd(self, line):
+        '''
+            Runs a command; a save that conflicts with another process
+            keeps the other process's version and is reported.
+        '''
+        try:
+            return super().onecmd(line)
+        except ConflictError as error:
+            print("** conflict: {} **".format(error))
+
     def do_quit(self, args):
         '''
             Quit command to exit the program.
         '''
+        while True:
+            try:
+                if not storage.commit():
+                    break
+            except ConflictError as error:
+                print("** conflict: {} **".format(error))
         return True
 
     def do_EOF(self, args):
         '''
             Exits after receiving the EOF signal.
         '''
-        return True
+        return self.do_quit(args)
 
     def do_create(self, args):
         '''
@@ -143,21 +201,17 @@ class HBNBCommand(cmd.Cmd):
         if len(args) == 1:
             print("** instance id missing **")
             return
-        storage = FileStorage()
-        storage.reload()
-        obj_dict = storage.all()
+        storage.refresh()
         try:
             eval(args[0])
         except NameError:
             print("** class doesn't exist **")
             return
-        key = args[0] + "." + args[1]
-        key = args[0] + "." + args[1]
-        try:
-            value = obj_dict[key]
-            print(value)
-        except KeyError:
+        value = storage.get(args[0], args[1])
+        if value is None:
             print("** no instance found **")
+            return
+        print(value)
 
     def help_show(self):
         """
@@ -180,19 +234,17 @@ class name and id.\n")
             return
         class_name = args[0]
         class_id = args[1]
-        storage = FileStorage()
-        storage.reload()
-        obj_dict = storage.all()
+        storage.refresh()
         try:
             eval(class_name)
         except NameError:
             print("** class doesn't exist **")
             return
-        key = class_name + "." + class_id
-        try:
-            del obj_dict[key]
-        except KeyError:
+        obj = storage.get(class_name, class_id)
+        if obj is None:
             print("** no instance found **")
+        else:
+            storage.delete(obj)
         storage.save()
 
     def help_destroy(self):
@@ -207,28 +259,86 @@ class name and id.\n")
         Prints all string representation of all instances based or not on the
         class name.
 
-        Usage: all <class_name>
+        Usage: all [<class_name>] [--limit <n>] [--offset <n>] [--page <n>]
+        [--json]
+
+        The instances are formatted and printed one at a time, as the
+        storage yields them, so the first ones appear at once and memory
+        does not grow with the store.
+        - --limit prints at most n instances, --offset skips the first n.
+        - --page prints the nth page (from 1) of --limit instances, 20 by
+        default.
+        - --json prints one JSON object (the to_dict() of an instance) per
+        line instead of the list of string representations.
         """
-        objects = storage.all()
-        if not args:
-            print([str(obj) for obj in objects.values()])
+        options = self.__all_options(args)
+        if options is None:
             return
-
-        class_name = args.split()[0]
-        if class_name not in self.class_mapping:
-            print('** class doesn\'t exist **')
+        class_name, offset, limit, json_lines = options
+        storage.refresh()
+        stop = None if limit is None else offset + limit
+        objects = islice(storage.all(class_name).values(), offset, stop)
+        if json_lines:
+            for obj in objects:
+                print(json.dumps(obj.to_dict()))
             return
-
-        print([str(obj) for key, obj in objects.items() if key.split('.')[0]
-              == class_name])
+        # The same output as printing the whole list, written item by item
+        separator = "["
+        for obj in objects:
+            print(separator + repr(str(obj)), end="")
+            separator = ", "
+        print("[]" if separator == "[" else "]")
+
+    def __all_options(self, args):
+        '''
+            Parses the arguments of the all command; returns (class_name,
+            offset, limit, json_lines), or None after printing an error.
+        '''
+        class_name, json_lines = None, False
+        numbers = {"--limit": None, "--offset": 0, "--page": None}
+        tokens = args.split()
+        while tokens:
+            token = tokens.pop(0)
+            option, equals, value = token.partition("=")
+            if option in numbers:
+                if not equals:
+                    value = tokens.pop(0) if tokens else ""
+                if not value.isdigit():
+                    print("** {} requires a number **".format(option))
+                    return None
+                numbers[option] = int(value)
+            elif token == "--json":
+                json_lines = True
+            elif token.startswith("--"):
+                print("** unknown option: {} **".format(token))
+                return None
+            elif class_name is None:
+                if token not in self.class_mapping:
+                    print('** class doesn\'t exist **')
+                    return None
+                class_name = token
+        offset, limit, page = (numbers["--offset"], numbers["--limit"],
+                               numbers["--page"])
+        if page is not None:
+            if page < 1:
+                print("** pages are numbered from 1 **")
+                return None
+            if limit is None:
+                limit = PAGE_SIZE
+            offset += (page - 1) * limit
+        return class_name, offset, limit, json_lines
 
     def help_all(self):
         """
         Provides information about the all command.
         """
         print("Prints all string representation of all instances based or not\
-on the class name.\n")
-        print("Usage: all <class_name>\n")
+ on the class name, one page at a time if asked.\n")
+        print("Usage: all [<class_name>] [--limit <n>] [--offset <n>]\
+ [--page <n>] [--json]")
+        print("--page: the nth page (from 1) of --limit instances, {} by\
+ default".format(PAGE_SIZE))
+        print("--json: one JSON object per line\n")
 
     def do_update(self, args):
         """
@@ -249,8 +359,7 @@ on the class name.\n")
         - Only simple arguments (string, integer, float) can be updated.
         - Attributes 'id', 'created_at', and 'updated_at' cannot be updated.
         """
-        storage = FileStorage()
-        storage.reload()
+        storage.refresh()
         args = shlex.split(args)
         if len(args) == 0:
             print("** class name missing **")
@@ -269,11 +378,8 @@ on the class name.\n")
         except NameError:
             print("** class doesn't exist **")
             return
-        key = args[0] + "." + args[1]
-        obj_dict = storage.all()
-        try:
-            obj_value = obj_dict[key]
-        except KeyError:
+        obj_value = storage.get(args[0], args[1])
+        if obj_value is None:
             print("** no instance found **")
             return
         try:
@@ -304,6 +410,207 @@ on the class name.\n")
         print("Updates an instance's attribute based on class name and id.\n\
 \nUsage: update <class name> <id> <attribute name> <attribute value>.\n")
 
+    def do_begin(self, args):
+        """
+        Starts a batch: saves are deferred until the matching commit.
+
+        Usage: begin [<max_saves>]
+        """
+        args = args.split()
+        try:
+            max_saves = int(args[0]) if args else None
+        except ValueError:
+            print("** max_saves must be an integer **")
+            return
+        storage.begin(max_saves=max_saves)
+
+    def help_begin(self):
+        """
+        Provides information about the begin command.
+        """
+        print("Starts a batch: changes are written once, on commit. With\
+ max_saves, the batch is also written every max_saves changes.\n")
+        print("Usage: begin [<max_saves>]\n")
+
+    def do_commit(self, args):
+        """
+        Ends the current batch and writes its changes to the file.
+
+        Usage: commit
+        """
+        if not storage.commit():
+            print("** no batch in progress **")
+
+    def help_commit(self):
+        """
+        Provides information about the commit command.
+        """
+        print("Ends the current batch and writes its changes to the file.\n")
+        print("Usage: commit\n")
+
+    def do_migrate(self, args):
+        """
+        Rewrites the storage file in another format and keeps using it.
+
+        Usage: migrate <format>
+        """
+        args = args.split()
+        if len(args) == 0:
+            print("** format name missing **")
+            return
+        if not hasattr(storage, "migrate"):
+            print("** not supported by this storage engine **")
+            return
+        storage.refresh()
+        try:
+            storage.migrate(args[0])
+        except ValueError:
+            print("** format doesn't exist **")
+
+    def help_migrate(self):
+        """
+        Provides information about the migrate command.
+        """
+        print("Rewrites the storage file in another format (json,\
+ compact-json, pickle, msgpack if installed) and keeps using it.\n")
+        print("Usage: migrate <format>\n")
+
+    def do_shard(self, args):
+        """
+        Rewrites the storage as one file per class and hash bucket, or
+        back as a single file with 0.
+
+        Usage: shard <buckets>
+        """
+        args = args.split()
+        if len(args) == 0:
+            print("** number of buckets missing **")
+            return
+        try:
+            buckets = int(args[0])
+        except ValueError:
+            print("** number of buckets must be an integer **")
+            return
+        if not hasattr(storage, "enable_sharding"):
+            print("** not supported by this storage engine **")
+            return
+        storage.refresh()
+        if buckets == 0:
+            storage.disable_sharding()
+            return
+        try:
+            storage.enable_sharding(buckets)
+        except ValueError:
+            print("** number of buckets must be positive **")
+
+    def help_shard(self):
+        """
+        Provides information about the shard command.
+        """
+        print("Rewrites the storage as a directory of one file per class\
+ (and per hash bucket when buckets > 1), so that saves only rewrite the\
+ files holding changes. 0 goes back to a single file.\n")
+        print("Usage: shard <buckets>\n")
+
+    def do_nearby(self, args):
+        """
+        Prints the places within a radius (km) of a point, nearest first.
+
+        Usage: nearby <latitude> <longitude> <radius_km>
+        """
+        args = args.split()
+        if len(args) < 3:
+            print("** latitude, longitude and radius required **")
+            return
+        try:
+            lat, lon, radius = (float(arg) for arg in args[:3])
+        except ValueError:
+            print("** coordinates and radius must be numbers **")
+            return
+        storage.refresh()
+        print([str(storage.get("Place", place_id))
+               for place_id, _ in storage.nearby(lat, lon, radius)])
+
+    def help_nearby(self):
+        """
+        Provides information about the nearby command.
+        """
+        print("Prints the places within a radius (in km) of a point,\
+ nearest first.\n")
+        print("Usage: nearby <latitude> <longitude> <radius_km>\n")
+
+    def do_within(self, args):
+        """
+        Prints the places inside a latitude/longitude bounding box.
+
+        Usage: within <min_lat> <min_lon> <max_lat> <max_lon>
+        """
+        args = args.split()
+        if len(args) < 4:
+            print("** min_lat, min_lon, max_lat and max_lon required **")
+            return
+        try:
+            bbox = [float(arg) for arg in args[:4]]
+        except ValueError:
+            print("** coordinates must be numbers **")
+            return
+        storage.refresh()
+        print([str(storage.get("Place", place_id))
+               for place_id in storage.within(*bbox)])
+
+    def help_within(self):
+        """
+        Provides information about the within command.
+        """
+        print("Prints the places inside a latitude/longitude bounding box.\n")
+        print("Usage: within <min_lat> <min_lon> <max_lat> <max_lon>\n")
+
+    def do_search(self, args):
+        """
+        Prints the instances whose text matches search terms, best first.
+
+        Usage: search <class_name> "<terms>" [<limit>]
+
+        Place names and descriptions and Review texts are searched; at
+        most <limit> instances are printed, 10 by default.
+        """
+        try:
+            args = shlex.split(args)
+        except ValueError:
+            print("** unbalanced quotes **")
+            return
+        if not args:
+            print("** class name missing **")
+            return
+        if args[0] not in self.class_mapping:
+            print('** class doesn\'t exist **')
+            return
+        if args[0] not in TEXT_ATTRIBUTES:
+            print("** {} has no text to search **".format(args[0]))
+            return
+        if len(args) < 2:
+            print("** search terms missing **")
+            return
+        limit = SEARCH_LIMIT
+        if len(args) > 2:
+            if not args[2].isdigit():
+                print("** limit must be a number **")
+                return
+            limit = int(args[2])
+        storage.refresh()
+        print([str(storage.get(args[0], obj_id))
+               for obj_id, _ in storage.search(args[0], args[1], limit)])
+
+    def help_search(self):
+        """
+        Provides information about the search command.
+        """
+        print("Prints the instances whose text matches search terms, best\
+ first.\n")
+        print("Usage: search <class_name> \"<terms>\" [<limit>]")
+        print("Searches Place names and descriptions and Review texts;\
+ {} results by default\n".format(SEARCH_LIMIT))
+
     def emptyline(self):
         '''
             Prevents printing anything when an empty line is passed.
@@ -314,28 +621,116 @@ on the class name.\n")
         '''
             Counts/retrieves the number of instances.
         '''
-        obj_list = []
-        storage = FileStorage()
-        storage.reload()
-        objects = storage.all()
-        try:
-            if len(args) != 0:
-                eval(args)
-        except NameError:
+        storage.refresh()
+        args = args.split()
+        if len(args) == 0:
+            print(storage.count())
+            return
+        if args[0] not in self.class_mapping:
             print("** class doesn't exist **")
             return
-        for key, val in objects.items():
-            if len(args) != 0:
-                if type(val) is eval(args):
-                    obj_list.append(val)
-            else:
-                obj_list.append(val)
-        print(len(obj_list))
+        print(storage.count(args[0]))
+
+    def __calls(self, line, methods):
+        '''
+            Parses a <class_name>.<method>(...)... chain of the given
+            methods, with literal arguments only; returns the class name
+            node and the (method, args, kwargs) calls in order. Raises
+            SyntaxError or ValueError if line is not such a chain.
+        '''
+        node = ast.parse(line.strip(), mode="eval").body
+        calls = []
+        while isinstance(node, ast.Call) and \
+                isinstance(node.func, ast.Attribute):
+            if node.func.attr not in methods:
+                raise ValueError
+            calls.append((node.func.attr,
+                          [ast.literal_eval(arg) for arg in node.args],
+                          {keyword.arg: ast.literal_eval(keyword.value)
+                           for keyword in node.keywords}))
+            node = node.func.value
+        return node, calls[::-1]
+
+    def __query(self, line):
+        '''
+            Runs a <class_name>.where(...) query chain, printing one
+            instance per line as the query yields them.
+        '''
+        try:
+            node, calls = self.__calls(line, QUERY_METHODS)
+        except (SyntaxError, ValueError):
+            # Unknown methods, or arguments other than literals
+            print("** invalid query **")
+            return
+        if not isinstance(node, ast.Name) or \
+                node.id not in self.class_mapping:
+            print('** class doesn\'t exist **')
+            return
+        storage.refresh()
+        query = storage.query(node.id)
+        try:
+            for method, positional, keywords in calls:
+                query = getattr(query, method)(*positional, **keywords)
+            for obj in query:
+                print(obj)
+        except (TypeError, ValueError) as error:
+            print("** invalid query: {} **".format(error))
+
+    def __aggregate(self, line):
+        '''
+            Runs a <class_name>.avg("<name>", by="<name>") aggregate (or
+            count, sum, min, max) and prints its result.
+        '''
+        try:
+            node, calls = self.__calls(line, AGGREGATES)
+            if len(calls) != 1:
+                raise ValueError
+        except (SyntaxError, ValueError):
+            print("** invalid aggregate **")
+            return
+        if not isinstance(node, ast.Name) or \
+                node.id not in self.class_mapping:
+            print('** class doesn\'t exist **')
+            return
+        function, positional, keywords = calls[0]
+        storage.refresh()
+        try:
+            print(storage.aggregate(node.id, function, *positional,
+                                    **keywords))
+        except (TypeError, ValueError) as error:
+            print("** invalid aggregate: {} **".format(error))
+
+    def help_aggregate(self):
+        """
+        Provides information about the aggregate syntax.
+        """
+        print("Prints the count, sum, average, minimum or maximum of an\
+ attribute, per group if asked.\n")
+        print("Usage: <class_name>.<count|sum|avg|min|max>(\"<name>\"\
+[, by=\"<name>\"])")
+        print("For example Place.avg(\"price_by_night\", by=\"city_id\")\
+ or Review.count(by=\"place_id\")\n")
+
+    def help_where(self):
+        """
+        Provides information about the where query syntax.
+        """
+        print("Prints the instances of a class matching conditions, one\
+ per line.\n")
+        print("Usage: <class_name>.where(<name>[__<lookup>]=<value>, ...)\
+[.order_by(\"[-]<name>\", ...)][.limit(<n>)][.offset(<n>)]")
+        print("Lookups: eq (default), ne, lt, lte, gt, gte, in, contains\n")
 
     def default(self, args):
         '''
             Catches all the function names that are not expicitly defined.
         '''
+        if QUERY_SYNTAX.match(args):
+            self.__query(args)
+            return
+        if AGGREGATE_SYNTAX.match(args):
+            self.__aggregate(args)
+            return
         functions = {"all": self.do_all, "update": self.do_update,
                      "show": self.do_show, "count": self.do_count,
                      "destroy": self.do_destroy, "update": self.do_update}
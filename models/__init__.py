@@ -2,7 +2,37 @@
 
 """ Creates a unique FileStorage instance """
 
-from models.engine.file_storage import FileStorage
+from os import getenv
 
-storage = FileStorage()  # Create a FileStorage instance
-storage.reload()
+# HBNB_TYPE_STORAGE=db stores the objects in SQLite instead of file.json
+storage_t = getenv("HBNB_TYPE_STORAGE")
+if storage_t == "db":
+    from models.engine.db_storage import DBStorage
+
+    # HBNB_DB_PATH selects the SQLite database (file.db by default)
+    storage = DBStorage(getenv("HBNB_DB_PATH"))
+    storage.reload()
+else:
+    from models.engine.file_storage import FileStorage
+
+    storage = FileStorage()  # Create a FileStorage instance
+    # HBNB_STORAGE_FORMAT selects the snapshot format (json, compact-json);
+    # pickle files are only read when it is pickle
+    storage.set_format(getenv("HBNB_STORAGE_FORMAT"))
+    # HBNB_COMPACT_MODELS=1 reloads objects as compact __slots__ instances
+    if getenv("HBNB_COMPACT_MODELS") == "1":
+        storage.enable_compact()
+    # HBNB_FSYNC=0 leaves flushing the (still atomic) writes to the OS
+    if getenv("HBNB_FSYNC") == "0":
+        storage.disable_fsync()
+    # HBNB_LOCKING=0 skips the locks, for a store used by one process
+    if getenv("HBNB_LOCKING") == "0":
+        storage.disable_locking()
+    # HBNB_THREADED=1 makes the storage thread-safe, writing from a thread
+    if getenv("HBNB_THREADED") == "1":
+        storage.enable_threading()
+    # HBNB_RELOAD_WORKERS=n decodes the files across n processes
+    if getenv("HBNB_RELOAD_WORKERS"):
+        storage.enable_parallel_reload(int(getenv("HBNB_RELOAD_WORKERS")))
+    # HBNB_LAZY_RELOAD=1 defers building instances until they are accessed
+    storage.reload(lazy=getenv("HBNB_LAZY_RELOAD") == "1")
@@ -10,6 +10,8 @@ managing timestamps, and converting instances to dictionary
 representations.
 
 Classes:
+- Model: The behaviour shared by the regular and compact (models.compact)
+  representations of the models.
 - BaseModel: The base model class with common attributes and
   methods for other models.
 
@@ -27,7 +29,74 @@ from datetime import datetime
 import models
 
 
-class BaseModel:
+class Model:
+    """
+        Model holds what the regular and the compact representations of
+        the models share: tracked attribute updates, save(), to_dict()
+        and __str__. A representation stores the attributes and provides:
+        - attributes(): the attributes set on the instance, in the order
+          they were first set
+        - _set(name, value): stores an attribute, without notifying the
+          storage
+        - _tracked(): whether the instance has its id, from which on its
+          updates are notified to the storage
+        - _clear(): removes every attribute
+    """
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        """
+        Sets an attribute and lets the storage update its indexes.
+
+        Args:
+        - name: Name of the attribute.
+        - value: New value of the attribute.
+        """
+        old = getattr(self, name, None)
+        self._set(name, value)
+        if self._tracked():
+            models.storage.track(self, name, old)
+
+    def __str__(self):
+        """
+        String representation of the instance.
+
+        Returns:
+        str: A formatted string containing the class name, id,
+             and dictionary representation.
+        """
+        return f"[{type(self).__name__}] ({self.id}) {self.attributes()}"
+
+    def save(self):
+        """
+        Update the 'updated_at' attribute to the current timestamp.
+        """
+        self.updated_at = datetime.now()
+
+        models.storage.new(self)
+        models.storage.save()
+
+    def to_dict(self):
+        """
+        Convert the instance to a dictionary.
+
+        Returns:
+        dict: A dictionary representation of the instance.
+        """
+        model_dict = dict(self.attributes())
+
+        model_dict["__class__"] = type(self).__name__
+        created_at = self.created_at.isoformat()
+        model_dict["updated_at"] = (created_at
+                                    if self.updated_at == self.created_at
+                                    else self.updated_at.isoformat())
+        model_dict["created_at"] = created_at
+
+        return model_dict
+
+
+class BaseModel(Model):
     """
         The BaseModel class serves as the base class for other models,
         providing common attributes and methods.
@@ -38,9 +107,11 @@ class BaseModel:
         - updated_at: datetime - timestamp for the last update to the instance
 
         Public instance methods:
+        - __setattr__(): sets an attribute and notifies the storage
         - save(): updates the updated_at attribute with the current datetime
         - to_dict(): returns a dictionary representation of the instance
         - __str__(): returns a string representation of the instance
+        - attributes(): returns the attributes set on the instance
     """
 
     def __init__(self, *args, **kwargs):
@@ -53,14 +124,16 @@ class BaseModel:
         """
         if kwargs:
             # Populate attributes from dictionary representation
+            # Written straight into __dict__: the instance is not stored
+            # yet, so there is no index for __setattr__ to notify.
             for key, value in kwargs.items():
-                if key in ["created_at", "updated_at"]:
-                    # Convert datetime strings to datetime objects
-                    setattr(
-                            self, key, datetime.strptime(
-                                value, '%Y-%m-%dT%H:%M:%S.%f'))
+                if key in ("created_at", "updated_at"):
+                    # Convert ISO strings to datetime objects; much faster
+                    # than strptime, and also accepts the isoformat() output
+                    # of timestamps without microseconds
+                    self.__dict__[key] = datetime.fromisoformat(value)
                 elif key != "__class__":
-                    setattr(self, key, value)
+                    self.__dict__[key] = value
         else:
             # Create new instance with unique id and created_at
             self.id = str(uuid4())
@@ -68,35 +141,23 @@ class BaseModel:
             self.updated_at = self.created_at
             models.storage.new(self)
 
-    def __str__(self):
+    def attributes(self):
         """
-        String representation of the BaseModel instance.
+        Returns the attributes set on the instance: its __dict__.
 
         Returns:
-        str: A formatted string containing the class name, id,
-             and dictionary representation.
-        """
-        return f"[{self.__class__.__name__}] ({self.id}) {self.__dict__}"
-
-    def save(self):
-        """
-        Update the 'updated_at' attribute to the current timestamp.
+        dict: Attribute names mapped to their values.
         """
-        self.updated_at = datetime.now()
+        return self.__dict__
 
-        models.storage.save()
+    def _set(self, name, value):
+        """Stores an attribute in __dict__."""
+        object.__setattr__(self, name, value)
 
-    def to_dict(self):
-        """
-        Convert the BaseModel instance to a dictionary.
-
-        Returns:
-        dict: A dictionary representation of the BaseModel instance.
-        """
-        model_dict = self.__dict__.copy()
-
-        model_dict["__class__"] = self.__class__.__name__
-        model_dict["updated_at"] = self.updated_at.isoformat()
-        model_dict["created_at"] = self.created_at.isoformat()
+    def _tracked(self):
+        """Tells whether the instance has its id yet."""
+        return "id" in self.__dict__
 
-        return model_dict
+    def _clear(self):
+        """Removes every attribute."""
+        self.__dict__.clear()
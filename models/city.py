@@ -10,6 +10,7 @@ It is a subclass of the BaseModel class, providing common functionality for
 managing and storing instances.
 """
 
+import models
 from models.base_model import BaseModel
 
 
@@ -21,6 +22,12 @@ class City(BaseModel):
     Attributes:
     - state_id (str): The identifier of the state to which the city belongs.
     - name (str): The name of the city.
+    - places (list): The places in the city (read-only).
     """
     state_id = ""
     name = ""
+
+    @property
+    def places(self):
+        """The Place objects whose city_id is the id of this city."""
+        return list(models.storage.find("Place", "city_id", self.id).values())
@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+
+"""
+Module: compact
+
+This module defines the compact, __slots__-backed representation of the
+model classes, an opt-in alternative to their regular __dict__-backed
+instances for large stores held in memory.
+
+A compact class is built from a regular model class by compact_model().
+It carries the same class name, so storage keys, indexes and the console
+treat both representations alike, and it shares the to_dict()/__str__
+contract through models.base_model.Model: only attributes actually set
+on the instance are listed, in the order they were set, and reading an
+unset declared attribute returns the model's class default. Attributes
+the model does not declare (added with `update`) go to a fallback
+dictionary.
+
+Classes:
+- CompactModel: Base class of every compact model class.
+
+Functions:
+- compact_model(cls): Returns the compact class of a model class.
+"""
+
+from uuid import uuid4
+from datetime import datetime
+from models.base_model import Model
+import models
+
+# Value of an unset slot
+UNSET = object()
+
+
+class CompactModel(Model):
+    """
+    CompactModel holds id, created_at, updated_at and the declared model
+    attributes in slots, and any other attribute in the _extra dict.
+
+    The attributes are listed in the order of their slots, then of
+    _extra, which is the order they were set in for most instances; the
+    others keep that order in _order.
+
+    Class attributes:
+    - _defaults (dict): Class-level defaults of the declared attributes.
+    - _fields (tuple): Every slot holding a model attribute, in order.
+    - _positions (dict): Position of each slot in _fields.
+    """
+
+    __slots__ = ("id", "created_at", "updated_at", "_extra", "_order")
+    _defaults = {}
+    _fields = ("id", "created_at", "updated_at")
+    _positions = {name: position for position, name in enumerate(_fields)}
+
+    def __init__(self, *args, **kwargs):
+        """
+        Constructor, with the same behaviour as BaseModel.__init__.
+
+        Args:
+        - *args: Unused
+        - **kwargs: Dictionary containing attribute names and values.
+        """
+        if kwargs:
+            positions = type(self)._positions
+            ordered = True
+            last = -1
+            for key, value in kwargs.items():
+                if key in ("created_at", "updated_at"):
+                    value = datetime.fromisoformat(value)
+                elif key == "__class__":
+                    continue
+                self.__store(key, value)
+                # Undeclared attributes are listed after every slot
+                position = positions.get(key, len(positions))
+                if position < last:
+                    ordered = False
+                last = max(last, position)
+            if not ordered:
+                object.__setattr__(self, "_order", tuple(
+                        key for key in kwargs if key != "__class__"))
+        else:
+            self.id = str(uuid4())
+            self.created_at = datetime.now()
+            self.updated_at = self.created_at
+            models.storage.new(self)
+
+    def __store(self, name, value):
+        """Stores value in its slot, or in _extra if it has none."""
+        if name in ("_extra", "_order"):
+            raise AttributeError(f"{name} is reserved")
+        try:
+            object.__setattr__(self, name, value)
+        except AttributeError:
+            try:
+                extra = object.__getattribute__(self, "_extra")
+            except AttributeError:
+                extra = {}
+                object.__setattr__(self, "_extra", extra)
+            extra[name] = value
+
+    def __slot(self, name, default=UNSET):
+        """Returns a slot, or default if it is not set."""
+        try:
+            return object.__getattribute__(self, name)
+        except AttributeError:
+            return default
+
+    def __getattr__(self, name):
+        """
+        Returns attributes missing from the slots: ad-hoc attributes from
+        _extra, then the model's class defaults.
+        """
+        if name not in ("_extra", "_order"):
+            extra = self.__slot("_extra", None)
+            if extra is not None and name in extra:
+                return extra[name]
+            if name in type(self)._defaults:
+                return type(self)._defaults[name]
+        raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def _set(self, name, value):
+        """
+        Stores an attribute, keeping the order attributes were first set
+        in when it is no longer the order of the slots.
+        """
+        order = self.__slot("_order", None)
+        extra = self.__slot("_extra", None)
+        position = type(self)._positions.get(name)
+        if position is None:
+            new = extra is None or name not in extra
+        else:
+            new = self.__slot(name) is UNSET
+        if new and order is None and position is not None and (
+                extra or any(self.__slot(later) is not UNSET
+                             for later in self._fields[position + 1:])):
+            order = tuple(self.attributes())
+        self.__store(name, value)
+        if new and order is not None:
+            object.__setattr__(self, "_order", order + (name,))
+
+    def _tracked(self):
+        """Tells whether the instance has its id yet."""
+        return self.__slot("id") is not UNSET
+
+    def _clear(self):
+        """Removes every attribute."""
+        for name in (*self._fields, "_extra", "_order"):
+            try:
+                object.__delattr__(self, name)
+            except AttributeError:
+                pass
+
+    def attributes(self):
+        """
+        Returns the attributes set on the instance, like __dict__ would.
+
+        Returns:
+        dict: Attribute names mapped to their values, in the order they
+        were set.
+        """
+        attributes = {}
+        names = self.__slot("_order", self._fields)
+        extra = self.__slot("_extra", None)
+        for name in names:
+            value = self.__slot(name)
+            if value is UNSET and extra is not None:
+                value = extra.get(name, UNSET)
+            if value is not UNSET:
+                attributes[name] = value
+        if extra is not None and names is self._fields:
+            attributes.update(extra)
+        return attributes
+
+
+_compact_classes = {}
+
+
+def compact_model(cls):
+    """
+    Returns the compact class of a model class, building it on first use.
+
+    Parameters:
+        cls: A BaseModel subclass (or BaseModel itself).
+
+    Returns:
+        type: A CompactModel subclass named like cls, with a slot for each
+        public class attribute declared on cls and its bases, and the
+        same properties.
+    """
+    compact = _compact_classes.get(cls)
+    if compact is not None:
+        return compact
+    defaults = {}
+    properties = {}
+    for klass in reversed(cls.__mro__):
+        for name, value in vars(klass).items():
+            if isinstance(value, property):
+                # Relationship accessors, computed rather than stored
+                properties[name] = value
+            elif not name.startswith("_") and not callable(value):
+                defaults[name] = value
+    slots = tuple(name for name in defaults
+                  if name not in CompactModel._fields)
+    compact = type(cls.__name__, (CompactModel,), {
+            "__slots__": slots,
+            "__module__": cls.__module__,
+            "__doc__": cls.__doc__,
+            "_defaults": defaults,
+            "_fields": CompactModel._fields + slots,
+            "_positions": {name: position for position, name
+                           in enumerate(CompactModel._fields + slots)},
+            **properties,
+    })
+    _compact_classes[cls] = compact
+    return compact
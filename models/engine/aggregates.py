@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+
+"""
+Module: aggregates
+
+This module defines Aggregate, a materialized count, sum, average,
+minimum and maximum of one numeric attribute of one class, per value of
+a grouping attribute. Kept up to date as objects change, asking again
+costs one step per group instead of a pass over the objects.
+
+Only int and float values are aggregated (bools and other types are
+left out of the sum, average, minimum and maximum); every object of the
+class is counted.
+
+Functions:
+- check_aggregate(function, name): Checks the arguments of an aggregate.
+- summarize(function, count, numbers, total, low, high): Returns the
+  result of an aggregate function from the totals of a group.
+
+Classes:
+- Group: The running totals of one group.
+- Aggregate: The groups of one class, attribute and grouping attribute.
+"""
+
+import math
+
+from models.engine.indexes import class_name_of
+from models.engine.query import is_number
+
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+
+
+def check_aggregate(function, name):
+    """
+    Checks the arguments of an aggregate.
+
+    Parameters:
+        function (str): The aggregate function.
+        name (str): The aggregated attribute, or None.
+
+    Raises:
+        ValueError: If function is unknown, or needs an attribute and
+        name is None.
+    """
+    if function not in AGGREGATES:
+        raise ValueError(f"unknown aggregate: {function}")
+    if name is None and function != "count":
+        raise ValueError(f"{function} needs an attribute")
+
+
+def summarize(function, count, numbers, total, low, high):
+    """
+    Returns the result of an aggregate function from the totals of a
+    group.
+
+    Parameters:
+        function (str): One of count, sum, avg, min and max.
+        count (int): Objects in the group.
+        numbers (int): Numeric values in the group.
+        total: Sum of the numeric values.
+        low, high: Smallest and largest numeric values, or None.
+
+    Returns:
+        The count, sum, average, minimum or maximum; None for the last
+        three if the group holds no numeric value.
+    """
+    if function == "count":
+        return count
+    if function == "sum":
+        return total
+    if function == "avg":
+        return total / numbers if numbers else None
+    return low if function == "min" else high
+
+
+class Group:
+    """
+    Group holds the running totals of the objects of one group.
+
+    The values are counted in a multiset, so that the minimum and maximum
+    survive deletions: they are cached, and only computed again when the
+    last occurrence of one of them is removed. The sum is kept exactly
+    while every value is an int; once floats are counted it is computed
+    again from the multiset with math.fsum() when next asked for, since a
+    running float total would keep the rounding error of every value it
+    ever held.
+
+    Attributes:
+    - count (int): Objects in the group.
+    - numbers (int): Numeric values in the group.
+    - values (dict): numeric value -> occurrences.
+    - total: Sum of the numeric values.
+    """
+
+    __slots__ = ("count", "numbers", "values", "__integers", "__floats",
+                 "__sum", "__low", "__high")
+
+    def __init__(self):
+        """Creates an empty group."""
+        self.count = 0
+        self.numbers = 0
+        self.values = {}
+        self.__integers = 0
+        self.__floats = 0
+        self.__sum = None
+        self.__low = self.__high = None
+
+    @property
+    def total(self):
+        """Sum of the numeric values."""
+        if not self.__floats:
+            return self.__integers
+        if self.__sum is None:
+            self.__sum = math.fsum(value * occurrences for value, occurrences
+                                   in self.values.items())
+        return self.__sum
+
+    def add(self, value):
+        """Counts an object, and its value if numeric."""
+        self.count += 1
+        if not is_number(value):
+            return
+        self.numbers += 1
+        if isinstance(value, int):
+            self.__integers += value
+        else:
+            self.__floats += 1
+        self.__sum = None
+        self.values[value] = self.values.get(value, 0) + 1
+        if self.__low is not None and value < self.__low:
+            self.__low = value
+        if self.__high is not None and value > self.__high:
+            self.__high = value
+
+    def remove(self, value):
+        """Uncounts an object, and its value if numeric."""
+        self.count -= 1
+        if not is_number(value) or value not in self.values:
+            return
+        self.numbers -= 1
+        if isinstance(value, int):
+            self.__integers -= value
+        else:
+            self.__floats -= 1
+        self.__sum = None
+        self.values[value] -= 1
+        if not self.values[value]:
+            del self.values[value]
+            if value == self.__low:
+                self.__low = None
+            if value == self.__high:
+                self.__high = None
+
+    def result(self, function):
+        """Returns the result of an aggregate function for the group."""
+        if self.values:
+            if self.__low is None:
+                self.__low = min(self.values)
+            if self.__high is None:
+                self.__high = max(self.values)
+        return summarize(function, self.count, self.numbers, self.total,
+                         self.__low, self.__high)
+
+
+class Aggregate:
+    """
+    Aggregate keeps the totals of one numeric attribute of one class per
+    value of a grouping attribute.
+
+    Attributes:
+    - class_name (str): Name of the aggregated class.
+    - name (str): The aggregated attribute, or None to count only.
+    - by (str): The grouping attribute, or None for a single group.
+    - groups (dict): group value -> Group.
+    """
+
+    def __init__(self, cls, name=None, by=None):
+        """
+        Creates an empty aggregate.
+
+        Parameters:
+            cls: The model class or class name to aggregate.
+            name (str): The attribute to aggregate, or None.
+            by (str): The attribute to group by, or None.
+        """
+        self.class_name = class_name_of(cls)
+        self.name = name
+        self.by = by
+        self.groups = {}
+
+    def __entry(self, obj, replaced=None, old=None):
+        """Returns the (group, value) of obj, with the attribute replaced
+        read as old."""
+        group = value = None
+        if self.by is not None:
+            group = old if self.by == replaced else \
+                getattr(obj, self.by, None)
+        if self.name is not None:
+            value = old if self.name == replaced else \
+                getattr(obj, self.name, None)
+        return group, value
+
+    def __insert(self, group, value):
+        """Counts a value in a group."""
+        try:
+            bucket = self.groups.get(group)
+        except TypeError:
+            # Unhashable group values (lists) are not grouped
+            return
+        if bucket is None:
+            bucket = self.groups[group] = Group()
+        bucket.add(value)
+
+    def __discard(self, group, value):
+        """Uncounts a value from a group."""
+        try:
+            bucket = self.groups.get(group)
+        except TypeError:
+            return
+        if bucket is None:
+            return
+        bucket.remove(value)
+        if not bucket.count:
+            del self.groups[group]
+
+    def add(self, key, obj):
+        """Counts obj if it belongs to the aggregated class."""
+        if class_name_of(obj) == self.class_name:
+            self.__insert(*self.__entry(obj))
+
+    def remove(self, key, obj):
+        """Uncounts obj."""
+        if class_name_of(obj) == self.class_name:
+            self.__discard(*self.__entry(obj))
+
+    def update(self, key, obj, name, old):
+        """Moves obj between values or groups."""
+        if name in (self.name, self.by) and name is not None and \
+                class_name_of(obj) == self.class_name:
+            self.__discard(*self.__entry(obj, name, old))
+            self.__insert(*self.__entry(obj))
+
+    def clear(self):
+        """Forgets every object."""
+        self.groups = {}
+
+    def results(self, function):
+        """
+        Returns the result of an aggregate function for every group.
+
+        Parameters:
+            function (str): One of count, sum, avg, min and max.
+
+        Returns:
+            dict: group value -> result.
+        """
+        groups = self.groups
+        if function == "count":
+            return {group: bucket.count for group, bucket in groups.items()}
+        if function == "sum":
+            return {group: bucket.total for group, bucket in groups.items()}
+        return {group: bucket.result(function)
+                for group, bucket in groups.items()}
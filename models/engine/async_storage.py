@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+
+"""
+Module: async_storage
+
+This module defines AsyncStorage, an asyncio facade over a storage
+engine for code running in an event loop, such as an async HTTP API:
+
+    storage = AsyncStorage()
+    place = await storage.aget(Place, place_id)
+    place.name = "loft"
+    await storage.asave()
+
+Every storage call runs on a thread of its own, so file I/O and the
+decoding of records never block the event loop. Changing an attribute
+on the loop takes the lock of the storage, which a save only holds
+while it merges and encodes the changes, not while it writes them.
+asave() calls made while a save is running are coalesced into the next
+one: a burst of requests costs two writes, not one per request.
+
+Classes:
+- AsyncStorage: Awaitable interface of a FileStorage or DBStorage.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import models
+
+
+class AsyncStorage:
+    """
+    AsyncStorage runs the calls of a storage engine on an executor.
+
+    A FileStorage is switched to its thread-safe mode, as instances keep
+    being changed from the event loop while the storage thread writes.
+
+    Attributes:
+    - storage: The storage engine.
+    - executor (Executor): Where the storage calls run; by default a
+      single thread, as DBStorage may only be used by one at a time.
+    - __threaded (bool): Whether this facade enabled the thread-safe
+      mode of the storage, to disable it on close.
+    - __waiting (Future): Result shared by the asave() calls made since
+      the last save started, or None.
+    - __writing (asyncio.Lock): Held while a save runs.
+    - __tasks (set): Save tasks running, kept from garbage collection.
+
+    Methods:
+    - asave(self): Saves the changes, coalesced with concurrent calls.
+    - areload(self, *args): Reloads the storage.
+    - arefresh(self): Reloads the storage if another process changed it.
+    - aget(self, cls, obj_id): Returns one object by class and id.
+    - aall(self, cls): Returns the objects, or those of one class.
+    - acount(self, cls): Returns the number of objects.
+    - aclose(self): Writes the pending saves and stops the executor.
+    """
+
+    def __init__(self, storage=None, executor=None):
+        """
+        Creates a facade over a storage engine.
+
+        Parameters:
+            storage: The storage engine; models.storage if None.
+            executor (Executor): Where to run the storage calls; a new
+            single thread if None.
+        """
+        self.storage = storage if storage is not None else models.storage
+        self.__threaded = False
+        if hasattr(self.storage, "enable_threading"):
+            self.storage.enable_threading()
+            self.__threaded = True
+        self.executor = executor or ThreadPoolExecutor(
+                1, thread_name_prefix="storage")
+        self.__waiting = None
+        self.__writing = None
+        self.__tasks = set()
+
+    async def __run(self, function, *args):
+        """Runs function(*args) on the executor and returns its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          partial(function, *args))
+
+    def __save(self):
+        """Saves, waiting for the write even in thread-safe mode."""
+        self.storage.save()
+        if hasattr(self.storage, "flush"):
+            self.storage.flush()
+
+    async def __write(self, waiting):
+        """Runs one save for every asave() call sharing waiting."""
+        if self.__writing is None:
+            self.__writing = asyncio.Lock()
+        async with self.__writing:
+            # Calls made from now on wait for the next save
+            self.__waiting = None
+            try:
+                await self.__run(self.__save)
+            except Exception as error:
+                waiting.set_exception(error)
+            else:
+                waiting.set_result(None)
+
+    async def asave(self):
+        """
+        Saves the changes made so far. If a save is already running,
+        waits for it and for a single save made after it, shared with
+        the other calls made in the meantime.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            The error of the save, such as a ConflictError.
+        """
+        waiting = self.__waiting
+        if waiting is None:
+            waiting = asyncio.get_running_loop().create_future()
+            self.__waiting = waiting
+            task = asyncio.ensure_future(self.__write(waiting))
+            self.__tasks.add(task)
+            task.add_done_callback(self.__tasks.discard)
+        # A cancelled caller must not cancel the save of the others
+        await asyncio.shield(waiting)
+
+    async def areload(self, *args):
+        """
+        Reloads the storage from disk.
+
+        Parameters:
+            *args: Passed to the reload() of the storage.
+
+        Returns:
+            None
+        """
+        await self.__run(self.storage.reload, *args)
+
+    async def arefresh(self):
+        """
+        Reloads the storage if another process changed it.
+
+        Parameters:
+            None
+
+        Returns:
+            bool: True if the storage was reloaded.
+        """
+        return await self.__run(self.storage.refresh)
+
+    async def aget(self, cls, obj_id):
+        """
+        Returns one object by class and id.
+
+        Parameters:
+            cls: Model class or class name.
+            obj_id (str): The object id.
+
+        Returns:
+            The stored object, or None if there is none.
+        """
+        return await self.__run(self.storage.get, cls, obj_id)
+
+    async def aall(self, cls=None):
+        """
+        Returns the stored objects.
+
+        Parameters:
+            cls: Optional model class or class name to filter on.
+
+        Returns:
+            dict: key -> object.
+        """
+        return await self.__run(self.storage.all, cls)
+
+    async def acount(self, cls=None):
+        """
+        Returns the number of stored objects.
+
+        Parameters:
+            cls: Optional model class or class name to count.
+
+        Returns:
+            int: Number of objects, of cls only when given.
+        """
+        return await self.__run(self.storage.count, cls)
+
+    async def aclose(self):
+        """
+        Waits for the saves in progress, then stops the executor and the
+        thread-safe mode this facade enabled.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self.__tasks:
+            await asyncio.gather(*self.__tasks, return_exceptions=True)
+        self.executor.shutdown()
+        if self.__threaded:
+            self.storage.disable_threading()
+            self.__threaded = False
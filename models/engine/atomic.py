@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+
+"""
+Module: atomic
+
+This module defines the crash-safe writes of FileStorage: a file is
+never rewritten in place, but written next to its target, flushed to
+disk, and renamed over it. A crash at any point leaves either the old
+or the new content, never a truncated file, and readers that have the
+old file open or mapped keep reading a complete file.
+
+Functions:
+- write_files(files, fsync): Atomically replaces several files.
+- append_file(path, data, fsync): Appends to a file, durably.
+"""
+
+import os
+import threading
+
+
+def temp_path(path):
+    """Returns the temporary file a writer of path writes first; unique
+    per process and thread, and never ending in the target's suffix."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def fsync_directory(directory):
+    """Flushes a directory entry change (a rename) to disk."""
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on every platform
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_files(files, fsync=True):
+    """
+    Atomically replaces files with new contents.
+
+    Every file is written to a temporary file first, then they are all
+    renamed over their targets, and their directories flushed once: a
+    group of files costs one fsync each plus one per directory.
+
+    A replaced file always gets a later modification time than the file
+    it replaces, even within the timestamp granularity of the file
+    system, so that (inode, size, mtime) tells every version apart.
+
+    Parameters:
+        files (dict): path -> bytes to write there.
+        fsync (bool): Whether to flush the data and the renames to disk
+        before returning; without it the writes are still atomic, but
+        may be lost on a power failure.
+
+    Returns:
+        None
+    """
+    written = []
+    try:
+        for path, data in files.items():
+            temp = temp_path(path)
+            fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            written.append((temp, path))
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+                if fsync:
+                    file.flush()
+                    os.fsync(file.fileno())
+        for temp, path in written:
+            try:
+                previous = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                previous = None
+            os.replace(temp, path)
+            if previous is not None:
+                info = os.stat(path)
+                if info.st_mtime_ns <= previous:
+                    os.utime(path, ns=(info.st_atime_ns, previous + 1))
+    except BaseException:
+        # Temporary files already renamed are gone, and skipped here
+        for temp, path in written:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+        raise
+    if fsync:
+        for directory in {os.path.dirname(path) for path in files}:
+            fsync_directory(directory)
+
+
+def append_file(path, data, fsync=True):
+    """
+    Appends data to a file, creating it if needed.
+
+    Parameters:
+        path (str): The file.
+        data (str): Text to append.
+        fsync (bool): Whether to flush the data to disk before returning.
+
+    Returns:
+        None
+    """
+    created = not os.path.exists(path)
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(data)
+        if fsync:
+            file.flush()
+            os.fsync(file.fileno())
+    if fsync and created:
+        fsync_directory(os.path.dirname(path))
@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+
+"""
+Module: columns
+
+This module defines ColumnIndex, an array-backed copy of the numeric
+attributes of one model class.
+
+Range filters over the columns are vectorized with NumPy when it is
+installed (VECTORIZED), and run as a single loop over the arrays
+otherwise.
+
+Classes:
+- ColumnIndex: One array('d') column per numeric attribute of a class.
+"""
+
+from array import array
+
+from models.engine.indexes import class_name_of
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Whether filter() runs on NumPy; the loop is slower than a scan of the
+# objects themselves
+VECTORIZED = numpy is not None
+
+
+def to_number(value):
+    """
+    Returns value as a float, NaN if it is not numeric.
+
+    Parameters:
+        value: An attribute value.
+
+    Returns:
+        float: The numeric value, or NaN, which never matches a range.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class ColumnIndex:
+    """
+    ColumnIndex stores the numeric attributes of one class as parallel
+    arrays, one row per stored object.
+
+    Deleting an object moves the last row into its place, so rows stay
+    dense and every operation except filtering is O(1).
+
+    Attributes:
+    - class_name (str): Name of the indexed class.
+    - names (tuple): Names of the indexed attributes.
+    - columns (dict): attribute name -> array('d') of values.
+    - keys (list): Storage key of each row.
+    - rows (dict): Storage key -> row number.
+    """
+
+    def __init__(self, cls, names):
+        """
+        Creates empty columns.
+
+        Parameters:
+            cls: The model class or class name to index.
+            names (iterable): The numeric attributes to keep in columns.
+        """
+        self.class_name = class_name_of(cls)
+        self.names = tuple(names)
+        self.clear()
+
+    def add(self, key, obj):
+        """Appends (or rewrites) the row of obj."""
+        if class_name_of(obj) != self.class_name:
+            return
+        row = self.rows.get(key)
+        if row is None:
+            self.rows[key] = len(self.keys)
+            self.keys.append(key)
+            for name in self.names:
+                self.columns[name].append(
+                        to_number(getattr(obj, name, None)))
+            return
+        for name in self.names:
+            self.columns[name][row] = to_number(getattr(obj, name, None))
+
+    def remove(self, key, obj):
+        """Removes the row of obj, filling the hole with the last row."""
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        last_key = self.keys.pop()
+        for column in self.columns.values():
+            last_value = column.pop()
+            if row < len(column):
+                column[row] = last_value
+        if last_key != key:
+            self.keys[row] = last_key
+            self.rows[last_key] = row
+
+    def update(self, key, obj, name, old):
+        """Rewrites one cell after an attribute update."""
+        if name not in self.columns:
+            return
+        row = self.rows.get(key)
+        if row is not None:
+            self.columns[name][row] = to_number(getattr(obj, name, None))
+
+    def clear(self):
+        """Empties every column."""
+        self.columns = {name: array("d") for name in self.names}
+        self.keys = []
+        self.rows = {}
+
+    def filter(self, **ranges):
+        """
+        Returns the keys of the rows within every given range.
+
+        Parameters:
+            **ranges: attribute name -> (low, high), both inclusive; either
+            bound may be None to leave that side open.
+
+        Returns:
+            list: Storage keys of the matching rows.
+
+        Raises:
+            KeyError: If an attribute is not one of the columns.
+        """
+        bounds = []
+        for name, (low, high) in ranges.items():
+            bounds.append((self.columns[name], low, high))
+        if numpy is not None:
+            return self.__filter_numpy(bounds)
+        return self.__filter_loop(bounds)
+
+    def __filter_numpy(self, bounds):
+        """Vectorized filter over zero-copy NumPy views of the columns."""
+        mask = numpy.ones(len(self.keys), dtype=bool)
+        for column, low, high in bounds:
+            values = numpy.frombuffer(column, dtype=numpy.float64)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        keys = self.keys
+        return [keys[row] for row in numpy.flatnonzero(mask)]
+
+    def __filter_loop(self, bounds):
+        """Filter without NumPy, a single pass over the arrays."""
+        keys = self.keys
+        rows = range(len(keys))
+        for column, low, high in bounds:
+            if low is None:
+                low = float("-inf")
+            if high is None:
+                high = float("inf")
+            rows = [row for row in rows if low <= column[row] <= high]
+        return [keys[row] for row in rows]
@@ -0,0 +1,791 @@
+#!/usr/bin/python3
+
+"""
+Module: db_storage
+
+This module defines DBStorage, a storage engine keeping the objects in
+an SQLite database instead of a JSON file, behind the same interface as
+FileStorage (all, count, get, find, new, delete, save, reload, refresh
+and batches). models/__init__.py selects it with HBNB_TYPE_STORAGE=db.
+
+Every model class has its own table: id, created_at and updated_at, one
+column per string or number attribute the class declares, and an
+"extra" column holding the other attributes as JSON (lists, attributes
+added with `update`, values of another type than the declared default).
+The foreign-key columns city_id, state_id, place_id and user_id are
+indexed, as are the Place coordinates.
+
+Classes:
+- DBStorage: SQLite storage engine.
+"""
+
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from models.base_model import BaseModel
+from models.user import User
+from models.state import State
+from models.city import City
+from models.amenity import Amenity
+from models.place import Place
+from models.review import Review
+from models.engine.aggregates import Aggregate, check_aggregate, summarize
+from models.engine.columns import to_number
+from models.engine.indexes import class_name_of
+from models.engine.query import Query, is_number
+from models.engine.search import TEXT_ATTRIBUTES, TextIndex
+from models.engine.spatial import KM_PER_DEGREE, haversine
+
+# Column types kept as they are; anything else goes to the JSON column
+COLUMN_TYPES = (str, int, float)
+INDEXED_COLUMNS = ("city_id", "state_id", "place_id", "user_id",
+                   "latitude")
+# Ids selected per statement by fetch(), under SQLite's parameter limit
+FETCH_BATCH = 500
+
+
+class DBStorage:
+    """
+    DBStorage class stores the objects in one SQLite table per class.
+
+    Objects read or created by this process are kept in an identity map,
+    so that every lookup of a key returns the same instance. Changes are
+    pending until the next read, which writes them into the open
+    transaction, and save() commits that transaction: all the changes of
+    a save, or of a whole batch, are written together.
+
+    Attributes:
+    - __db_path (str): Default path of the SQLite database.
+    - __models (dict): class name -> model class.
+    - __column_names (dict): class name -> columns of its table.
+    - __path (str): Path of the database of this instance.
+    - __connection (sqlite3.Connection): Open connection, or None.
+    - __objects (dict): key -> instance of every object loaded or created.
+    - __pending (dict): Keys changed since they were last written, mapped
+      to the object to write or None for a deletion.
+    - __version (int): PRAGMA data_version when last read, to tell
+      whether another connection committed since.
+    - __batch_depth (int): Number of open batches; commits are deferred
+      while it is above zero.
+    - __batch_saves (int): Saves deferred since the last commit.
+    - __batch_max_saves (int): Deferred saves that force a commit, or None.
+    - __batch_max_delay (float): Seconds after which a deferred save
+      forces a commit, or None.
+
+    Methods:
+    - all(self, cls): Returns a dictionary of all objects stored, or only
+      those of one class.
+    - count(self, cls): Returns the number of stored objects.
+    - get(self, cls, obj_id): Returns one object by class and id.
+    - fetch(self, cls, ids): Returns the objects of a class with the
+      given ids.
+    - find(self, cls, name, value): Returns the objects of a class whose
+      attribute equals value.
+    - filter(self, cls, **ranges): Returns the ids of the objects whose
+      numeric attributes fall within ranges.
+    - nearby(self, lat, lon, radius, cls): Returns the ids of the objects
+      within radius km of a point, nearest first.
+    - within(self, min_lat, min_lon, max_lat, max_lon, cls): Returns the
+      ids of the objects inside a bounding box.
+    - query(self, cls): Returns a chainable query over the objects of a
+      class.
+    - search(self, cls, text, limit): Returns the ids of the objects
+      whose text matches search terms, best first.
+    - aggregate(self, cls, function, name, by): Returns the count, sum,
+      average, minimum or maximum of an attribute, per group if asked.
+    - new(self, obj): Adds a new object to the storage.
+    - delete(self, obj): Removes an object from the storage.
+    - track(self, obj, name, old): Marks an updated object as changed.
+    - save(self): Commits the pending changes.
+    - reload(self): Opens the database, creating the missing tables.
+    - refresh(self): Drops the cached objects if another connection
+      committed changes.
+    - begin(self, max_saves, max_delay): Starts deferring commits.
+    - commit(self): Ends a batch, committing its changes once.
+    - batch(self, max_saves, max_delay): Context manager around
+      begin() and commit().
+    - close(self): Commits and closes the connection.
+    """
+
+    __db_path = "file.db"
+    __column_names = {}
+    __models = {
+            "BaseModel": BaseModel,
+            "User": User,
+            "State": State,
+            "City": City,
+            "Amenity": Amenity,
+            "Place": Place,
+            "Review": Review
+    }
+
+    def __init__(self, path=None):
+        """
+        Creates a storage over an SQLite database, opened by reload().
+
+        Parameters:
+            path (str): Path of the database; __db_path if None.
+        """
+        self.__path = path or DBStorage.__db_path
+        self.__connection = None
+        self.__objects = {}
+        self.__pending = {}
+        self.__version = None
+        self.__batch_depth = 0
+        self.__batch_saves = 0
+        self.__batch_started = None
+        self.__batch_max_saves = None
+        self.__batch_max_delay = None
+
+    @staticmethod
+    def __columns(class_name):
+        """Returns the columns of the declared attributes of a class."""
+        columns = DBStorage.__column_names.get(class_name)
+        if columns is None:
+            model = DBStorage.__models[class_name]
+            columns = DBStorage.__column_names[class_name] = tuple(
+                    name for name in dir(model)
+                    if not name.startswith("_") and
+                    type(getattr(model, name)) in COLUMN_TYPES)
+        return columns
+
+    def __execute(self, sql, params=()):
+        """Writes the pending changes, then runs one statement."""
+        self.__write()
+        return self.__connection.execute(sql, params)
+
+    def __to_row(self, obj):
+        """Returns the table row of an object."""
+        obj_dict = obj.to_dict()
+        del obj_dict["__class__"]
+        row = [obj_dict.pop("id"), obj_dict.pop("created_at"),
+               obj_dict.pop("updated_at")]
+        for name in self.__columns(obj.__class__.__name__):
+            value = obj_dict.get(name)
+            if type(value) in COLUMN_TYPES:
+                del obj_dict[name]
+                row.append(value)
+            else:
+                row.append(None)
+        row.append(json.dumps(obj_dict) if obj_dict else None)
+        return row
+
+    def __from_row(self, class_name, row):
+        """Returns the instance of a table row, from the identity map if
+        it is already loaded."""
+        key = f"{class_name}.{row[0]}"
+        obj = self.__objects.get(key)
+        if obj is not None:
+            return obj
+        obj_dict = {"id": row[0], "created_at": row[1],
+                    "updated_at": row[2]}
+        for name, value in zip(self.__columns(class_name), row[3:-1]):
+            if value is not None:
+                obj_dict[name] = value
+        if row[-1] is not None:
+            obj_dict.update(json.loads(row[-1]))
+        obj = self.__objects[key] = self.__models[class_name](**obj_dict)
+        return obj
+
+    def __select(self, class_name, where="", params=()):
+        """Returns the instances of the rows of a class matching where."""
+        rows = self.__execute(f'SELECT * FROM "{class_name}" {where}',
+                              params)
+        return {f"{class_name}.{row[0]}": self.__from_row(class_name, row)
+                for row in rows}
+
+    def __class_names(self, cls):
+        """Returns the class names to query for cls (every one if None)."""
+        if cls is None:
+            return list(self.__models)
+        return [class_name_of(cls)]
+
+    def all(self, cls=None):
+        """
+        Returns a dictionary of all objects currently stored.
+
+        Parameters:
+            cls: Optional model class or class name to filter on.
+
+        Returns:
+            dict: {key: obj} of every object, or of the objects of cls.
+        """
+        objects = {}
+        for class_name in self.__class_names(cls):
+            objects.update(self.__select(class_name))
+        return objects
+
+    def count(self, cls=None):
+        """
+        Returns the number of stored objects.
+
+        Parameters:
+            cls: Optional model class or class name to count.
+
+        Returns:
+            int: Number of objects, of cls only when given.
+        """
+        return sum(self.__execute(f'SELECT COUNT(*) FROM "{class_name}"')
+                   .fetchone()[0]
+                   for class_name in self.__class_names(cls))
+
+    def get(self, cls, obj_id):
+        """
+        Returns one object by class and id.
+
+        Parameters:
+            cls: Model class or class name.
+            obj_id (str): The object id.
+
+        Returns:
+            The stored object, or None if there is none.
+        """
+        class_name = class_name_of(cls)
+        obj = self.__objects.get(f"{class_name}.{obj_id}")
+        if obj is not None:
+            return obj
+        objects = self.__select(class_name, "WHERE id = ?", (obj_id,))
+        return next(iter(objects.values()), None)
+
+    def fetch(self, cls, ids):
+        """
+        Returns the objects of a class with the given ids, selecting the
+        ones not loaded yet a few hundred at a time.
+
+        Parameters:
+            cls: Model class or class name.
+            ids (iterable): Object ids, such as those filter() returns.
+
+        Returns:
+            list: The stored objects, in the order of ids, skipping the
+            ids with no object.
+        """
+        class_name = class_name_of(cls)
+        keys = [f"{class_name}.{obj_id}" for obj_id in ids]
+        found = {key: self.__objects[key] for key in keys
+                 if key in self.__objects}
+        missing = [key.split(".", 1)[1] for key in keys if key not in found]
+        for start in range(0, len(missing), FETCH_BATCH):
+            batch = missing[start:start + FETCH_BATCH]
+            found.update(self.__select(
+                class_name, f"WHERE id IN ({', '.join('?' * len(batch))})",
+                batch))
+        return [found[key] for key in keys if key in found]
+
+    def find(self, cls, name, value):
+        """
+        Returns the objects of a class whose attribute equals value.
+
+        Declared attributes are looked up in their column (indexed for
+        the foreign keys); other attributes fall back to a scan.
+
+        Parameters:
+            cls: Model class or class name.
+            name (str): Attribute name.
+            value: Value to look for.
+
+        Returns:
+            dict: {key: obj} of the matching objects.
+        """
+        class_name = class_name_of(cls)
+        if name not in self.__columns(class_name):
+            return {key: obj for key, obj in self.all(class_name).items()
+                    if getattr(obj, name, None) == value}
+        where = f'WHERE "{name}" = ?'
+        default = value == getattr(self.__models[class_name], name)
+        if default:
+            # Unset attributes are NULL and read as the class default,
+            # unless the extra column holds a value of another type
+            where += f' OR "{name}" IS NULL'
+        objects = self.__select(class_name, where, (value,))
+        if not default:
+            return objects
+        return {key: obj for key, obj in objects.items()
+                if getattr(obj, name, None) == value}
+
+    def __range(self, class_name, name, low, high):
+        """Returns the SQL condition and parameters of a numeric range,
+        matching NULL (the class default) when the default is in range."""
+        conditions = [f"typeof(\"{name}\") IN ('integer', 'real')"]
+        params = []
+        if low is not None:
+            conditions.append(f'"{name}" >= ?')
+            params.append(low)
+        if high is not None:
+            conditions.append(f'"{name}" <= ?')
+            params.append(high)
+        condition = "(" + " AND ".join(conditions) + ")"
+        default = to_number(getattr(self.__models[class_name], name))
+        if (low is None or default >= low) and \
+                (high is None or default <= high):
+            condition = f'({condition} OR "{name}" IS NULL)'
+        return condition, params
+
+    def filter(self, cls, **ranges):
+        """
+        Returns the ids of the objects of a class whose numeric attributes
+        fall within the given ranges.
+
+        Parameters:
+            cls: Model class or class name.
+            **ranges: attribute name -> (low, high), both inclusive; None
+            leaves a side open.
+
+        Returns:
+            list: Ids of the matching objects.
+        """
+        class_name = class_name_of(cls)
+        columns = self.__columns(class_name)
+        if not all(name in columns for name in ranges):
+            return [obj.id for obj in self.all(class_name).values()
+                    if all((low is None or value >= low) and
+                           (high is None or value <= high)
+                           for value, (low, high) in
+                           ((to_number(getattr(obj, name, None)), bounds)
+                            for name, bounds in ranges.items()))]
+        conditions, params = ["1"], []
+        for name, (low, high) in ranges.items():
+            condition, condition_params = self.__range(class_name, name,
+                                                       low, high)
+            conditions.append(condition)
+            params.extend(condition_params)
+        rows = self.__execute(f'SELECT id FROM "{class_name}" WHERE ' +
+                              " AND ".join(conditions), params)
+        return [row[0] for row in rows]
+
+    def __points(self, class_name, min_lat, max_lat):
+        """Yields (id, lat, lon) of the objects within a latitude band."""
+        lat_condition, params = self.__range(class_name, "latitude",
+                                             min_lat, max_lat)
+        lon_condition, lon_params = self.__range(class_name, "longitude",
+                                                 -180, 180)
+        rows = self.__execute(
+                f'SELECT id, latitude, longitude FROM "{class_name}" '
+                f'WHERE {lat_condition} AND {lon_condition}',
+                params + lon_params)
+        model = self.__models[class_name]
+        for obj_id, lat, lon in rows:
+            yield (obj_id, model.latitude if lat is None else lat,
+                   model.longitude if lon is None else lon)
+
+    def nearby(self, lat, lon, radius, cls="Place"):
+        """
+        Returns the objects within radius km of a point, nearest first.
+
+        Parameters:
+            lat, lon (float): The point, in degrees.
+            radius (float): Search radius, in kilometres.
+            cls: Model class or class name with coordinates.
+
+        Returns:
+            list: (id, distance in km) pairs sorted by distance.
+        """
+        lat_span = radius / KM_PER_DEGREE
+        found = []
+        for obj_id, point_lat, point_lon in self.__points(
+                class_name_of(cls), lat - lat_span, lat + lat_span):
+            distance = haversine(lat, lon, point_lat, point_lon)
+            if distance <= radius:
+                found.append((obj_id, distance))
+        return sorted(found, key=lambda item: item[1])
+
+    def within(self, min_lat, min_lon, max_lat, max_lon, cls="Place"):
+        """
+        Returns the objects inside a bounding box.
+
+        Parameters:
+            min_lat, min_lon, max_lat, max_lon (float): The box, in
+            degrees; min_lon greater than max_lon crosses the antimeridian.
+            cls: Model class or class name with coordinates.
+
+        Returns:
+            list: Ids of the objects in the box.
+        """
+        found = []
+        for obj_id, lat, lon in self.__points(class_name_of(cls),
+                                              min_lat, max_lat):
+            if min_lon <= max_lon:
+                inside = min_lon <= lon <= max_lon
+            else:
+                inside = lon >= min_lon or lon <= max_lon
+            if inside:
+                found.append(obj_id)
+        return found
+
+    def query(self, cls):
+        """
+        Returns a query over the objects of a class, read lazily through
+        find(), filter() and all() once iterated.
+
+        Parameters:
+            cls: Model class or class name.
+
+        Returns:
+            Query: For example
+            query(Place).where(price_by_night__lt=100)
+            .order_by("price_by_night").limit(20).offset(40).
+        """
+        return Query(self, cls)
+
+    def search(self, cls, text, limit=None):
+        """
+        Returns the objects of a class whose text attributes contain terms
+        of text, best match first (BM25), ranked as FileStorage.search()
+        ranks them.
+
+        The database keeps no text index: the rows of the class are
+        indexed for each search.
+
+        Parameters:
+            cls: Model class or class name with text attributes (Place,
+            Review).
+            text (str): Search terms.
+            limit (int): Maximum number of results, or None for all.
+
+        Returns:
+            list: (id, score) pairs, best first.
+
+        Raises:
+            KeyError: If cls has no text attributes.
+        """
+        class_name = class_name_of(cls)
+        index = TextIndex(class_name, TEXT_ATTRIBUTES[class_name])
+        index.build(self.all(class_name))
+        return [(key.split(".", 1)[1], score)
+                for key, score in index.search(text, limit)]
+
+    def aggregate(self, cls, function, name=None, by=None):
+        """
+        Returns the count, sum, average, minimum or maximum of a numeric
+        attribute of a class, over every object or per group.
+
+        Numeric columns grouped by a column are aggregated by SQLite, a
+        NULL standing for the class default as in filter(); other
+        attributes are aggregated over the instances of the class.
+
+        Parameters:
+            cls: Model class or class name.
+            function (str): One of count, sum, avg, min and max.
+            name (str): The aggregated attribute; count counts objects
+            and needs none.
+            by (str): Attribute to group by, or None for one result over
+            the whole class.
+
+        Returns:
+            The result, or a {group value: result} dict when by is given.
+
+        Raises:
+            ValueError: If function is unknown or lacks an attribute.
+        """
+        check_aggregate(function, name)
+        if function == "count":
+            name = None
+        class_name = class_name_of(cls)
+        model = self.__models[class_name]
+        columns = self.__columns(class_name)
+        if (name is None or name in columns and
+                is_number(getattr(model, name))) and \
+                (by is None or by in columns):
+            results = {group: summarize(function, *totals)
+                       for group, totals in
+                       self.__aggregate_rows(class_name, name, by).items()}
+        else:
+            aggregate = Aggregate(class_name, name, by)
+            for key, obj in self.all(class_name).items():
+                aggregate.add(key, obj)
+            results = aggregate.results(function)
+        if by is not None:
+            return results
+        if None in results:
+            return results[None]
+        return summarize(function, 0, 0, 0, None, None)
+
+    def __aggregate_rows(self, class_name, name, by):
+        """Returns group value -> (count, numbers, total, low, high) of
+        a numeric column grouped by a column, from one GROUP BY."""
+        model = self.__models[class_name]
+        params = []
+        value = "NULL"
+        if name is not None:
+            value = (f'CASE WHEN "{name}" IS NULL THEN ? '
+                     f'WHEN typeof("{name}") IN (\'integer\', \'real\') '
+                     f'THEN "{name}" END')
+            params.append(getattr(model, name))
+        group = "NULL" if by is None else f'"{by}"'
+        rows = self.__execute(
+                f"SELECT g, COUNT(*), COUNT(v), TOTAL(v), MIN(v), MAX(v), "
+                f"SUM(v) FROM (SELECT {group} AS g, {value} AS v "
+                f'FROM "{class_name}") GROUP BY g', params)
+        default = None if by is None else getattr(model, by)
+        groups = {}
+        for group, count, numbers, total, low, high, exact in rows:
+            # SUM() keeps integer sums exact, TOTAL() is 0.0 when empty
+            total = total if exact is None else exact
+            if group is None:
+                group = default
+            if group in groups:
+                # NULL and the default stored as such are the same group
+                other = groups[group]
+                count += other[0]
+                numbers += other[1]
+                total += other[2]
+                low = min((v for v in (low, other[3]) if v is not None),
+                          default=None)
+                high = max((v for v in (high, other[4]) if v is not None),
+                           default=None)
+            groups[group] = (count, numbers, total, low, high)
+        return groups
+
+    def new(self, obj):
+        """
+        Adds a new object to the storage, written on the next read or save.
+
+        Parameters:
+            obj: The object to be added.
+
+        Returns:
+            None
+        """
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        self.__objects[key] = obj
+        self.__pending[key] = obj
+
+    def delete(self, obj):
+        """
+        Removes an object from the storage.
+
+        Parameters:
+            obj: The object to be removed.
+
+        Returns:
+            bool: True if the object was stored, False otherwise.
+        """
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        stored = self.get(obj.__class__.__name__, obj.id) is not None
+        self.__objects.pop(key, None)
+        if stored:
+            self.__pending[key] = None
+        return stored
+
+    def track(self, obj, name, old):
+        """
+        Marks a stored object as changed after an attribute update.
+
+        Parameters:
+            obj: The updated object.
+            name (str): The updated attribute.
+            old: The value the attribute had before.
+
+        Returns:
+            None
+        """
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        if self.__objects.get(key) is obj:
+            self.__pending[key] = obj
+
+    def __write(self):
+        """Writes the pending changes into the open transaction."""
+        if self.__connection is None:
+            self.reload()
+        if not self.__pending:
+            return
+        # Swapped rather than cleared: objects may be tracked from another
+        # thread meanwhile (see models.engine.async_storage)
+        pending, self.__pending = self.__pending, {}
+        rows, deleted = {}, {}
+        for key, obj in pending.items():
+            class_name, obj_id = key.split(".", 1)
+            if obj is None:
+                deleted.setdefault(class_name, []).append((obj_id,))
+            else:
+                rows.setdefault(class_name, []).append(self.__to_row(obj))
+        connection = self.__connection
+        if not connection.in_transaction:
+            connection.execute("BEGIN")
+        for class_name, class_rows in deleted.items():
+            connection.executemany(
+                    f'DELETE FROM "{class_name}" WHERE id = ?', class_rows)
+        for class_name, class_rows in rows.items():
+            marks = ", ".join("?" * len(class_rows[0]))
+            connection.executemany(
+                    f'INSERT OR REPLACE INTO "{class_name}" '
+                    f'VALUES ({marks})', class_rows)
+
+    def save(self):
+        """
+        Commits the pending changes in a single transaction.
+
+        Inside a batch the commit is deferred until commit(), or until
+        the batch reaches its max_saves or max_delay limit.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self.__batch_depth:
+            self.__batch_saves += 1
+            if self.__batch_max_saves is not None and \
+                    self.__batch_saves >= self.__batch_max_saves:
+                self.__flush()
+            elif self.__batch_max_delay is not None and \
+                    time.monotonic() - self.__batch_started \
+                    >= self.__batch_max_delay:
+                self.__flush()
+            return
+        self.__flush()
+
+    def __flush(self):
+        """Commits the changes, resetting the batch counters."""
+        self.__batch_saves = 0
+        self.__batch_started = time.monotonic()
+        self.__write()
+        if self.__connection.in_transaction:
+            self.__connection.execute("COMMIT")
+        self.__version = self.__data_version()
+
+    def begin(self, max_saves=None, max_delay=None):
+        """
+        Starts deferring commits until the matching commit().
+
+        Batches nest: only the outermost commit() writes.
+
+        Parameters:
+            max_saves (int): Deferred saves after which the batch is
+            committed early, or None for no limit.
+            max_delay (float): Seconds after which the next deferred save
+            commits the batch early, or None for no limit.
+
+        Returns:
+            None
+        """
+        if self.__batch_depth == 0:
+            self.__batch_saves = 0
+            self.__batch_started = time.monotonic()
+            self.__batch_max_saves = max_saves
+            self.__batch_max_delay = max_delay
+        self.__batch_depth += 1
+
+    def commit(self):
+        """
+        Ends the current batch, committing the deferred saves once when
+        the outermost batch ends.
+
+        Parameters:
+            None
+
+        Returns:
+            bool: True if a batch was open, False otherwise.
+        """
+        if self.__batch_depth == 0:
+            return False
+        self.__batch_depth -= 1
+        if self.__batch_depth == 0 and self.__batch_saves:
+            self.__flush()
+        return True
+
+    @contextmanager
+    def batch(self, max_saves=None, max_delay=None):
+        """
+        Context manager deferring every save of its block to a single
+        transaction committed when the block exits.
+
+        Parameters:
+            max_saves (int): See begin().
+            max_delay (float): See begin().
+
+        Returns:
+            The storage itself.
+        """
+        self.begin(max_saves, max_delay)
+        try:
+            yield self
+        finally:
+            self.commit()
+
+    def __data_version(self):
+        """Returns the PRAGMA data_version of the connection."""
+        return self.__connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def reload(self):
+        """
+        Opens the database, creating the tables and indexes missing from
+        it, and drops the cached objects that have no pending change so
+        that they are read again from the database.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self.__connection is None:
+            # Transactions are opened explicitly, by __write(); the
+            # connection may be handed to the thread of an AsyncStorage
+            self.__connection = sqlite3.connect(self.__path,
+                                                isolation_level=None,
+                                                check_same_thread=False)
+        for class_name in self.__models:
+            columns = self.__columns(class_name)
+            # Declared without a type, so values keep the type they had
+            definitions = "".join(f', "{name}"' for name in columns)
+            self.__connection.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{class_name}" '
+                    f'(id TEXT PRIMARY KEY, created_at TEXT, '
+                    f'updated_at TEXT{definitions}, extra TEXT)')
+            for name in INDEXED_COLUMNS:
+                if name in columns:
+                    self.__connection.execute(
+                            f'CREATE INDEX IF NOT EXISTS '
+                            f'"{class_name}_{name}" '
+                            f'ON "{class_name}" ("{name}")')
+        self.__objects = {key: obj for key, obj in self.__objects.items()
+                          if key in self.__pending}
+        self.__version = self.__data_version()
+
+    def refresh(self):
+        """
+        Drops the cached objects and the uncommitted changes if another
+        connection committed since this one last read or wrote, so that
+        every object is read again from the database.
+
+        Nothing is dropped inside a batch, whose deferred changes would
+        otherwise be lost.
+
+        Parameters:
+            None
+
+        Returns:
+            bool: True if the cache was dropped, False otherwise.
+        """
+        if self.__connection is None:
+            self.reload()
+        if self.__batch_depth:
+            return False
+        if self.__data_version() == self.__version:
+            return False
+        if self.__connection.in_transaction:
+            self.__connection.execute("ROLLBACK")
+        self.__pending.clear()
+        self.__objects = {}
+        self.__version = self.__data_version()
+        return True
+
+    def close(self):
+        """
+        Commits the pending changes and closes the connection.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self.__connection is None and not self.__pending:
+            return
+        self.__flush()
+        self.__connection.close()
+        self.__connection = None
+        self.__objects = {}
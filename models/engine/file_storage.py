@@ -1,6 +1,13 @@
 #!/usr/bin/python3
 
+import atexit
 import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime
+from functools import partial, wraps
 from os.path import exists
 from models.base_model import BaseModel
 from models.user import User
@@ -9,6 +16,29 @@ from models.city import City
 from models.amenity import Amenity
 from models.place import Place
 from models.review import Review
+from models.compact import compact_model
+from models.engine.aggregates import Aggregate, check_aggregate, summarize
+from models.engine.atomic import append_file, write_files
+from models.engine.columns import VECTORIZED, ColumnIndex, to_number
+from models.engine.formats import RecordFormat, get_format
+from models.engine.indexes import AttributeIndex, ClassIndex, class_name_of
+from models.engine.locking import ConflictError, FileLock
+from models.engine.parallel import decode_chunks, file_format, split_file
+from models.engine.query import Query
+from models.engine.records import RecordFile, is_record_file, write_index
+from models.engine.search import TEXT_ATTRIBUTES, TextIndex
+from models.engine.shards import list_shards, shard_of, shard_path
+from models.engine.spatial import GridIndex
+
+
+def synchronized(method):
+    """Makes a FileStorage method hold the storage mutex, a real lock only
+    in thread-safe mode (see FileStorage.enable_threading())."""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with FileStorage._FileStorage__mutex:
+            return method(self, *args, **kwargs)
+    return locked
 
 
 class FileStorage:
@@ -19,17 +49,199 @@ class FileStorage:
     Attributes:
     - __file_path (str): Path to the JSON file for storing serialized objects.
     - __objects (dict): Dictionary to store instances of objects.
+    - __journal (bool): Whether saves append to a write-ahead log instead
+      of rewriting the whole JSON file.
+    - __journal_limit (int): Number of log records after which the log is
+      compacted back into the JSON file.
+    - __pending (dict): Keys changed since the last save, mapped to the
+      object to write or None for a deletion.
+    - __base (dict): Keys changed since the last save, mapped to the
+      record they had when this process read them (None for new
+      objects), to tell whether another process changed them too.
+    - __gone (set): Keys of instances held by callers whose object
+      another process deleted; they are detached and can no longer be
+      changed or saved.
+    - __locking (bool): Whether reads and writes take the advisory lock
+      shared by every process using the store.
+    - __lock (FileLock): The lock of the current store.
+    - __mutex: Lock held by every public method; an RLock in thread-safe
+      mode, otherwise a no-op context manager.
+    - __io: Lock held, after __mutex, while the files of the store are
+      read or written; an RLock in thread-safe mode, otherwise a no-op
+      context manager. The writer thread writes holding it but not
+      __mutex, so that other threads keep using the objects meanwhile.
+    - __writer (Thread): The background writer thread in thread-safe
+      mode, or None.
+    - __requests (Condition): Guards and signals the counters below.
+    - __requested (int): Saves requested from the writer thread.
+    - __written (int): Saves the writer thread has written.
+    - __writer_error (Exception): First failed write of the writer
+      thread not reported yet, or None.
+    - __stopping (bool): Whether the writer thread should exit once the
+      saves requested are written.
+    - __class_index (ClassIndex): Objects grouped by class name.
+    - __attribute_indexes (dict): (class name, attribute) -> AttributeIndex
+      for the declared relationship attributes.
+    - __columns (dict): class name -> ColumnIndex of its numeric
+      attributes (Place prices, capacities and coordinates).
+    - __spatial (dict): class name -> GridIndex of its latitude and
+      longitude.
+    - __aggregates (dict): (class name, attribute, grouping attribute) ->
+      Aggregate, materialized by the first aggregate() call asking for
+      it.
+    - __text (dict): class name -> TextIndex of its free-text attributes
+      (Place name and description, Review text), saved next to the JSON
+      file by compact(), at exit, or by a save once __text_limit
+      documents changed.
+    - __text_limit (int): Documents a text index changes by after which
+      a save writes it too.
+    - __indexes (list): Every index notified of changes to __objects.
+    - __lazy (bool): Whether reload() keeps records as raw dictionaries
+      and only builds instances when they are first accessed.
+    - __stamp (tuple): (inode, size, mtime) of the JSON file and its log
+      as last read or written by this process.
+    - __batch_depth (int): Number of open batches; saves are deferred
+      while it is above zero.
+    - __batch_saves (int): Saves deferred since the last flush.
+    - __batch_max_saves (int): Deferred saves that force a flush, or None.
+    - __batch_max_delay (float): Seconds after which a deferred save
+      forces a flush, or None.
+    - __format (str): Name of the format snapshots are written in, or
+      None to keep the format of the file read by reload().
+    - __disk_format (str): Format detected by the last reload().
+    - __encoded (dict): key -> cached encoding of the object in the
+      snapshot format, dropped whenever the object changes.
+    - __encoded_format (str): Format the cached encodings are in.
+    - __buckets (int): 0 for the single JSON file layout, otherwise the
+      number of hash buckets per class in the sharded layout, a directory
+      of one file per class (and bucket) next to the JSON file.
+    - __dirty_shards (set): Shards changed since they were last written.
+    - __unread (dict): class name -> shard files not read yet; in lazy
+      mode a class is only read when a command first needs it.
+    - __fsync (bool): Whether writes are flushed to disk (fsync) before
+      save() returns; they are atomic renames either way.
+    - __workers (int): Worker processes reload() decodes the files
+      with, or 0 to decode them in this process.
+    - __compact (bool): Whether reloaded records are built as compact,
+      __slots__-backed instances (see models.compact).
+    - __raw (dict): class name -> {key: dict} of the records not built
+      into instances yet in lazy mode.
 
     Methods:
-    - all(self): Returns a dictionary of all objects currently stored.
+    - all(self, cls): Returns a dictionary of all objects currently stored,
+      or only those of one class.
+    - count(self, cls): Returns the number of stored objects.
+    - get(self, cls, obj_id): Returns one object by class and id.
+    - fetch(self, cls, ids): Returns the objects of a class with the
+      given ids.
+    - find(self, cls, name, value): Returns the objects of a class whose
+      attribute equals value.
+    - add_index(self, cls, name): Declares an attribute index.
+    - filter(self, cls, **ranges): Returns the ids of the objects whose
+      numeric attributes fall within ranges.
+    - nearby(self, lat, lon, radius, cls): Returns the ids of the objects
+      within radius km of a point, nearest first.
+    - within(self, min_lat, min_lon, max_lat, max_lon, cls): Returns the
+      ids of the objects inside a bounding box.
+    - query(self, cls): Returns a chainable query over the objects of a
+      class.
+    - search(self, cls, text, limit): Returns the ids of the objects
+      whose text matches search terms, best first.
+    - aggregate(self, cls, function, name, by): Returns the count, sum,
+      average, minimum or maximum of an attribute, per group if asked.
     - new(self, obj): Adds a new object to the __objects dictionary.
+    - delete(self, obj): Removes an object from the __objects dictionary.
+    - track(self, obj, name, old): Keeps indexes in sync with an attribute
+      update.
     - save(self): Serializes and saves the current objects to the JSON file.
-    - reload(self): Deserializes objects from the JSON file and
-      updates __objects.
+    - reload(self, lazy): Deserializes objects from the JSON file and
+      updates __objects, or only their raw records in lazy mode.
+    - refresh(self): Reloads only if the files changed on disk.
+    - begin(self, max_saves, max_delay): Starts deferring saves.
+    - commit(self): Ends a batch, writing the deferred saves once.
+    - batch(self, max_saves, max_delay): Context manager around
+      begin() and commit().
+    - set_format(self, name): Selects the format snapshots are written in.
+    - migrate(self, name): Rewrites the snapshot in another format.
+    - enable_sharding(self, buckets): Switches to the sharded layout.
+    - disable_sharding(self): Switches back to the single JSON file.
+    - enable_compact(self): Builds reloaded records as compact instances.
+    - disable_compact(self): Builds reloaded records as regular instances.
+    - enable_locking(self): Coordinates with other processes through
+      file locks and merges their changes on save.
+    - disable_locking(self): Stops taking file locks.
+    - enable_fsync(self): Flushes every write to disk before returning.
+    - disable_fsync(self): Leaves flushing writes to the OS.
+    - enable_threading(self): Locks every method and writes saves from
+      a background thread.
+    - disable_threading(self): Writes from save() itself again.
+    - flush(self): Waits for the saves queued to the writer thread.
+    - enable_parallel_reload(self, workers): Decodes the files across
+      a pool of processes on reload.
+    - disable_parallel_reload(self): Decodes them in this process.
+    - enable_journal(self, limit): Switches saves to the append-only log.
+    - disable_journal(self): Compacts the log and goes back to full saves.
+    - compact(self): Folds the log back into the JSON file.
     """
 
     __file_path = "file.json"
     __objects = {}
+    __journal = False
+    __journal_limit = 1000
+    __journal_records = 0
+    __pending = {}
+    __base = {}
+    __gone = set()
+    __locking = True
+    __lock = None
+    __mutex = nullcontext()
+    __io = nullcontext()
+    __writer = None
+    __requests = None
+    __requested = 0
+    __written = 0
+    __writer_error = None
+    __stopping = False
+    __class_index = ClassIndex()
+    __attribute_indexes = {
+            ("City", "state_id"): AttributeIndex("City", "state_id"),
+            ("Place", "city_id"): AttributeIndex("Place", "city_id"),
+            ("Place", "user_id"): AttributeIndex("Place", "user_id"),
+            ("Review", "place_id"): AttributeIndex("Review", "place_id"),
+            ("Review", "user_id"): AttributeIndex("Review", "user_id"),
+    }
+    __columns = {
+            "Place": ColumnIndex("Place", (
+                "price_by_night", "max_guest", "number_rooms",
+                "number_bathrooms", "latitude", "longitude")),
+    }
+    __spatial = {"Place": GridIndex("Place")}
+    __aggregates = {}
+    __text = {class_name: TextIndex(class_name, names)
+              for class_name, names in TEXT_ATTRIBUTES.items()}
+    __text_limit = 1000
+    __indexes = [__class_index, *__attribute_indexes.values(),
+                 *__columns.values(), *__spatial.values(),
+                 *__text.values()]
+    __indexed = None
+    __lazy = False
+    __raw = {}
+    __stamp = None
+    __batch_depth = 0
+    __batch_saves = 0
+    __batch_started = None
+    __batch_max_saves = None
+    __batch_max_delay = None
+    __format = None
+    __disk_format = "json"
+    __compact = False
+    __fsync = True
+    __workers = 0
+    __encoded = {}
+    __encoded_format = None
+    __buckets = 0
+    __dirty_shards = set()
+    __unread = {}
     __models = {
             "BaseModel": BaseModel,
             "User": User,
@@ -40,71 +252,1589 @@ class FileStorage:
             "Review": Review
     }
 
-    def all(self):
+    @synchronized
+    def all(self, cls=None):
         """
         Returns a dictionary of all objects currently stored.
 
         Parameters:
+            cls: Optional model class or class name to filter on.
+
+        Returns:
+            dict: Dictionary containing all stored objects, or a new
+            dictionary holding only the objects of cls. In thread-safe
+            mode it is always a new dictionary, that other threads'
+            changes cannot alter while it is iterated.
+        """
+        self.__sync()
+        self.__hydrate(cls)
+        if cls is None:
+            if FileStorage.__writer is not None:
+                return dict(self.__objects)
+            return self.__objects
+        return dict(self.__class_index.lookup(cls))
+
+    @synchronized
+    def count(self, cls=None):
+        """
+        Returns the number of stored objects.
+
+        Parameters:
+            cls: Optional model class or class name to count.
+
+        Returns:
+            int: Number of objects, of cls only when given.
+        """
+        self.__sync()
+        self.__read_shards(cls)
+        if cls is None:
+            return len(self.__objects) + sum(
+                    len(records) for records in self.__raw.values())
+        return (len(self.__class_index.lookup(cls)) +
+                len(self.__raw.get(class_name_of(cls), ())))
+
+    @synchronized
+    def get(self, cls, obj_id):
+        """
+        Returns one object by class and id.
+
+        Parameters:
+            cls: Model class or class name.
+            obj_id (str): The object id.
+
+        Returns:
+            The stored object, or None if there is none.
+        """
+        self.__sync()
+        self.__read_shards(cls)
+        class_name = class_name_of(cls)
+        key = f"{class_name}.{obj_id}"
+        records = self.__raw.get(class_name)
+        if records and key in records:
+            self.__store(key, self.__build(class_name, records.pop(key)), True)
+        return self.__objects.get(key)
+
+    @synchronized
+    def fetch(self, cls, ids):
+        """
+        Returns the objects of a class with the given ids, as a batch of
+        get() calls.
+
+        Parameters:
+            cls: Model class or class name.
+            ids (iterable): Object ids, such as those filter() returns.
+
+        Returns:
+            list: The stored objects, in the order of ids, skipping the
+            ids with no object.
+        """
+        self.__sync()
+        self.__read_shards(cls)
+        class_name = class_name_of(cls)
+        records = self.__raw.get(class_name)
+        found = []
+        for obj_id in ids:
+            key = f"{class_name}.{obj_id}"
+            if records and key in records:
+                self.__store(key, self.__build(class_name, records.pop(key)),
+                             True)
+            obj = self.__objects.get(key)
+            if obj is not None:
+                found.append(obj)
+        return found
+
+    @synchronized
+    def find(self, cls, name, value):
+        """
+        Returns the objects of a class whose attribute equals value.
+
+        Declared attribute indexes answer in time proportional to the
+        result; other attributes fall back to a scan of the class.
+
+        Parameters:
+            cls: Model class or class name.
+            name (str): Attribute name.
+            value: Value to look for.
+
+        Returns:
+            dict: {key: obj} of the matching objects.
+        """
+        self.__sync()
+        self.__hydrate(cls)
+        index = self.__attribute_indexes.get((class_name_of(cls), name))
+        if index is not None:
+            return dict(index.lookup(value))
+        return {key: obj
+                for key, obj in self.__class_index.lookup(cls).items()
+                if getattr(obj, name, None) == value}
+
+    @synchronized
+    def add_index(self, cls, name):
+        """
+        Declares an attribute index, built from the objects already stored.
+
+        Parameters:
+            cls: Model class or class name.
+            name (str): Attribute name.
+
+        Returns:
             None
+        """
+        self.__sync()
+        self.__hydrate(cls)
+        index_key = (class_name_of(cls), name)
+        if index_key in self.__attribute_indexes:
+            return
+        index = AttributeIndex(cls, name)
+        for key, obj in self.__class_index.lookup(cls).items():
+            index.add(key, obj)
+        self.__attribute_indexes[index_key] = index
+        self.__indexes.append(index)
+
+    @synchronized
+    def filter(self, cls, **ranges):
+        """
+        Returns the ids of the objects of a class whose numeric attributes
+        fall within the given ranges.
+
+        Classes with columns (Place) are filtered over their arrays, with
+        NumPy when available; other classes fall back to a scan.
+
+        Parameters:
+            cls: Model class or class name.
+            **ranges: attribute name -> (low, high), both inclusive; None
+            leaves a side open. For example
+            filter(Place, price_by_night=(None, 100), max_guest=(4, None)).
+
+        Returns:
+            list: Ids of the matching objects.
+        """
+        self.__sync()
+        self.__hydrate(cls)
+        columns = self.__columns.get(class_name_of(cls))
+        if columns is not None and all(name in columns.columns
+                                       for name in ranges):
+            keys = columns.filter(**ranges)
+        else:
+            keys = [key for key, obj in self.__class_index.lookup(cls).items()
+                    if all(self.__within(to_number(getattr(obj, name, None)),
+                                         low, high)
+                           for name, (low, high) in ranges.items())]
+        return [key.split(".", 1)[1] for key in keys]
+
+    @synchronized
+    def nearby(self, lat, lon, radius, cls="Place"):
+        """
+        Returns the objects within radius km of a point, nearest first.
+
+        Parameters:
+            lat, lon (float): The point, in degrees.
+            radius (float): Search radius, in kilometres.
+            cls: Model class or class name with a spatial index.
+
+        Returns:
+            list: (id, distance in km) pairs sorted by distance.
+
+        Raises:
+            KeyError: If cls has no spatial index.
+        """
+        self.__sync()
+        self.__hydrate(cls)
+        grid = self.__spatial[class_name_of(cls)]
+        return [(key.split(".", 1)[1], distance)
+                for key, distance in grid.nearby(lat, lon, radius)]
+
+    @synchronized
+    def within(self, min_lat, min_lon, max_lat, max_lon, cls="Place"):
+        """
+        Returns the objects inside a bounding box.
+
+        Parameters:
+            min_lat, min_lon, max_lat, max_lon (float): The box, in
+            degrees; min_lon greater than max_lon crosses the antimeridian.
+            cls: Model class or class name with a spatial index.
+
+        Returns:
+            list: Ids of the objects in the box.
+
+        Raises:
+            KeyError: If cls has no spatial index.
+        """
+        self.__sync()
+        self.__hydrate(cls)
+        grid = self.__spatial[class_name_of(cls)]
+        return [key.split(".", 1)[1]
+                for key in grid.within(min_lat, min_lon, max_lat, max_lon)]
+
+    def query(self, cls):
+        """
+        Returns a query over the objects of a class, read lazily through
+        find(), filter() and all() once iterated. Numeric ranges are only
+        answered by filter() with NumPy; the loop over the columns, then
+        fetch(), costs more than a scan.
+
+        Parameters:
+            cls: Model class or class name.
+
+        Returns:
+            Query: For example
+            query(Place).where(price_by_night__lt=100)
+            .order_by("price_by_night").limit(20).offset(40).
+        """
+        return Query(self, cls, filter_ranges=VECTORIZED)
+
+    @synchronized
+    def search(self, cls, text, limit=None):
+        """
+        Returns the objects of a class whose text attributes contain terms
+        of text, best match first (BM25).
+
+        The text index of a class is built on its first search, from the
+        copy saved next to the JSON file when there is one (reindexing
+        only the objects changed since), then kept up to date as objects
+        are added, updated and deleted. The copy is written again by
+        compact(), at exit, or by the first save after __text_limit
+        documents changed, so that saves keep costing what they change.
+
+        Parameters:
+            cls: Model class or class name with a text index (Place,
+            Review).
+            text (str): Search terms.
+            limit (int): Maximum number of results, or None for all.
+
+        Returns:
+            list: (id, score) pairs, best first.
+
+        Raises:
+            KeyError: If cls has no text index.
+        """
+        self.__sync()
+        index = self.__text[class_name_of(cls)]
+        self.__hydrate(cls)
+        if not index.built:
+            index.build(self.__class_index.lookup(cls),
+                        self.__read_text_index(index))
+            atexit.unregister(FileStorage.__save_text_indexes)
+            atexit.register(FileStorage.__save_text_indexes)
+        return [(key.split(".", 1)[1], score)
+                for key, score in index.search(text, limit)]
+
+    @synchronized
+    def aggregate(self, cls, function, name=None, by=None):
+        """
+        Returns the count, sum, average, minimum or maximum of a numeric
+        attribute of a class, over every object or per group.
+
+        The first call for a class, attribute and grouping attribute
+        materializes an Aggregate, kept up to date as objects change like
+        the other indexes; later calls, whatever the function, cost one
+        step per group.
+
+        Parameters:
+            cls: Model class or class name.
+            function (str): One of count, sum, avg, min and max.
+            name (str): The aggregated attribute; count counts objects
+            and needs none.
+            by (str): Attribute to group by, or None for one result over
+            the whole class. For example
+            aggregate(Place, "avg", "price_by_night", by="city_id").
+
+        Returns:
+            The result, or a {group value: result} dict when by is given.
+            Values other than ints and floats are left out; avg, min and
+            max are None for objects without any.
+
+        Raises:
+            ValueError: If function is unknown or lacks an attribute.
+        """
+        check_aggregate(function, name)
+        if function == "count":
+            name = None
+        self.__sync()
+        self.__hydrate(cls)
+        aggregate_key = (class_name_of(cls), name, by)
+        aggregate = self.__aggregates.get(aggregate_key)
+        if aggregate is None:
+            aggregate = Aggregate(cls, name, by)
+            for key, obj in self.__class_index.lookup(cls).items():
+                aggregate.add(key, obj)
+            self.__aggregates[aggregate_key] = aggregate
+            self.__indexes.append(aggregate)
+        results = aggregate.results(function)
+        if by is not None:
+            return results
+        if None in results:
+            return results[None]
+        return summarize(function, 0, 0, 0, None, None)
+
+    def __text_path(self, class_name):
+        """Returns the path of the saved text index of a class."""
+        return f"{self.__file_path}.{class_name}.search"
+
+    def __read_text_index(self, index):
+        """Returns the saved copy of a text index, or None if there is
+        none or it cannot be read."""
+        try:
+            with open(self.__text_path(index.class_name), "rb") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def __text_files(self, limit):
+        """Returns path -> encoding of the text indexes by which at least
+        limit documents changed since they were last saved."""
+        return {self.__text_path(index.class_name):
+                json.dumps(index.dump()).encode("utf-8")
+                for index in self.__text.values()
+                if index.built and index.changes >= limit}
+
+    def __write_text_indexes(self, limit=1):
+        """Saves the text indexes by which at least limit documents
+        changed since they were last saved."""
+        files = self.__text_files(limit)
+        if files:
+            write_files(files, FileStorage.__fsync)
+
+    @staticmethod
+    def __save_text_indexes():
+        """Saves the changed text indexes of the store when the
+        interpreter exits."""
+        storage = FileStorage()
+        with FileStorage.__mutex, FileStorage.__io:
+            storage.__sync()
+            if exists(storage.__file_path):
+                storage.__write_text_indexes()
+
+    @staticmethod
+    def __within(value, low, high):
+        """Tells whether value is within the inclusive range [low, high]."""
+        return ((low is None or value >= low) and
+                (high is None or value <= high))
+
+    @synchronized
+    def track(self, obj, name, old):
+        """
+        Keeps indexes in sync after an attribute of a stored object changed.
+
+        Parameters:
+            obj: The updated object.
+            name (str): The updated attribute.
+            old: The value the attribute had before.
 
         Returns:
-            dict: Dictionary containing all stored objects.
+            None
+
+        Raises:
+            ConflictError: If obj is detached: another process deleted it.
+        """
+        self.__sync()
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        if self.__objects.get(key) is not obj:
+            if key in self.__gone:
+                raise ConflictError([key])
+            return
+        if key not in self.__base:
+            record = obj.to_dict()
+            record[name] = old
+            self.__base[key] = self.__version(key, record)
+        self.__changed(key)
+        # Written by the next save, in journal mode too
+        self.__pending[key] = obj
+        for index in self.__indexes:
+            index.update(key, obj, name, old)
+
+    def __sync(self):
+        """Rebuilds the indexes if __objects was replaced."""
+        if FileStorage.__indexed is self.__objects:
+            return
+        FileStorage.__indexed = self.__objects
+        FileStorage.__pending = {}
+        FileStorage.__base = {}
+        FileStorage.__gone = set()
+        FileStorage.__raw = {}
+        FileStorage.__encoded = {}
+        FileStorage.__dirty_shards = set()
+        FileStorage.__unread = {}
+        for index in self.__indexes:
+            index.clear()
+        for key, obj in self.__objects.items():
+            for index in self.__indexes:
+                index.add(key, obj)
+
+    def __changed(self, key):
+        """Drops the cached encoding of key and marks its shard dirty."""
+        self.__encoded.pop(key, None)
+        if FileStorage.__buckets:
+            self.__dirty_shards.add(shard_of(key, FileStorage.__buckets))
+
+    def __read_shards(self, cls=None):
+        """Reads the shard files of cls (of every class if None) not
+        read yet."""
+        if not self.__unread:
+            return
+        if cls is None:
+            class_names = list(self.__unread)
+        else:
+            class_names = [class_name_of(cls)]
+        paths = []
+        for class_name in class_names:
+            paths.extend(self.__unread.pop(class_name, ()))
+        with self.__locked():
+            for records in self.__read_files(paths):
+                for key, obj_dict in records:
+                    self.__load(key, obj_dict)
+
+    def __stream_file(self, path):
+        """Yields the (key, obj_dict) records of a snapshot or shard
+        file, reading them one at a time (see Format.stream())."""
+        fmt = file_format(path, self.__allowed())
+        FileStorage.__disk_format = fmt.name
+        with open(path, "rb") as file:
+            yield from fmt.stream(file)
+
+    def __read_files(self, paths):
+        """Returns the (key, obj_dict) records of each of several files,
+        streamed, or decoded by a pool of processes when enabled (see
+        enable_parallel_reload())."""
+        workers = FileStorage.__workers
+        if workers < 2 or not paths:
+            return [self.__stream_file(path) for path in paths]
+        if len(paths) == 1:
+            chunks = split_file(paths[0], workers * 4)
+            if len(chunks) == 1:
+                return [self.__stream_file(paths[0])]
+        else:
+            chunks = [(path, None, 0, None) for path in paths]
+        allowed = self.__allowed()
+        FileStorage.__disk_format = file_format(paths[0], allowed).name
+        return [records.items()
+                for records in decode_chunks(chunks, workers, allowed)]
+
+    def __allowed(self):
+        """Returns the unsafe formats reload() may decode: only the one
+        selected with set_format(), if any."""
+        if FileStorage.__format is None:
+            return ()
+        return (FileStorage.__format,)
+
+    def __hydrate(self, cls=None):
+        """Builds the instances still held as raw records in lazy mode."""
+        self.__read_shards(cls)
+        if not self.__raw:
+            return
+        if cls is None:
+            class_names = list(self.__raw)
+        else:
+            class_names = [class_name_of(cls)]
+        for class_name in class_names:
+            records = self.__raw.pop(class_name, None)
+            if not records:
+                continue
+            model = self.__model(class_name)
+            for key, obj_dict in records.items():
+                self.__store(key, model(**obj_dict), True)
+
+    def __model(self, class_name):
+        """Returns the class records of class_name are built with."""
+        model = self.__models[class_name]
+        if FileStorage.__compact:
+            return compact_model(model)
+        return model
+
+    def __build(self, class_name, obj_dict):
+        """Builds an instance from a record read from disk."""
+        return self.__model(class_name)(**obj_dict)
+
+    def __load(self, key, obj_dict):
+        """Stores a record read from disk, as an instance or raw dict."""
+        class_name = key.split(".")[0]
+        if FileStorage.__lazy:
+            self.__unstore(key)
+            self.__raw.setdefault(class_name, {})[key] = obj_dict
+        else:
+            self.__store(key, self.__build(class_name, obj_dict))
+
+    def __store(self, key, obj, unchanged=False):
+        """
+        Stores obj under key, replacing and unindexing any previous one.
+        unchanged tells that obj was built from the record already cached
+        for key, whose encoding can then be kept.
         """
-        return self.__objects
+        if not unchanged:
+            self.__changed(key)
+        if self.__raw:
+            records = self.__raw.get(obj.__class__.__name__)
+            if records:
+                records.pop(key, None)
+        previous = self.__objects.get(key)
+        if previous is obj:
+            return
+        if previous is not None:
+            for index in self.__indexes:
+                index.remove(key, previous)
+        self.__objects[key] = obj
+        for index in self.__indexes:
+            index.add(key, obj)
 
+    def __unstore(self, key):
+        """Removes the object stored under key, returning it."""
+        removed = False
+        if self.__raw:
+            records = self.__raw.get(key.split(".")[0])
+            if records:
+                removed = records.pop(key, None) is not None
+        obj = self.__objects.pop(key, None)
+        if obj is not None:
+            removed = True
+            for index in self.__indexes:
+                index.remove(key, obj)
+        if removed:
+            self.__changed(key)
+        return obj
+
+    @synchronized
     def new(self, obj):
         """
         Adds a new object to the __objects dictionary.
 
+        A copy of a stored object, such as one rebuilt from its to_dict(),
+        replaces the instance stored under the same key, which is no
+        longer tracked.
+
         Parameters:
             obj: The object to be added.
 
         Returns:
             None
+
+        Raises:
+            ConflictError: If obj is detached: another process deleted it.
         """
+        self.__sync()
         key = f"{obj.__class__.__name__}.{obj.id}"
-        self.__objects[key] = obj
+        if key in self.__gone:
+            raise ConflictError([key])
+        if key not in self.__base:
+            self.__base[key] = self.__stored_version(key)
+        self.__store(key, obj)
+        self.__pending[key] = obj
+
+    @synchronized
+    def delete(self, obj):
+        """
+        Removes an object from the __objects dictionary.
+
+        Parameters:
+            obj: The object to be removed.
+
+        Returns:
+            bool: True if the object was stored, False otherwise.
+        """
+        self.__sync()
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        self.__gone.discard(key)
+        if key not in self.__base:
+            self.__base[key] = self.__stored_version(key)
+        if self.__unstore(key) is None:
+            return False
+        self.__pending[key] = None
+        return True
 
+    @synchronized
     def save(self):
         """
         Serializes and saves the current objects to the JSON file.
 
+        Changes written by other processes since this one last read the
+        store are merged first (see compact()).
+
+        In journal mode only the objects changed since the last save are
+        appended to the log, and the log is compacted into the JSON file
+        once it holds more than __journal_limit records.
+
+        Inside a batch the write is deferred until commit(), or until the
+        batch reaches its max_saves or max_delay limit.
+
+        In thread-safe mode the write is left to the writer thread, and
+        save() returns at once; see flush().
+
         Parameters:
             None
 
         Returns:
             None
+
+        Raises:
+            ConflictError: If another process changed the same objects
+            (raised by flush() instead in thread-safe mode).
         """
-        serialised_objects = {}
+        if FileStorage.__batch_depth:
+            FileStorage.__batch_saves += 1
+            max_saves = FileStorage.__batch_max_saves
+            max_delay = FileStorage.__batch_max_delay
+            if max_saves is not None and \
+                    FileStorage.__batch_saves >= max_saves:
+                self.__schedule()
+            elif max_delay is not None and \
+                    time.monotonic() - FileStorage.__batch_started \
+                    >= max_delay:
+                self.__schedule()
+            return
+        self.__schedule()
 
-        for key, obj in self.__objects.items():
-            serialised_objects[key] = obj.to_dict()
+    @synchronized
+    def begin(self, max_saves=None, max_delay=None):
+        """
+        Starts deferring saves until the matching commit().
+
+        Batches nest: only the outermost commit() writes.
 
-        with open(self.__file_path, "w", encoding="utf-8") as file:
-            json.dump(serialised_objects, file, indent=4)
+        Parameters:
+            max_saves (int): Deferred saves after which the batch is
+            written early, or None for no limit.
+            max_delay (float): Seconds after which the next deferred save
+            writes the batch early, or None for no limit.
 
-    def reload(self):
+        Returns:
+            None
         """
-        Deserializes objects from the JSON file and updates __objects.
+        if FileStorage.__batch_depth == 0:
+            FileStorage.__batch_saves = 0
+            FileStorage.__batch_started = time.monotonic()
+            FileStorage.__batch_max_saves = max_saves
+            FileStorage.__batch_max_delay = max_delay
+        FileStorage.__batch_depth += 1
+
+    @synchronized
+    def commit(self):
+        """
+        Ends the current batch, writing the deferred saves once when the
+        outermost batch ends.
+
+        Parameters:
+            None
+
+        Returns:
+            bool: True if a batch was open, False otherwise.
+        """
+        if FileStorage.__batch_depth == 0:
+            return False
+        FileStorage.__batch_depth -= 1
+        if FileStorage.__batch_depth == 0 and FileStorage.__batch_saves:
+            self.__schedule()
+        return True
+
+    @contextmanager
+    def batch(self, max_saves=None, max_delay=None):
+        """
+        Context manager deferring every save of its block to a single
+        write when the block exits.
+
+        Parameters:
+            max_saves (int): See begin().
+            max_delay (float): See begin().
+
+        Returns:
+            The storage itself.
+        """
+        self.begin(max_saves, max_delay)
+        try:
+            yield self
+        finally:
+            self.commit()
+
+    def __schedule(self):
+        """Writes the changes now, or asks the writer thread to."""
+        if FileStorage.__writer is None:
+            self.__flush()
+            return
+        with FileStorage.__requests:
+            FileStorage.__requested += 1
+            FileStorage.__requests.notify_all()
+
+    def __write_loop(self):
+        """Body of the writer thread: each write covers every save
+        requested before it started, however many there were."""
+        requests = FileStorage.__requests
+        while True:
+            with requests:
+                while FileStorage.__written == FileStorage.__requested \
+                        and not FileStorage.__stopping:
+                    requests.wait()
+                if FileStorage.__written == FileStorage.__requested:
+                    return
+                target = FileStorage.__requested
+            error = None
+            try:
+                self.__flush()
+            except Exception as exception:
+                error = exception
+            with requests:
+                FileStorage.__written = target
+                if error is not None:
+                    FileStorage.__writer_error = error
+                requests.notify_all()
+
+    def flush(self):
+        """
+        Waits until every save requested so far is written to disk; a
+        no-op unless in thread-safe mode. Must not be called inside a
+        batch, whose saves are only requested by commit().
+
+        Parameters:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            The error of the first failed write since the last flush(),
+            such as a ConflictError.
+        """
+        requests = FileStorage.__requests
+        if FileStorage.__writer is None:
+            return
+        with requests:
+            target = FileStorage.__requested
+            while FileStorage.__written < target:
+                requests.wait()
+            error = FileStorage.__writer_error
+            FileStorage.__writer_error = None
+        if error is not None:
+            raise error
+
+    def __flush(self):
+        """
+        Writes the changes to disk, resetting the batch counters.
+
+        Only the merge and the encoding hold __mutex: the files are
+        written once it is released, still under __io and the lock of
+        the store, so that in thread-safe mode the other threads keep
+        reading and changing objects while the writer thread writes.
+        """
+        writes = []
+        try:
+            with ExitStack() as stack:
+                with FileStorage.__mutex:
+                    FileStorage.__batch_saves = 0
+                    FileStorage.__batch_started = time.monotonic()
+                    stack.enter_context(self.__locked(exclusive=True))
+                    conflicts = self.__merge()
+                    if not FileStorage.__journal:
+                        writes.append(self.__snapshot())
+                    else:
+                        records = FileStorage.__journal_records + \
+                                len(self.__pending)
+                        writes.append(self.__log_records())
+                        if records > FileStorage.__journal_limit:
+                            writes.append(self.__snapshot(text_limit=1))
+                while writes:
+                    write, _ = writes[0]
+                    write()
+                    writes.pop(0)
+        except BaseException:
+            with FileStorage.__mutex:
+                for _, taken in writes:
+                    self.__put_back(taken)
+            raise
+        if conflicts:
+            raise ConflictError(conflicts)
+
+    @synchronized
+    def compact(self):
+        """
+        Writes every stored object to the JSON file and drops the log.
+
+        Each object is encoded once and its encoding cached until it
+        changes (an attribute update, save() or new()), so only the
+        objects changed since the last write go through to_dict() and
+        the encoder again. In the sharded layout only the shard files
+        holding changed objects are rewritten.
+
+        Files are never truncated: each is written to a temporary file,
+        flushed with fsync, and renamed over the old one, so a crash
+        leaves either the previous or the new snapshot on disk.
+
+        The write holds the exclusive lock of the store, and first merges
+        the changes other processes wrote since this one last read it.
+        The text indexes changed since they were last saved are written
+        too.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            ConflictError: If another process changed objects this one
+            changed too; their version is kept and the rest is written.
+        """
+        with self.__locked(exclusive=True):
+            conflicts = self.__merge()
+            self.__write(text_limit=1)
+        if conflicts:
+            raise ConflictError(conflicts)
+
+    def __write(self, full=False, text_limit=None):
+        """Writes the snapshot (or the dirty shards, every shard if full)
+        and drops the log; see __snapshot()."""
+        write, taken = self.__snapshot(full, text_limit)
+        try:
+            write()
+        except BaseException:
+            self.__put_back(taken)
+            raise
+
+    def __snapshot(self, full=False, text_limit=None):
+        """
+        Encodes the snapshot (or the dirty shards, every shard if full)
+        and the text indexes by which at least text_limit documents
+        changed (__text_limit if None), and takes the pending changes
+        out. Returns the write, which needs __io but neither __mutex nor
+        the objects, and the changes taken, for __put_back() if it fails.
+        """
+        self.__sync()
+        fmt = self.__encoder()
+        if FileStorage.__buckets:
+            parts = self.__shard_fragments(fmt, full)
+        else:
+            fragments = []
+            for records in self.__raw.values():
+                for key, obj_dict in records.items():
+                    fragments.append(self.__fragment(fmt, key, obj_dict))
+            for key, obj in self.__objects.items():
+                fragments.append(self.__fragment(fmt, key, obj))
+            parts = {self.__file_path: fragments}
+        if text_limit is None:
+            text_limit = FileStorage.__text_limit
+        texts = self.__text_files(text_limit)
+        return (partial(self.__write_snapshot, fmt, parts, texts),
+                self.__take(shards=True))
+
+    def __write_snapshot(self, fmt, parts, texts):
+        """Writes the files encoded by __snapshot(): path -> fragments,
+        and the text indexes, then drops the log."""
+        # Every shard is renamed in place once all of them are on disk
+        write_files({path: fmt.join(fragments)
+                     for path, fragments in parts.items()},
+                    FileStorage.__fsync)
+        if self.__file_path in parts:
+            if fmt.name == RecordFormat.name:
+                write_index(self.__file_path, self.__index_path(),
+                            parts[self.__file_path])
+            elif exists(self.__index_path()):
+                os.remove(self.__index_path())
+        FileStorage.__disk_format = fmt.name
+        if texts:
+            write_files(texts, FileStorage.__fsync)
+
+        if exists(self.__log_path()):
+            os.remove(self.__log_path())
+        FileStorage.__journal_records = 0
+        FileStorage.__stamp = self.__disk_stamp()
+
+    def __take(self, shards):
+        """Takes the pending changes, and the dirty shards if shards, out
+        of the store for a write; returns them for __put_back()."""
+        taken = (self.__objects, FileStorage.__pending, FileStorage.__base,
+                 FileStorage.__dirty_shards if shards else set())
+        FileStorage.__pending = {}
+        FileStorage.__base = {}
+        if shards:
+            FileStorage.__dirty_shards = set()
+        return taken
+
+    def __put_back(self, taken):
+        """Puts back the changes taken out for a write that failed, but
+        not over the ones made since, so that the next save writes them
+        again; nothing if the store was replaced meanwhile."""
+        objects, pending, base, dirty_shards = taken
+        self.__sync()
+        if self.__objects is not objects:
+            return
+        for key, obj in pending.items():
+            self.__pending.setdefault(key, obj)
+        self.__base.update(base)
+        self.__dirty_shards.update(dirty_shards)
+
+    def __lock_path(self):
+        """Returns the path locked for the store: its directory."""
+        return os.path.dirname(os.path.abspath(self.__file_path))
+
+    @contextmanager
+    def __locked(self, exclusive=False):
+        """Holds __io, and the lock of the store, shared or exclusive, if
+        locking is enabled."""
+        with FileStorage.__io:
+            if not FileStorage.__locking:
+                yield
+                return
+            lock = FileStorage.__lock
+            if lock is None or lock.path != self.__lock_path():
+                lock = FileStorage.__lock = FileLock(self.__lock_path())
+            with lock.hold(exclusive):
+                yield
+
+    def __version(self, key, record):
+        """Returns a record in a form that can be compared: attributes
+        that are None or left at their class default are dropped, as an
+        attribute set for the first time cannot be told from those."""
+        model = self.__models[key.split(".", 1)[0]]
+        version = {}
+        for name, value in record.items():
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            if value is not None and value != getattr(model, name, None):
+                version[name] = value
+        return version
+
+    def __stored_version(self, key):
+        """Returns the version of the object stored under key, None if
+        there is none."""
+        obj = self.__objects.get(key)
+        if obj is not None:
+            return self.__version(key, obj.to_dict())
+        records = self.__raw.get(key.split(".", 1)[0])
+        if records and key in records:
+            return self.__version(key, records[key])
+        return None
+
+    def __merge(self):
+        """
+        Folds in the changes other processes wrote since this one last
+        read or wrote the store, then re-applies the changes of this one
+        on top. Returns the keys both changed, whose version on disk is
+        kept, and reset on the instance of this one.
+        """
+        if self.__disk_stamp() == FileStorage.__stamp:
+            return []
+        changes = {key: self.__objects.get(key) for key in self.__base}
+        changes.update(self.__pending)
+        pending = set(self.__pending)
+        base = dict(self.__base)
+        lazy = FileStorage.__lazy
+        conflicts = []
+        try:
+            live = self.__read_again()
+            for key, obj in changes.items():
+                live.pop(key, None)
+                self.__read_shards(key.split(".", 1)[0])
+                if self.__stored_version(key) != base.get(key):
+                    conflicts.append(key)
+                    if obj is not None and not self.__revive(key, obj):
+                        self.__gone.add(key)
+                    continue
+                if obj is None:
+                    self.__unstore(key)
+                else:
+                    self.__store(key, obj)
+                if key in pending:
+                    self.__pending[key] = obj
+            self.__settle(live)
+        finally:
+            FileStorage.__lazy = lazy
+        if not lazy:
+            self.__hydrate()
+        return conflicts
+
+    def __read_again(self):
+        """
+        Reads the store again in lazy mode, so that records stay raw
+        until __revive(), and returns the instances stored before, by
+        key. The caller restores the mode.
+        """
+        live = dict(self.__objects)
+        for key in live:
+            self.__unstore(key)
+        FileStorage.__raw = {}
+        FileStorage.__unread = {}
+        self.reload(lazy=True)
+        return live
+
+    def __settle(self, live):
+        """
+        Resets the instances returned by __read_again() to the records
+        just read, in place, so that callers holding them keep saving
+        and tracking them; the ones another process deleted are detached.
+        """
+        for key, obj in live.items():
+            if not self.__revive(key, obj):
+                self.__gone.add(key)
+
+    def __revive(self, key, obj):
+        """Resets obj to the raw record read for key, and stores it instead
+        of building a new instance. Returns False if there is none."""
+        class_name = key.split(".", 1)[0]
+        self.__read_shards(class_name)
+        records = self.__raw.get(class_name)
+        obj_dict = records.get(key) if records else None
+        if obj_dict is None:
+            return False
+        self.__reset(obj, obj_dict)
+        self.__store(key, obj, True)
+        return True
+
+    @staticmethod
+    def __reset(obj, obj_dict):
+        """Replaces every attribute of obj with those of a record."""
+        obj._clear()
+        # Built from a record, the constructor sets the attributes without
+        # notifying the storage
+        type(obj).__init__(obj, **obj_dict)
+
+    def __encoder(self):
+        """Returns the format to write, resetting the cache if it changed."""
+        fmt = get_format(FileStorage.__format or FileStorage.__disk_format)
+        if FileStorage.__encoded_format != fmt.name:
+            FileStorage.__encoded = {}
+            FileStorage.__encoded_format = fmt.name
+        return fmt
+
+    def __fragment(self, fmt, key, source):
+        """Returns the cached encoding of a record or object, encoding it
+        first if it changed."""
+        fragment = self.__encoded.get(key)
+        if fragment is None:
+            obj_dict = source if isinstance(source, dict) else source.to_dict()
+            fragment = self.__encoded[key] = fmt.fragment(key, obj_dict)
+        return fragment
+
+    def __index_path(self):
+        """Returns the path of the sidecar index of a records file."""
+        return self.__file_path + ".idx"
+
+    def __map_file(self):
+        """Maps a records file, keeping each class as a view that decodes
+        records one at a time."""
+        mapped = RecordFile(self.__file_path, self.__index_path())
+        FileStorage.__disk_format = RecordFormat.name
+        for class_name, records in mapped.views().items():
+            for key in [key for key in self.__class_index.lookup(class_name)
+                        if key in records]:
+                self.__unstore(key)
+            for key, obj_dict in self.__raw.pop(class_name, {}).items():
+                if key not in records:
+                    records[key] = obj_dict
+            self.__raw[class_name] = records
+
+    def __shard_dir(self):
+        """Returns the directory of the sharded layout."""
+        return self.__file_path + ".d"
+
+    def __shard_fragments(self, fmt, full=False):
+        """Encodes the dirty shard files, or all of them if full, and
+        returns path -> fragments."""
+        buckets = FileStorage.__buckets
+        directory = self.__shard_dir()
+        os.makedirs(directory, exist_ok=True)
+        on_disk, _ = list_shards(directory)
+        files = {}
+        if full:
+            self.__read_shards()
+            class_names = set(self.__raw) | {
+                    key.split(".", 1)[0] for key in self.__objects}
+        else:
+            class_names = {shard.split(".", 1)[0]
+                           for shard in self.__dirty_shards}
+        for class_name in class_names:
+            # Unread records of the class must not be overwritten
+            self.__read_shards(class_name)
+            if full or class_name not in on_disk:
+                # Every bucket file of a class exists, so that the number
+                # of buckets can be told from the directory on reload
+                if buckets == 1:
+                    shards = {class_name}
+                else:
+                    shards = {f"{class_name}.{bucket}"
+                              for bucket in range(buckets)}
+            else:
+                shards = {shard for shard in self.__dirty_shards
+                          if shard.split(".", 1)[0] == class_name}
+            fragments = {shard: [] for shard in shards}
+            sources = [*self.__raw.get(class_name, {}).items(),
+                       *self.__class_index.lookup(class_name).items()]
+            for key, source in sources:
+                shard = shard_of(key, buckets)
+                if shard in fragments:
+                    fragments[shard].append(
+                            self.__fragment(fmt, key, source))
+            for shard, shard_fragments in fragments.items():
+                files[shard_path(directory, shard)] = shard_fragments
+        return files
+
+    @synchronized
+    def enable_sharding(self, buckets=1):
+        """
+        Switches to the sharded layout and rewrites the store in it: one
+        file per class, or per class and hash bucket of the id, so that a
+        save only rewrites the files holding changed objects.
+
+        Parameters:
+            buckets (int): Number of files per class.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If buckets is lower than 1.
+        """
+        if buckets < 1:
+            raise ValueError("buckets must be at least 1")
+        with self.__locked(exclusive=True):
+            conflicts = self.__merge()
+            self.__read_shards()
+            directory = self.__shard_dir()
+            if os.path.isdir(directory):
+                for paths in list_shards(directory)[0].values():
+                    for path in paths:
+                        os.remove(path)
+            FileStorage.__buckets = buckets
+            self.__write(full=True)
+            for path in (self.__file_path, self.__index_path()):
+                if exists(path):
+                    os.remove(path)
+            FileStorage.__stamp = self.__disk_stamp()
+        if conflicts:
+            raise ConflictError(conflicts)
+
+    @synchronized
+    def disable_sharding(self):
+        """
+        Switches back to the single JSON file layout, rewriting the store
+        in it and removing the shard directory.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        with self.__locked(exclusive=True):
+            conflicts = self.__merge()
+            self.__read_shards()
+            FileStorage.__buckets = 0
+            self.__write()
+            directory = self.__shard_dir()
+            if os.path.isdir(directory):
+                for paths in list_shards(directory)[0].values():
+                    for path in paths:
+                        os.remove(path)
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+            FileStorage.__stamp = self.__disk_stamp()
+        if conflicts:
+            raise ConflictError(conflicts)
+
+    @synchronized
+    def set_format(self, name):
+        """
+        Selects the format snapshots are written in from the next save.
+
+        Selecting an unsafe format, whose loading can run code (pickle),
+        is also what lets reload() read files in it: they are refused
+        otherwise, as anyone able to write the store could run code in
+        every process reading it.
+
+        Parameters:
+            name (str): A format name from models.engine.formats, or None
+            to keep writing the format found on disk.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the format is unknown.
+        """
+        if name is not None:
+            get_format(name)
+        FileStorage.__format = name
+
+    @synchronized
+    def migrate(self, name):
+        """
+        Rewrites the snapshot in another format and keeps using it.
+
+        Parameters:
+            name (str): A format name from models.engine.formats.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the format is unknown.
+        """
+        self.set_format(name)
+        self.compact()
+
+    def enable_compact(self):
+        """
+        Builds the records read by reload() (or hydrated in lazy mode) as
+        compact, __slots__-backed instances from models.compact.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        FileStorage.__compact = True
+
+    def disable_compact(self):
+        """
+        Builds the records read from disk as regular model instances again.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        FileStorage.__compact = False
+
+    def enable_locking(self):
+        """
+        Coordinates with the other processes using the store, the
+        default: reads take a shared lock and writes an exclusive one, and
+        save() merges the changes others wrote in the meantime.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        FileStorage.__locking = True
+
+    def disable_locking(self):
+        """
+        Stops taking file locks, for a store only one process uses.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        FileStorage.__locking = False
+
+    def enable_fsync(self):
+        """
+        Flushes every snapshot, shard and log write to disk (fsync) before
+        save() returns, the default. Batches group several saves into a
+        single flushed write.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        FileStorage.__fsync = True
+
+    def disable_fsync(self):
+        """
+        Leaves flushing writes to disk to the OS: saves stay atomic, but
+        the last ones may be lost on a power failure.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        FileStorage.__fsync = False
+
+    def enable_threading(self):
+        """
+        Makes the storage safe to share between threads: every method
+        holds a reentrant lock, and saves are written by a background
+        thread, which coalesces the saves requested while it writes into
+        a single write. Saves still queued are written at exit.
+
+        Should be called before other threads use the storage.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if FileStorage.__writer is not None:
+            return
+        FileStorage.__mutex = threading.RLock()
+        FileStorage.__io = threading.RLock()
+        FileStorage.__requests = threading.Condition()
+        FileStorage.__requested = FileStorage.__written = 0
+        FileStorage.__writer_error = None
+        FileStorage.__stopping = False
+        FileStorage.__writer = threading.Thread(
+                target=self.__write_loop, name="FileStorage writer",
+                daemon=True)
+        FileStorage.__writer.start()
+        atexit.register(FileStorage.__shutdown)
+
+    def disable_threading(self):
+        """
+        Writes the saves still queued, stops the writer thread and goes
+        back to writing in save() itself, without locks.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            The error of a failed write not reported by flush() yet.
+        """
+        writer = FileStorage.__writer
+        if writer is None:
+            return
+        atexit.unregister(FileStorage.__shutdown)
+        with FileStorage.__requests:
+            FileStorage.__stopping = True
+            FileStorage.__requests.notify_all()
+        writer.join()
+        FileStorage.__writer = None
+        FileStorage.__mutex = nullcontext()
+        FileStorage.__io = nullcontext()
+        error = FileStorage.__writer_error
+        FileStorage.__writer_error = None
+        if error is not None:
+            raise error
+
+    @staticmethod
+    def __shutdown():
+        """Writes the saves still queued when the interpreter exits."""
+        FileStorage().disable_threading()
+
+    def enable_parallel_reload(self, workers=None):
+        """
+        Makes reload() decode the files across a pool of worker
+        processes: one shard file per task in the sharded layout,
+        otherwise ranges of records of the snapshot (see
+        models.engine.parallel). Instances are still built here.
+
+        Parameters:
+            workers (int): Number of worker processes; one per CPU if
+            None. Fewer than 2 decodes in this process.
+
+        Returns:
+            None
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        FileStorage.__workers = workers
+
+    def disable_parallel_reload(self):
+        """
+        Makes reload() decode the files in this process, the default.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        FileStorage.__workers = 0
+
+    def enable_journal(self, limit=1000):
+        """
+        Switches saves to the append-only write-ahead log.
 
         Parameters:
+            limit (int): Number of log records kept before compaction.
+
+        Returns:
+            None
+        """
+        FileStorage.__journal = True
+        FileStorage.__journal_limit = limit
+
+    @synchronized
+    def disable_journal(self):
+        """
+        Compacts the log and goes back to rewriting the whole JSON file.
+
+        Parameters:
+            None
+
+        Returns:
             None
+        """
+        FileStorage.__journal = False
+        self.compact()
+
+    def __log_path(self):
+        """Returns the path of the write-ahead log."""
+        return self.__file_path + ".log"
+
+    def __log_records(self):
+        """Encodes one compact record per pending change, and takes the
+        changes out; returns them like __snapshot()."""
+        lines = []
+        for key, obj in self.__pending.items():
+            record = {"key": key,
+                      "obj": obj.to_dict() if obj is not None else None}
+            lines.append(json.dumps(record, separators=(",", ":")))
+        return (partial(self.__append_log, lines),
+                self.__take(shards=False))
+
+    def __append_log(self, lines):
+        """Appends the records encoded by __log_records() to the log."""
+        if not lines:
+            return
+        append_file(self.__log_path(), "\n".join(lines) + "\n",
+                    FileStorage.__fsync)
+        FileStorage.__journal_records += len(lines)
+        FileStorage.__stamp = self.__disk_stamp()
+
+    def __replay_log(self):
+        """
+        Applies the records of the write-ahead log to __objects.
+
+        A torn final record, from an interrupted append, is cut off the
+        log, so that the records appended next start on a line of their
+        own.
+        """
+        count = 0
+        end = 0
+        with open(self.__log_path(), "rb") as file:
+            for line in file:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("torn record")
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record["obj"] is None:
+                    self.__unstore(record["key"])
+                else:
+                    self.__load(record["key"], record["obj"])
+                count += 1
+                end += len(line)
+            torn = file.seek(0, os.SEEK_END) > end
+        if torn:
+            with open(self.__log_path(), "r+b") as file:
+                file.truncate(end)
+                if FileStorage.__fsync:
+                    os.fsync(file.fileno())
+        FileStorage.__journal_records = count
+
+    @synchronized
+    def reload(self, lazy=None):
+        """
+        Deserializes objects from the JSON file and updates __objects.
+
+        In lazy mode the records are kept as dictionaries and each one is
+        only built into an instance when all(), get() or find() reaches it,
+        so startup no longer pays for every instance and timestamp. A
+        file in the records format is then memory-mapped rather than read,
+        and each record is decoded only when first reached.
+
+        Parameters:
+            lazy (bool): Switches lazy mode on or off; None keeps the
+            current mode.
 
         Returns:
             None
+
+        Raises:
+            ValueError: If the store is in an unsafe format (pickle) not
+            selected with set_format().
+        """
+        if lazy is not None:
+            FileStorage.__lazy = lazy
+        with self.__locked():
+            self.__read_store()
+
+    def __read_store(self):
+        """Reads the snapshot, or the shards, then replays the log."""
+        self.__sync()
+        if os.path.isdir(self.__shard_dir()):
+            shards, FileStorage.__buckets = list_shards(self.__shard_dir())
+            for class_name, paths in shards.items():
+                self.__unread.setdefault(class_name, []).extend(paths)
+            # Lazy mode reads each class when first needed; the log can
+            # only be replayed on top of every shard
+            if not FileStorage.__lazy or exists(self.__log_path()):
+                self.__read_shards()
+        elif exists(self.__file_path):
+            FileStorage.__buckets = 0
+            if FileStorage.__lazy and is_record_file(self.__file_path):
+                # Records files are mapped and decoded one record at a
+                # time instead of being parsed as a whole
+                self.__map_file()
+            else:
+                # Each record is built (or kept as a record in lazy mode)
+                # before the next is read, so the decoded document is
+                # never held as a whole next to the instances
+                for records in self.__read_files([self.__file_path]):
+                    for key, obj_dict in records:
+                        self.__load(key, obj_dict)
+
+        if exists(self.__log_path()):
+            self.__replay_log()
+        self.__pending.clear()
+        self.__base.clear()
+        self.__dirty_shards.clear()
+        FileStorage.__stamp = self.__disk_stamp()
+
+    @synchronized
+    def refresh(self):
         """
-        if exists(self.__file_path):
-            with open(self.__file_path, "r", encoding="utf-8") as file:
-                instances = json.load(file)
+        Reloads the store only if the files changed on disk since this
+        process last read or wrote them.
 
-            for key, obj_dict in instances.items():
-                # Extract class name and object id from the key
-                class_name, obj_id = key.split(".")
+        The files are compared by inode, size and modification time, so
+        an unchanged store costs two stat() calls instead of a full parse.
+        When they did change, objects are reset to the content on disk in
+        place, so instances held by callers stay stored.
 
-                # Dynamically import the class and create an instance
-                """ obj_instance = getattr(
-                __import__(class_name), class_name)(**obj_dict) """
-                obj_instance = self.__models[class_name](**obj_dict)
+        Nothing is reloaded inside a batch, whose deferred changes would
+        otherwise be lost.
+
+        Parameters:
+            None
+
+        Returns:
+            bool: True if the store was reloaded, False otherwise.
+        """
+        if FileStorage.__batch_depth:
+            return False
+        # Waits for a write of the writer thread, so as not to take it
+        # for a change made by another process
+        with FileStorage.__io:
+            if self.__disk_stamp() == FileStorage.__stamp:
+                return False
+            self.__sync()
+            self.__pending.clear()
+            self.__base.clear()
+            lazy = FileStorage.__lazy
+            try:
+                self.__settle(self.__read_again())
+            finally:
+                FileStorage.__lazy = lazy
+        if not lazy:
+            self.__hydrate()
+        return True
 
-                # Update __objects with the new instance
-                self.__objects[key] = obj_instance
+    def __disk_stamp(self):
+        """Returns (inode, size, mtime) of the JSON file, its log and its
+        shard files."""
+        paths = [self.__file_path, self.__log_path()]
+        if os.path.isdir(self.__shard_dir()):
+            paths.extend(sorted(entry.path
+                                for entry in os.scandir(self.__shard_dir())))
+        stamp = []
+        for path in paths:
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                stamp.append(None)
+                continue
+            stamp.append((info.st_ino, info.st_size, info.st_mtime_ns))
+        return tuple(stamp)
@@ -0,0 +1,468 @@
+#!/usr/bin/python3
+
+"""
+Module: formats
+
+This module defines the encodings FileStorage can write its snapshot in.
+
+Every format turns the {key: obj_dict} mapping produced from to_dict()
+into bytes and back:
+- fragment(key, obj_dict): Encodes one record on its own.
+- join(fragments): Returns the bytes to write from every fragment.
+- encode(records): Returns the bytes to write for a whole mapping.
+- decode(data): Returns the {key: obj_dict} mapping read from data.
+- stream(file): Yields the (key, obj_dict) pairs of a file one at a
+  time, so that reload() can build each record before reading the next.
+
+Encoding records one by one lets FileStorage cache the fragment of each
+object and only re-encode the objects that changed since the last save.
+
+Binary formats start with a magic header, which is how reload() tells
+them apart from JSON without any configuration; compact JSON is told
+from indented JSON by what follows the opening brace. Unsafe formats,
+whose loading can run code (pickle), are only detected when the caller
+opted in to them.
+
+Classes:
+- Format: Base class of the formats.
+- JSONFormat: Pretty-printed JSON, the historical file.json layout.
+- CompactJSONFormat: JSON without indentation or spaces.
+- PickleFormat: Pickle protocol 5 of one table per model class.
+- MsgpackFormat: Same tables in msgpack, when msgpack is installed.
+- RecordFormat: Length-prefixed records, readable one at a time.
+
+Functions:
+- get_format(name): Returns the format registered under name.
+- detect_format(data): Returns the format data was written in.
+"""
+
+import codecs
+import json
+import pickle
+import re
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Shared encoders: building a JSONEncoder per record costs more than
+# encoding a small record
+PRETTY_ENCODER = json.JSONEncoder(indent=4)
+COMPACT_ENCODER = json.JSONEncoder(separators=(",", ":"))
+# Record header: length of the JSON body, then length of the key
+RECORD_HEADER = struct.Struct("<IH")
+# Streaming readers hold one block of the file at a time
+STREAM_BLOCK_SIZE = 1 << 16
+JSON_DECODER = json.JSONDecoder()
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Fast paths of the streaming JSON reader: a key without escapes and its
+# colon, and the separator after a member
+JSON_KEY = re.compile(r'[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*:[ \t\n\r]*')
+JSON_SEPARATOR = re.compile(r"[ \t\n\r]*([,}])")
+
+
+def share_keys(obj_dict, keys):
+    """
+    Returns obj_dict with its keys replaced by the equal strings already
+    in keys, adding the new ones. json.loads() shares the keys of one
+    document this way; records decoded one at a time would otherwise
+    each hold a copy of every attribute name.
+
+    Parameters:
+        obj_dict (dict): A decoded record.
+        keys (dict): str -> the same str, shared by the records of a file.
+
+    Returns:
+        dict: The record, with shared keys.
+    """
+    return {keys.setdefault(key, key): value
+            for key, value in obj_dict.items()}
+
+
+def to_tables(records):
+    """
+    Groups records into one table per class and field layout.
+
+    Records of a class nearly always share the same fields, so the field
+    names are stored once per table instead of once per record.
+
+    Parameters:
+        records (iterable): The obj_dict of every record.
+
+    Returns:
+        dict: class name -> list of [fields, rows] pairs, where rows is a
+        list of value lists in the order of fields.
+    """
+    tables = {}
+    for obj_dict in records:
+        fields = tuple(obj_dict)
+        layouts = tables.setdefault(obj_dict["__class__"], {})
+        layouts.setdefault(fields, []).append(list(obj_dict.values()))
+    return {class_name: [[list(fields), rows]
+                         for fields, rows in layouts.items()]
+            for class_name, layouts in tables.items()}
+
+
+def from_tables(tables):
+    """
+    Rebuilds the {key: obj_dict} mapping from to_tables() output.
+
+    Parameters:
+        tables (dict): As returned by to_tables().
+
+    Returns:
+        dict: {key: obj_dict}.
+    """
+    records = {}
+    for class_name, layouts in tables.items():
+        for fields, rows in layouts:
+            for row in rows:
+                obj_dict = dict(zip(fields, row))
+                records[f"{class_name}.{obj_dict['id']}"] = obj_dict
+    return records
+
+
+class Format:
+    """
+    Base class of the formats.
+
+    Attributes:
+    - name (str): Name used to select the format.
+    - magic (bytes): Header identifying the format, None for JSON.
+    - unsafe (bool): Whether decoding untrusted data can run code.
+    """
+
+    name = None
+    magic = None
+    unsafe = False
+
+    def fragment(self, key, obj_dict):
+        """Returns the encoding of one record; the record itself here."""
+        return obj_dict
+
+    def join(self, fragments):
+        """Returns the bytes to write from the fragments of every record."""
+        raise NotImplementedError
+
+    def encode(self, records):
+        """Returns the bytes to write for a {key: obj_dict} mapping."""
+        return self.join([self.fragment(key, obj_dict)
+                          for key, obj_dict in records.items()])
+
+    def decode(self, data):
+        """Returns the {key: obj_dict} mapping held in data."""
+        raise NotImplementedError
+
+    def stream(self, file):
+        """Yields the (key, obj_dict) pairs of a binary file; the whole
+        file is decoded at once here."""
+        yield from self.decode(file.read()).items()
+
+
+class JSONFormat(Format):
+    """
+    Pretty-printed JSON, indented by four spaces; byte for byte what
+    json.dump(records, file, indent=4) writes.
+    """
+
+    name = "json"
+
+    def fragment(self, key, obj_dict):
+        """Returns the indented '"key": {...}' member of one record."""
+        # JSON escapes newlines inside strings, so every newline here is
+        # structural and can take the extra level of indentation
+        return ("    " + PRETTY_ENCODER.encode(key) + ": " +
+                PRETTY_ENCODER.encode(obj_dict).replace("\n", "\n    "))
+
+    def join(self, fragments):
+        """Returns the members wrapped in an indented JSON object."""
+        if not fragments:
+            return b"{}"
+        return ("{\n" + ",\n".join(fragments) + "\n}").encode("utf-8")
+
+    def decode(self, data):
+        """Returns the records held in JSON bytes."""
+        return json.loads(data)
+
+    def stream(self, file):
+        """
+        Yields the members of the JSON object held in a binary file one
+        at a time, reading it a block at a time: only the current block
+        and record are held, never the whole document.
+
+        Parameters:
+            file: Binary file positioned at the start of the object.
+
+        Yields:
+            tuple: (key, obj_dict) of each member, in file order.
+
+        Raises:
+            json.JSONDecodeError: If the file is not a JSON object.
+        """
+        reader = codecs.getincrementaldecoder("utf-8")()
+        scan_once = JSON_DECODER.scan_once
+        buffer, position, eof = "", 0, False
+        keys = {}
+
+        def fill():
+            """Appends the next block to the unread part of the buffer."""
+            nonlocal buffer, position, eof
+            block = file.read(STREAM_BLOCK_SIZE)
+            eof = not block
+            buffer = buffer[position:] + reader.decode(block, final=eof)
+            position = 0
+
+        def peek():
+            """Skips whitespace; returns the next character, '' at the
+            end of the file."""
+            nonlocal position
+            while True:
+                position = JSON_WHITESPACE.match(buffer, position).end()
+                if position < len(buffer):
+                    return buffer[position]
+                if eof:
+                    return ""
+                fill()
+
+        def value():
+            """Decodes the string or object at position."""
+            nonlocal position
+            while True:
+                position = JSON_WHITESPACE.match(buffer, position).end()
+                try:
+                    # Strings and objects end with their last character,
+                    # so a value decoded from the buffer is never cut
+                    obj, position = JSON_DECODER.raw_decode(buffer, position)
+                    return obj
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()
+
+        if peek() != "{":
+            raise json.JSONDecodeError("Expecting '{'", buffer, position)
+        position += 1
+        if peek() == "}":
+            return
+        while True:
+            match = JSON_KEY.match(buffer, position)
+            if match:
+                key = match.group(1)
+                position = match.end()
+            else:
+                # Escaped key, or key cut by the end of the buffer
+                peek()
+                key = value()
+                if peek() != ":":
+                    raise json.JSONDecodeError("Expecting ':' delimiter",
+                                               buffer, position)
+                position += 1
+            try:
+                # The C scanner behind raw_decode(), without its wrapper
+                obj_dict, position = scan_once(buffer, position)
+            except (StopIteration, json.JSONDecodeError):
+                # Cut by the end of the buffer, or not an object at all
+                obj_dict = value()
+            if isinstance(obj_dict, dict):
+                obj_dict = share_keys(obj_dict, keys)
+            yield key, obj_dict
+            match = JSON_SEPARATOR.match(buffer, position)
+            if match:
+                separator = match.group(1)
+                position = match.end()
+            else:
+                separator = peek()
+                position += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter",
+                                           buffer, position - 1)
+
+
+class CompactJSONFormat(JSONFormat):
+    """
+    JSON without indentation or spaces after separators.
+    """
+
+    name = "compact-json"
+
+    def fragment(self, key, obj_dict):
+        """Returns the minified '"key":{...}' member of one record."""
+        return (COMPACT_ENCODER.encode(key) + ":" +
+                COMPACT_ENCODER.encode(obj_dict))
+
+    def join(self, fragments):
+        """Returns the members wrapped in a minified JSON object."""
+        return ("{" + ",".join(fragments) + "}").encode("utf-8")
+
+
+class PickleFormat(Format):
+    """
+    Pickle protocol 5 of the per-class tables built by to_tables().
+
+    Loading a pickle can run arbitrary code: only use this format for
+    files written by this application.
+    """
+
+    name = "pickle"
+    magic = b"HBNBPKL5"
+    unsafe = True
+
+    def join(self, fragments):
+        """Returns the records as a pickled table per class."""
+        return self.magic + pickle.dumps(to_tables(fragments), protocol=5)
+
+    def decode(self, data):
+        """Returns the records held in pickled tables."""
+        return from_tables(pickle.loads(data[len(self.magic):]))
+
+
+class MsgpackFormat(Format):
+    """
+    msgpack encoding of the per-class tables built by to_tables().
+    Only registered when the msgpack package is installed.
+    """
+
+    name = "msgpack"
+    magic = b"HBNBMSGP"
+
+    def join(self, fragments):
+        """Returns the records as msgpack tables."""
+        return self.magic + msgpack.packb(to_tables(fragments))
+
+    def decode(self, data):
+        """Returns the records held in msgpack tables."""
+        return from_tables(msgpack.unpackb(data[len(self.magic):]))
+
+
+class RecordFormat(Format):
+    """
+    Length-prefixed records after a magic header. Each record is
+
+        <body length: uint32> <key length: uint16> <key> <JSON body>
+
+    little-endian, so the records can be listed by reading their headers
+    only and any one of them decoded on its own (see models.engine.records
+    for the memory-mapped reader).
+    """
+
+    name = "records"
+    magic = b"HBNBREC1"
+
+    def fragment(self, key, obj_dict):
+        """Returns the header, key and compact JSON body of one record."""
+        key_bytes = key.encode("utf-8")
+        body = COMPACT_ENCODER.encode(obj_dict).encode("utf-8")
+        return RECORD_HEADER.pack(len(body), len(key_bytes)) + key_bytes + body
+
+    def join(self, fragments):
+        """Returns the records after the magic header."""
+        return self.magic + b"".join(fragments)
+
+    def decode(self, data):
+        """Returns every record held in data."""
+        return {key: json.loads(data[start:end])
+                for key, offset, start, end in self.scan(data)}
+
+    def stream(self, file):
+        """Yields the records of a binary file one at a time, reading
+        only the current one; a record cut short ends the stream."""
+        file.read(len(self.magic))
+        keys = {}
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            body_length, key_length = RECORD_HEADER.unpack(header)
+            key = file.read(key_length)
+            body = file.read(body_length)
+            if len(body) < body_length:
+                return
+            yield key.decode("utf-8"), share_keys(json.loads(body), keys)
+
+    def scan(self, data, offset=None, size=None):
+        """
+        Yields the position of every record, reading headers only.
+
+        A record cut short by an interrupted write ends the scan.
+
+        Parameters:
+            data: Bytes (or mmap) of a records file.
+            offset (int): Offset of the first record to read; the first
+            record of the file if None.
+            size (int): Offset where the scan stops; the end of data if
+            None.
+
+        Yields:
+            tuple: (key, offset of the header, start and end of the body).
+        """
+        if offset is None:
+            offset = len(self.magic)
+        if size is None:
+            size = len(data)
+        while offset + RECORD_HEADER.size <= size:
+            body_length, key_length = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size + key_length
+            end = start + body_length
+            if end > size:
+                break
+            key = bytes(data[offset + RECORD_HEADER.size:start])
+            yield key.decode("utf-8"), offset, start, end
+            offset = end
+
+
+FORMATS = {fmt.name: fmt() for fmt in (JSONFormat, CompactJSONFormat,
+                                        PickleFormat, RecordFormat)}
+if msgpack is not None:
+    FORMATS[MsgpackFormat.name] = MsgpackFormat()
+
+
+def get_format(name):
+    """
+    Returns the format registered under name.
+
+    Parameters:
+        name (str): Format name, one of FORMATS.
+
+    Returns:
+        The format instance.
+
+    Raises:
+        ValueError: If no format has that name.
+    """
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise ValueError(f"unknown storage format: {name}") from None
+
+
+def detect_format(data, allowed=()):
+    """
+    Returns the format data was written in, from its magic header.
+
+    Parameters:
+        data (bytes): Content of a storage file.
+        allowed (tuple): Names of the unsafe formats the caller opted in
+        to decoding.
+
+    Returns:
+        The format instance; when no binary header matches, compact JSON
+        if a key directly follows the opening brace, else indented JSON.
+
+    Raises:
+        ValueError: If data is in an unsafe format not allowed.
+    """
+    for fmt in FORMATS.values():
+        if fmt.magic is not None and data.startswith(fmt.magic):
+            if fmt.unsafe and fmt.name not in allowed:
+                raise ValueError(
+                    f"refusing to load a {fmt.name} file, which can run "
+                    f"code: select the format first (set_format('{fmt.name}') "
+                    f"or HBNB_STORAGE_FORMAT={fmt.name})")
+            return fmt
+    if data.lstrip().startswith(b'{"'):
+        return FORMATS[CompactJSONFormat.name]
+    return FORMATS[JSONFormat.name]
@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+
+"""
+Module: indexes
+
+This module defines the secondary indexes kept up to date by FileStorage.
+
+Every index follows the same small protocol so that FileStorage can notify
+all of them in the same way whenever its content changes:
+- add(key, obj): an object was stored under key.
+- remove(key, obj): the object stored under key was deleted.
+- update(key, obj, name, old): attribute name of a stored object changed,
+  old being the value it had before.
+- clear(): the storage was emptied or replaced.
+The column, spatial and text indexes and the aggregates (modules columns,
+spatial, search and aggregates) follow it too, and are notified along
+with the indexes of this module.
+
+Classes:
+- ClassIndex: Maps a class name to the objects of that class.
+- AttributeIndex: Maps the values of one attribute of one class to the
+  objects holding them.
+"""
+
+
+def class_name_of(cls):
+    """
+    Returns the class name used in storage keys.
+
+    Parameters:
+        cls: A model class, a model instance or a class name.
+
+    Returns:
+        str: The class name.
+    """
+    if isinstance(cls, str):
+        return cls
+    if isinstance(cls, type):
+        return cls.__name__
+    return cls.__class__.__name__
+
+
+class ClassIndex:
+    """
+    ClassIndex maps a class name to a {key: obj} dictionary holding the
+    stored objects of exactly that class.
+
+    Attributes:
+    - classes (dict): class name -> {key: obj}.
+    """
+
+    def __init__(self):
+        """Creates an empty index."""
+        self.classes = {}
+
+    def add(self, key, obj):
+        """Registers obj under its class name."""
+        self.classes.setdefault(class_name_of(obj), {})[key] = obj
+
+    def remove(self, key, obj):
+        """Forgets obj."""
+        bucket = self.classes.get(class_name_of(obj))
+        if bucket is not None:
+            bucket.pop(key, None)
+
+    def update(self, key, obj, name, old):
+        """Attribute changes never move an object to another class."""
+        pass
+
+    def clear(self):
+        """Forgets every object."""
+        self.classes = {}
+
+    def lookup(self, cls):
+        """
+        Returns the objects of one class.
+
+        Parameters:
+            cls: A model class or class name.
+
+        Returns:
+            dict: {key: obj} for the class, empty if there is none.
+        """
+        return self.classes.get(class_name_of(cls), {})
+
+
+class AttributeIndex:
+    """
+    AttributeIndex maps the values of one attribute of one class to the
+    stored objects holding them.
+
+    List values (such as Place.amenity_ids) are indexed once per element,
+    so that looking up a single id finds every object listing it.
+    Unhashable values are not indexed.
+
+    Attributes:
+    - class_name (str): Name of the indexed class.
+    - name (str): Name of the indexed attribute.
+    - values (dict): attribute value -> {key: obj}.
+    """
+
+    def __init__(self, cls, name):
+        """
+        Creates an empty index.
+
+        Parameters:
+            cls: The model class or class name to index.
+            name (str): The attribute to index.
+        """
+        self.class_name = class_name_of(cls)
+        self.name = name
+        self.values = {}
+
+    def __entries(self, value):
+        """Returns the hashable index entries for an attribute value."""
+        if isinstance(value, (list, tuple, set)):
+            entries = value
+        else:
+            entries = (value,)
+        for entry in entries:
+            try:
+                hash(entry)
+            except TypeError:
+                continue
+            yield entry
+
+    def __insert(self, key, obj, value):
+        """Adds obj under every entry of value."""
+        for entry in self.__entries(value):
+            self.values.setdefault(entry, {})[key] = obj
+
+    def __discard(self, key, value):
+        """Removes key from under every entry of value."""
+        for entry in self.__entries(value):
+            bucket = self.values.get(entry)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self.values[entry]
+
+    def add(self, key, obj):
+        """Indexes obj if it belongs to the indexed class."""
+        if class_name_of(obj) == self.class_name:
+            self.__insert(key, obj, getattr(obj, self.name, None))
+
+    def remove(self, key, obj):
+        """Removes obj from the index."""
+        if class_name_of(obj) == self.class_name:
+            self.__discard(key, getattr(obj, self.name, None))
+
+    def update(self, key, obj, name, old):
+        """Moves obj from its old value to its new one."""
+        if name == self.name and class_name_of(obj) == self.class_name:
+            self.__discard(key, old)
+            self.__insert(key, obj, getattr(obj, self.name, None))
+
+    def clear(self):
+        """Forgets every object."""
+        self.values = {}
+
+    def lookup(self, value):
+        """
+        Returns the objects whose attribute equals (or contains) value.
+
+        Parameters:
+            value: The attribute value to look for.
+
+        Returns:
+            dict: {key: obj} of the matching objects.
+        """
+        try:
+            return self.values.get(value, {})
+        except TypeError:
+            return {}
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+
+"""
+Module: locking
+
+This module defines the advisory locks FileStorage takes so that
+several processes can share one store: a shared lock while reading the
+files, an exclusive lock while writing them.
+
+The lock is taken on the directory holding the store rather than on the
+store itself, which is replaced by a new file on every save, so it
+needs no lock file; stores kept in the same directory share the lock.
+Locks are fcntl.flock() locks, released by the OS if the process dies;
+where fcntl is not available (Windows), locking is a no-op.
+
+Classes:
+- FileLock: Reentrant shared/exclusive lock on a file or directory.
+- ConflictError: Raised by save() when another process changed the
+  same objects.
+"""
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ConflictError(Exception):
+    """
+    Raised by save() when objects changed by this process were also
+    changed by another process since this one read them. The other
+    process's version is kept; the other changes of the save are written.
+
+    Attributes:
+    - keys (list): Storage keys of the conflicting objects.
+    """
+
+    def __init__(self, keys):
+        """
+        Creates the error.
+
+        Parameters:
+            keys (list): Storage keys of the conflicting objects.
+        """
+        super().__init__("changed by another process: " + ", ".join(keys))
+        self.keys = keys
+
+
+class FileLock:
+    """
+    FileLock is a reentrant advisory lock on a file or directory.
+
+    Nested holds keep the outermost lock, except that an exclusive hold
+    inside a shared one upgrades the lock for its duration.
+
+    Attributes:
+    - path (str): The locked file or directory.
+    - fd (int): Descriptor of the open file or directory, or None.
+    - pid (int): Process that opened fd; a forked child reopens it, as
+      flock() locks are shared by every copy of a descriptor.
+    - depth (int): Number of nested holds.
+    - exclusive (bool): Whether the lock is currently held exclusively.
+    """
+
+    def __init__(self, path):
+        """
+        Creates a lock on path, opened on first use.
+
+        Parameters:
+            path (str): An existing file or directory.
+        """
+        self.path = path
+        self.fd = None
+        self.pid = None
+        self.depth = 0
+        self.exclusive = False
+
+    def __flock(self, exclusive):
+        """Takes the lock in the given mode, waiting for other holders."""
+        if fcntl is None:
+            return
+        if self.fd is None or self.pid != os.getpid():
+            self.fd = os.open(self.path, os.O_RDONLY)
+            self.pid = os.getpid()
+        fcntl.flock(self.fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def __unlock(self):
+        """Releases the lock."""
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def hold(self, exclusive=False):
+        """
+        Holds the lock for the duration of a with block.
+
+        Parameters:
+            exclusive (bool): True to exclude every other holder, False
+            to only exclude exclusive holders.
+
+        Returns:
+            None
+        """
+        upgrade = self.depth > 0 and exclusive and not self.exclusive
+        if self.depth == 0 or upgrade:
+            self.__flock(exclusive)
+            self.exclusive = exclusive
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                self.__unlock()
+                self.exclusive = False
+            elif upgrade:
+                self.__flock(False)
+                self.exclusive = False
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+
+"""
+Module: parallel
+
+This module defines the parallel decoding of FileStorage.reload(): the
+files are cut into chunks, a pool of worker processes decodes them into
+{key: obj_dict} records, and the parent, which alone holds the storage,
+builds the instances.
+
+Chunks are:
+- one per file in the sharded layout;
+- ranges of records of a records file, cut at record headers;
+- ranges of members of a pretty-printed JSON snapshot, cut before the
+  lines opening a top-level member: JSON strings escape their newlines,
+  so a line indented by exactly four spaces and opening a key can only
+  be one.
+Other snapshots (compact JSON, pickle, msgpack) cannot be cut, and
+small files are not worth the pool: both are decoded whole, in the
+parent.
+
+Functions:
+- file_format(path, allowed): Returns the format a file was written in.
+- split_file(path, count): Cuts a snapshot into about count chunks.
+- decode_chunk(chunk, allowed): Decodes one chunk, in a worker process.
+- decode_chunks(chunks, workers, allowed): Decodes chunks across a pool.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from models.engine.formats import (JSONFormat, RecordFormat, detect_format,
+                                   get_format)
+
+RECORDS = get_format(RecordFormat.name)
+# Smallest snapshot decoded in parallel, below which starting the pool
+# costs more than it saves
+MIN_PARALLEL_SIZE = 1 << 20
+# Start of a pretty-printed snapshot, and of each of its other members
+FIRST_MEMBER = b'{\n    "'
+NEXT_MEMBER = b',\n    "'
+
+
+def file_format(path, allowed=()):
+    """
+    Returns the format a file was written in, reading its header only.
+
+    Parameters:
+        path (str): A snapshot or shard file.
+        allowed (tuple): Unsafe formats opted in to (see detect_format()).
+
+    Returns:
+        The format instance.
+
+    Raises:
+        ValueError: If the file is in an unsafe format not allowed.
+    """
+    with open(path, "rb") as file:
+        return detect_format(file.read(len(RECORDS.magic)), allowed)
+
+
+def split_file(path, count):
+    """
+    Cuts a snapshot into about count chunks of similar size.
+
+    Parameters:
+        path (str): The snapshot.
+        count (int): Number of chunks wanted.
+
+    Returns:
+        list: (path, kind, start, end) chunks for decode_chunk(); a
+        single whole-file chunk if the file cannot or need not be cut.
+    """
+    size = os.path.getsize(path)
+    if size < MIN_PARALLEL_SIZE or count < 2:
+        return [(path, None, 0, size)]
+    with open(path, "rb") as file:
+        data = file.read()
+    step = len(data) // count
+    ranges = []
+    if data.startswith(RECORDS.magic):
+        kind = RecordFormat.name
+        # end is left at the end of the last whole record
+        start = end = len(RECORDS.magic)
+        for key, offset, body_start, end in RECORDS.scan(data):
+            if offset - start >= step:
+                ranges.append((start, offset))
+                start = offset
+        ranges.append((start, end))
+    elif data.startswith(FIRST_MEMBER):
+        kind = JSONFormat.name
+        start = 1
+        for i in range(1, count):
+            cut = data.find(NEXT_MEMBER, max(step * i, start))
+            if cut < 0:
+                break
+            ranges.append((start, cut))
+            # The comma separating the members belongs to neither
+            start = cut + 1
+        ranges.append((start, data.rindex(b"}")))
+    else:
+        return [(path, None, 0, size)]
+    return [(path, kind, start, end) for start, end in ranges]
+
+
+def decode_chunk(chunk, allowed=()):
+    """
+    Decodes one chunk; runs in a worker process.
+
+    Parameters:
+        chunk (tuple): (path, kind, start, end), where kind is None for
+        a whole file, "records" or "json" for a range of the file.
+        allowed (tuple): Unsafe formats opted in to (see detect_format()).
+
+    Returns:
+        dict: {key: obj_dict} of the records of the chunk.
+
+    Raises:
+        ValueError: If the file is in an unsafe format not allowed.
+    """
+    path, kind, start, end = chunk
+    with open(path, "rb") as file:
+        if kind is None:
+            data = file.read()
+            return detect_format(data, allowed).decode(data)
+        file.seek(start)
+        data = file.read(end - start)
+    if kind == RecordFormat.name:
+        return {key: json.loads(data[body_start:body_end])
+                for key, offset, body_start, body_end
+                in RECORDS.scan(data, 0)}
+    return json.loads(b"{" + data + b"}")
+
+
+def decode_chunks(chunks, workers, allowed=()):
+    """
+    Decodes chunks across a pool of worker processes.
+
+    Parameters:
+        chunks (list): Chunks as returned by split_file().
+        workers (int): Number of worker processes.
+        allowed (tuple): Unsafe formats opted in to (see detect_format()).
+
+    Returns:
+        list: The {key: obj_dict} of each chunk, in the order of chunks.
+
+    Raises:
+        ValueError: If a file is in an unsafe format not allowed.
+    """
+    with ProcessPoolExecutor(min(workers, len(chunks))) as pool:
+        return list(pool.map(partial(decode_chunk, allowed=allowed),
+                             chunks))
@@ -0,0 +1,296 @@
+#!/usr/bin/python3
+
+"""
+Module: query
+
+This module defines Query, a chainable, lazily evaluated query over the
+objects of one class of a storage engine:
+
+    storage.query(Place).where(price_by_night__lt=100) \\
+        .order_by("price_by_night").limit(20).offset(40)
+
+Conditions are written name__lookup=value, the lookup defaulting to eq.
+The candidates are taken from the storage's own indexes where it has
+them (find() for equality, filter() and fetch() for numeric ranges,
+unless the storage asks for a scan instead), and every condition is
+then checked on each candidate.
+
+Results are streamed: an unordered query yields its matches as it finds
+them and stops at its limit; an ordered query with a limit keeps only
+the offset + limit smallest in a heap instead of sorting every match.
+
+Classes:
+- Descending: Sort key wrapper reversing the order of a value.
+- Query: A query over the objects of one class.
+"""
+
+import heapq
+import operator
+from itertools import islice
+
+LOOKUPS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "in": lambda value, values: value in values,
+    "contains": lambda values, value: value in values,
+}
+# Lookups answered by filter(), as (low, high) inclusive bounds
+RANGES = {"lt": 1, "lte": 1, "gt": 0, "gte": 0}
+
+
+def is_number(value):
+    """Returns whether value is an int or float (bools excluded)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Descending:
+    """
+    Descending wraps a sort key so that larger values sort first.
+
+    Attributes:
+    - value: The wrapped value.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        """Wraps value."""
+        self.value = value
+
+    def __eq__(self, other):
+        """Returns whether both wrap equal values."""
+        return self.value == other.value
+
+    def __lt__(self, other):
+        """Returns whether self sorts first, its value being larger."""
+        return other.value < self.value
+
+
+class Query:
+    """
+    Query selects, orders and pages the objects of one class. Every
+    chained method returns a new Query; nothing is read before the query
+    is iterated.
+
+    Attributes:
+    - storage: The storage engine queried (FileStorage or DBStorage).
+    - cls: Model class or class name.
+    - conditions (tuple): (name, lookup, value) conditions, all required.
+    - ordering (tuple): (name, descending) sort keys.
+    - limit_count (int): Maximum number of results, or None.
+    - offset_count (int): Number of results skipped.
+    - filter_ranges (bool): Whether numeric ranges are answered by
+      filter() and fetch() rather than a scan of the class.
+
+    Methods:
+    - where(self, **conditions): Adds conditions.
+    - order_by(self, *names): Sets the sort keys.
+    - limit(self, count): Caps the number of results.
+    - offset(self, count): Skips the first results.
+    - all(self): Returns the results as a list.
+    - first(self): Returns the first result, or None.
+    - count(self): Returns the number of results.
+    """
+
+    def __init__(self, storage, cls, conditions=(), ordering=(),
+                 limit_count=None, offset_count=0, filter_ranges=True):
+        """
+        Initializes a query; use storage.query(cls) rather than this.
+
+        Parameters:
+            storage: The storage engine queried.
+            cls: Model class or class name.
+            conditions (tuple): (name, lookup, value) conditions.
+            ordering (tuple): (name, descending) sort keys.
+            limit_count (int): Maximum number of results, or None.
+            offset_count (int): Number of results skipped.
+            filter_ranges (bool): False when the storage filters numeric
+            ranges more slowly than a scan.
+        """
+        self.storage = storage
+        self.cls = cls
+        self.conditions = tuple(conditions)
+        self.ordering = tuple(ordering)
+        self.limit_count = limit_count
+        self.offset_count = offset_count
+        self.filter_ranges = filter_ranges
+        self.__checks = tuple((name, LOOKUPS[lookup], value)
+                              for name, lookup, value in self.conditions)
+
+    def __copy(self, **changes):
+        """Returns a copy of this query with some attributes changed."""
+        attributes = {"conditions": self.conditions,
+                      "ordering": self.ordering,
+                      "limit_count": self.limit_count,
+                      "offset_count": self.offset_count,
+                      "filter_ranges": self.filter_ranges}
+        attributes.update(changes)
+        return Query(self.storage, self.cls, **attributes)
+
+    def where(self, **conditions):
+        """
+        Returns a query also requiring the given conditions.
+
+        Parameters:
+            **conditions: name__lookup=value, where lookup is one of eq
+            (the default), ne, lt, lte, gt, gte, in and contains. For
+            example where(city_id=city.id, price_by_night__lt=100).
+
+        Returns:
+            Query: The narrowed query.
+
+        Raises:
+            ValueError: If a lookup is unknown.
+        """
+        added = []
+        for condition, value in conditions.items():
+            name, _, lookup = condition.partition("__")
+            lookup = lookup or "eq"
+            if lookup not in LOOKUPS:
+                raise ValueError(f"unknown lookup: {condition}")
+            added.append((name, lookup, value))
+        return self.__copy(conditions=self.conditions + tuple(added))
+
+    def order_by(self, *names):
+        """
+        Returns a query ordered by the given attributes.
+
+        Parameters:
+            *names: Attribute names, prefixed with "-" for a descending
+            order. Objects missing an attribute sort last.
+
+        Returns:
+            Query: The ordered query.
+        """
+        return self.__copy(ordering=tuple(
+            (name[1:], True) if name.startswith("-") else (name, False)
+            for name in names))
+
+    def limit(self, count):
+        """
+        Returns a query yielding at most count results.
+
+        Parameters:
+            count (int): Maximum number of results, or None for no limit.
+
+        Returns:
+            Query: The limited query.
+
+        Raises:
+            ValueError: If count is negative.
+        """
+        if count is not None and count < 0:
+            raise ValueError("limit must not be negative")
+        return self.__copy(limit_count=count)
+
+    def offset(self, count):
+        """
+        Returns a query skipping its first count results.
+
+        Parameters:
+            count (int): Number of results to skip.
+
+        Returns:
+            Query: The offset query.
+
+        Raises:
+            ValueError: If count is negative.
+        """
+        if count < 0:
+            raise ValueError("offset must not be negative")
+        return self.__copy(offset_count=count)
+
+    def __candidates(self):
+        """
+        Returns the objects that may match, from an index when the
+        storage has one: an equality condition is answered by find(),
+        numeric ranges by filter() and fetch() if filter_ranges, anything
+        else by a scan of the class.
+        """
+        for name, lookup, value in self.conditions:
+            if lookup == "eq":
+                return self.storage.find(self.cls, name, value).values()
+        if not self.filter_ranges:
+            return self.storage.all(self.cls).values()
+        ranges = {}
+        for name, lookup, value in self.conditions:
+            if lookup in RANGES and is_number(value):
+                bounds = list(ranges.get(name, (None, None)))
+                side = RANGES[lookup]
+                if bounds[side] is None or \
+                        (value < bounds[side] if side else
+                         value > bounds[side]):
+                    bounds[side] = value
+                ranges[name] = tuple(bounds)
+        if ranges:
+            return self.storage.fetch(self.cls,
+                                      self.storage.filter(self.cls, **ranges))
+        return self.storage.all(self.cls).values()
+
+    @staticmethod
+    def __check(objs, name, test, value):
+        """Yields the objects meeting one condition."""
+        for obj in objs:
+            try:
+                if test(getattr(obj, name, None), value):
+                    yield obj
+            except TypeError:
+                pass
+
+    def __sort_key(self, obj):
+        """Returns the sort key of obj; missing values sort last."""
+        key = ()
+        for name, descending in self.ordering:
+            value = getattr(obj, name, None)
+            key += (value is None, Descending(value) if descending else value)
+        return key
+
+    def __iter__(self):
+        """Yields the results, reading no further than needed."""
+        # One generator per condition, rather than a call per object
+        matches = iter(self.__candidates())
+        for name, test, value in self.__checks:
+            matches = self.__check(matches, name, test, value)
+        start = self.offset_count
+        stop = None if self.limit_count is None \
+            else start + self.limit_count
+        if self.ordering:
+            if stop is None:
+                matches = sorted(matches, key=self.__sort_key)
+            else:
+                matches = heapq.nsmallest(stop, matches,
+                                          key=self.__sort_key)
+        return islice(matches, start, stop)
+
+    def all(self):
+        """
+        Returns the results.
+
+        Returns:
+            list: The objects, in order.
+        """
+        return list(self)
+
+    def first(self):
+        """
+        Returns the first result.
+
+        Returns:
+            The first object, or None if there are no results.
+        """
+        first = self.limit(1 if self.limit_count is None
+                           else min(1, self.limit_count))
+        return next(iter(first), None)
+
+    def count(self):
+        """
+        Returns the number of results, within the limit and offset.
+
+        Returns:
+            int: Number of objects the query yields.
+        """
+        return sum(1 for _ in self)
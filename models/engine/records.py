@@ -0,0 +1,261 @@
+#!/usr/bin/python3
+
+"""
+Module: records
+
+This module defines the memory-mapped read path of the "records" format
+(see RecordFormat in models.engine.formats).
+
+The records file is mapped instead of read, and a sidecar index next to
+it maps every key to the offset of its record, one section per class:
+
+    file.json       magic, then <header><key><JSON body> per record
+    file.json.idx   {"file": [inode, size, mtime], "classes":
+                     {class name: [section start, section end, count]}}
+                    followed by one {key: offset} JSON section per class
+
+Opening a store only parses the first line of the index; the offsets of
+a class are parsed when the class is first looked into, and each record
+is decoded when it is first read. An index that is missing or does not
+match the file is rebuilt by scanning the record headers.
+
+Classes:
+- RecordFile: A mapped records file and its offsets.
+- MappedRecords: Dictionary-like view of the records of one class.
+
+Functions:
+- is_record_file(path): Tells whether a file is in the records format.
+- write_index(path, index_path, fragments): Writes the sidecar index.
+"""
+
+import json
+import mmap
+import os
+from collections.abc import MutableMapping
+
+from models.engine.atomic import write_files
+from models.engine.formats import RECORD_HEADER, RecordFormat, get_format
+
+RECORDS = get_format(RecordFormat.name)
+
+
+def is_record_file(path):
+    """
+    Tells whether a file is in the records format.
+
+    Parameters:
+        path (str): Path of a storage file.
+
+    Returns:
+        bool: True if the file starts with the records magic header.
+    """
+    with open(path, "rb") as file:
+        return file.read(len(RECORDS.magic)) == RECORDS.magic
+
+
+def file_stamp(path):
+    """Returns [inode, size, mtime] of a file, as kept in the index."""
+    info = os.stat(path)
+    return [info.st_ino, info.st_size, info.st_mtime_ns]
+
+
+def write_index(path, index_path, fragments):
+    """
+    Writes the sidecar index of a records file just written.
+
+    Parameters:
+        path (str): The records file.
+        index_path (str): The sidecar index to write.
+        fragments (list): The record fragments in the order written.
+
+    Returns:
+        None
+    """
+    classes = {}
+    offset = len(RECORDS.magic)
+    for fragment in fragments:
+        key_length = RECORD_HEADER.unpack_from(fragment)[1]
+        key = fragment[RECORD_HEADER.size:
+                       RECORD_HEADER.size + key_length].decode("utf-8")
+        classes.setdefault(key.split(".", 1)[0], {})[key] = offset
+        offset += len(fragment)
+    sections = [json.dumps(offsets, separators=(",", ":")).encode("utf-8")
+                for offsets in classes.values()]
+    header = {"file": file_stamp(path), "classes": {}}
+    position = 0
+    for class_name, offsets, section in zip(classes, classes.values(),
+                                            sections):
+        header["classes"][class_name] = [position, position + len(section),
+                                         len(offsets)]
+        position += len(section)
+    # Section positions are relative to the end of the header line; the
+    # index can be rebuilt from the file, so it is not flushed to disk
+    write_files({index_path: b"\n".join([
+            json.dumps(header, separators=(",", ":")).encode("utf-8"),
+            b"".join(sections)])}, fsync=False)
+
+
+class RecordFile:
+    """
+    RecordFile maps a records file and knows the offset of each record.
+
+    The mapping stays valid while the file is replaced by a newer one:
+    FileStorage always writes a new file and renames it over the old,
+    never rewriting it in place (see models.engine.atomic).
+
+    Attributes:
+    - path (str): The records file.
+    - data (mmap): Read-only mapping of the file.
+    - counts (dict): class name -> number of records of the class.
+    - sections (dict): class name -> (start, end, count) of its offsets
+      in the index, for the classes whose offsets are not parsed yet.
+    - index (bytes): The sections of the sidecar index.
+    - offsets (dict): class name -> {key: offset of the record}, for
+      the classes parsed so far.
+    """
+
+    def __init__(self, path, index_path):
+        """
+        Maps a records file and loads its index.
+
+        Parameters:
+            path (str): The records file.
+            index_path (str): Its sidecar index.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.sections = {}
+        self.index = b""
+        self.offsets = {}
+        if not self.__read_index(index_path):
+            for key, offset, start, end in RECORDS.scan(self.data):
+                self.offsets.setdefault(
+                        key.split(".", 1)[0], {})[key] = offset
+        self.counts = {class_name: len(offsets)
+                       for class_name, offsets in self.offsets.items()}
+        for class_name, (start, end, count) in self.sections.items():
+            self.counts[class_name] = count
+
+    def __read_index(self, index_path):
+        """Reads the sidecar index; returns False if it is missing or was
+        written for another version of the file."""
+        try:
+            with open(index_path, "rb") as file:
+                header = json.loads(file.readline())
+                index = file.read()
+        except (OSError, ValueError):
+            return False
+        if not isinstance(header, dict) or \
+                header.get("file") != file_stamp(self.path):
+            return False
+        self.sections = {class_name: (start, end, count)
+                         for class_name, (start, end, count)
+                         in header["classes"].items()}
+        self.index = index
+        return True
+
+    def class_offsets(self, class_name):
+        """
+        Returns the {key: offset} of the records of a class, parsing its
+        section of the index the first time.
+
+        Parameters:
+            class_name (str): A class name.
+
+        Returns:
+            dict: key -> offset of the record.
+        """
+        offsets = self.offsets.get(class_name)
+        if offsets is None:
+            start, end, count = self.sections.pop(class_name, (0, 0, 0))
+            offsets = json.loads(self.index[start:end]) if end else {}
+            self.offsets[class_name] = offsets
+        return offsets
+
+    def read(self, offset):
+        """
+        Decodes the record at offset.
+
+        Parameters:
+            offset (int): Offset of the record header.
+
+        Returns:
+            dict: The record.
+        """
+        body_length, key_length = RECORD_HEADER.unpack_from(self.data, offset)
+        start = offset + RECORD_HEADER.size + key_length
+        return json.loads(self.data[start:start + body_length])
+
+    def views(self):
+        """
+        Returns a MappedRecords view of each class in the file.
+
+        Returns:
+            dict: class name -> MappedRecords.
+        """
+        return {class_name: MappedRecords(self, class_name)
+                for class_name in self.counts}
+
+
+class MappedRecords(MutableMapping):
+    """
+    MappedRecords is the {key: record} dictionary of one class, backed by
+    a RecordFile: lookups decode a single record, and len() or membership
+    decode none.
+
+    Records stored in the view (from the write-ahead log) shadow the file.
+
+    Attributes:
+    - file (RecordFile): The mapped file.
+    - class_name (str): The class of the records.
+    - loaded (dict): key -> record stored in the view itself.
+    """
+
+    def __init__(self, file, class_name):
+        """
+        Creates a view over the records of one class of a file.
+
+        Parameters:
+            file (RecordFile): The mapped file.
+            class_name (str): The class of the records.
+        """
+        self.file = file
+        self.class_name = class_name
+        self.loaded = {}
+
+    @property
+    def offsets(self):
+        """key -> offset of the records still read from the file."""
+        return self.file.class_offsets(self.class_name)
+
+    def __getitem__(self, key):
+        """Returns the record of key, decoding it from the file."""
+        if key in self.loaded:
+            return self.loaded[key]
+        return self.file.read(self.offsets[key])
+
+    def __setitem__(self, key, obj_dict):
+        """Stores a record, shadowing the file."""
+        self.offsets.pop(key, None)
+        self.loaded[key] = obj_dict
+
+    def __delitem__(self, key):
+        """Removes the record of key."""
+        if self.loaded.pop(key, None) is None:
+            del self.offsets[key]
+
+    def __contains__(self, key):
+        """Tells whether key has a record, without decoding it."""
+        return key in self.offsets or key in self.loaded
+
+    def __iter__(self):
+        """Iterates over the keys."""
+        yield from self.offsets
+        yield from self.loaded
+
+    def __len__(self):
+        """Returns the number of records, without parsing any offset."""
+        if self.class_name in self.file.sections:
+            return self.file.counts[self.class_name] + len(self.loaded)
+        return len(self.offsets) + len(self.loaded)
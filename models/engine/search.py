@@ -0,0 +1,267 @@
+#!/usr/bin/python3
+
+"""
+Module: search
+
+This module defines TextIndex, an inverted index over the free-text
+attributes of one model class (Place name and description, Review
+text), ranked with BM25.
+
+A TextIndex is only built on its first search: until then the changes
+it is notified of cost nothing. Once built, it is maintained
+incrementally. It can be dumped to, and restored from, a JSON document
+kept next to the storage file; restoring checks the signature of every
+document against the objects and reindexes the ones that changed since.
+
+Functions:
+- tokenize(text): Splits text into lowercase search terms.
+- signature(texts): Returns a checksum of the indexed text of a document.
+
+Classes:
+- TextIndex: BM25-ranked inverted index of one class.
+"""
+
+import heapq
+import math
+import re
+import zlib
+from collections import Counter
+
+from models.engine.indexes import class_name_of
+
+# Runs of letters and digits, in any script
+TOKEN = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in",
+    "is", "it", "of", "on", "or", "that", "the", "this", "to", "was",
+    "with"))
+# Text attributes indexed per class
+TEXT_ATTRIBUTES = {"Place": ("name", "description"), "Review": ("text",)}
+# BM25 parameters: term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """
+    Splits text into search terms.
+
+    Parameters:
+        text (str): Free text.
+
+    Returns:
+        list: The lowercase words of text, stopwords left out.
+    """
+    return [term for term in TOKEN.findall(text.lower())
+            if term not in STOPWORDS]
+
+
+def signature(texts):
+    """
+    Returns a checksum of the indexed text of a document.
+
+    Parameters:
+        texts (list): The text of each indexed attribute.
+
+    Returns:
+        int: CRC-32 of the texts.
+    """
+    return zlib.crc32("\0".join(texts).encode("utf-8"))
+
+
+class TextIndex:
+    """
+    TextIndex maps the terms of the text attributes of one class to the
+    objects containing them, with their frequencies, and ranks searches
+    with BM25.
+
+    Attributes:
+    - class_name (str): Name of the indexed class.
+    - names (tuple): Names of the indexed attributes.
+    - built (bool): Whether the index is built and maintained.
+    - changes (int): Documents indexed or removed since it was last
+      dumped or restored.
+    - postings (dict): term -> {key: term frequency}.
+    - documents (dict): key -> (signature, length in terms).
+    - total (int): Sum of the lengths of the documents.
+    """
+
+    def __init__(self, cls, names):
+        """
+        Creates an empty, unbuilt index.
+
+        Parameters:
+            cls: The model class or class name to index.
+            names (tuple): The text attributes to index.
+        """
+        self.class_name = class_name_of(cls)
+        self.names = tuple(names)
+        self.clear()
+
+    def __texts(self, obj, replaced=None, old=None):
+        """Returns the text of each indexed attribute of obj, with the
+        attribute replaced read as old."""
+        texts = []
+        for name in self.names:
+            value = old if name == replaced else getattr(obj, name, None)
+            texts.append(value if isinstance(value, str) else "")
+        return texts
+
+    def __insert(self, key, texts):
+        """Indexes a document."""
+        terms = Counter(tokenize(" ".join(texts)))
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[key] = count
+        length = sum(terms.values())
+        self.documents[key] = (signature(texts), length)
+        self.total += length
+        self.changes += 1
+
+    def __discard(self, key, texts):
+        """Removes a document, given the text it was indexed with."""
+        document = self.documents.pop(key, None)
+        if document is None:
+            return
+        self.total -= document[1]
+        for term in set(tokenize(" ".join(texts))):
+            bucket = self.postings.get(term)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self.postings[term]
+        self.changes += 1
+
+    def add(self, key, obj):
+        """Indexes obj if the index is built and obj is of its class."""
+        if self.built and class_name_of(obj) == self.class_name:
+            self.__insert(key, self.__texts(obj))
+
+    def remove(self, key, obj):
+        """Removes obj from the index."""
+        if self.built and class_name_of(obj) == self.class_name:
+            self.__discard(key, self.__texts(obj))
+
+    def update(self, key, obj, name, old):
+        """Reindexes obj when one of its text attributes changed."""
+        if self.built and name in self.names and \
+                class_name_of(obj) == self.class_name:
+            self.__discard(key, self.__texts(obj, name, old))
+            self.__insert(key, self.__texts(obj))
+
+    def clear(self):
+        """Forgets every document; the index is built again when next
+        searched."""
+        self.built = False
+        self.changes = 0
+        self.postings = {}
+        self.documents = {}
+        self.total = 0
+
+    def build(self, objects, state=None):
+        """
+        Builds the index from the objects of its class.
+
+        Parameters:
+            objects (dict): {key: obj} of every object of the class.
+            state (dict): A document returned by dump(), restored instead
+            of indexing every object again; the objects whose text no
+            longer matches it are reindexed, and the ones gone dropped.
+        """
+        self.clear()
+        if state is not None and state.get("names") == list(self.names):
+            keys = [key for key, _, _ in state["documents"]]
+            self.documents = {key: (sig, length)
+                              for key, sig, length in state["documents"]}
+            self.total = sum(length for _, length in
+                             self.documents.values())
+            for term, flat in state["postings"].items():
+                self.postings[term] = {keys[flat[i]]: flat[i + 1]
+                                       for i in range(0, len(flat), 2)}
+            self.built = True
+            stale = {key for key in self.documents if key not in objects}
+            changed = []
+            for key, obj in objects.items():
+                texts = self.__texts(obj)
+                document = self.documents.get(key)
+                if document is None or document[0] != signature(texts):
+                    if document is not None:
+                        stale.add(key)
+                    changed.append((key, texts))
+            self.__forget(stale)
+            for key, texts in changed:
+                self.__insert(key, texts)
+            self.changes = len(stale) + len(changed)
+        else:
+            self.built = True
+            for key, obj in objects.items():
+                self.__insert(key, self.__texts(obj))
+
+    def __forget(self, keys):
+        """Removes documents whose indexed text is unknown, in one pass
+        over the posting lists."""
+        if not keys:
+            return
+        for key in keys:
+            self.total -= self.documents.pop(key)[1]
+        for term in list(self.postings):
+            bucket = self.postings[term]
+            for key in keys.intersection(bucket):
+                del bucket[key]
+            if not bucket:
+                del self.postings[term]
+
+    def dump(self):
+        """
+        Returns the index as a JSON-serializable document for build().
+
+        Postings are flattened to [document number, frequency, ...]
+        lists, so that each key is written once.
+
+        Returns:
+            dict: The names, documents and postings of the index.
+        """
+        numbers = {}
+        documents = []
+        for key, (sig, length) in self.documents.items():
+            numbers[key] = len(documents)
+            documents.append([key, sig, length])
+        postings = {}
+        for term, bucket in self.postings.items():
+            flat = postings[term] = []
+            for key, count in bucket.items():
+                flat.extend((numbers[key], count))
+        self.changes = 0
+        return {"names": list(self.names), "documents": documents,
+                "postings": postings}
+
+    def search(self, text, limit=None):
+        """
+        Ranks the documents containing any term of text with BM25.
+
+        Parameters:
+            text (str): The search terms.
+            limit (int): Maximum number of results, or None for all.
+
+        Returns:
+            list: (key, score) pairs, best first, ties by key.
+        """
+        count = len(self.documents)
+        if not count:
+            return []
+        average = self.total / count or 1
+        scores = {}
+        for term in set(tokenize(text)):
+            bucket = self.postings.get(term)
+            if not bucket:
+                continue
+            idf = math.log(1 + (count - len(bucket) + 0.5) /
+                           (len(bucket) + 0.5))
+            documents = self.documents
+            for key, frequency in bucket.items():
+                norm = K1 * (1 - B + B * documents[key][1] / average)
+                scores[key] = scores.get(key, 0) + \
+                    idf * frequency * (K1 + 1) / (frequency + norm)
+        rank = (lambda item: (-item[1], item[0]))
+        if limit is None:
+            return sorted(scores.items(), key=rank)
+        return heapq.nsmallest(limit, scores.items(), key=rank)
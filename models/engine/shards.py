@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+
+"""
+Module: shards
+
+This module defines the naming of the sharded FileStorage layout: a
+directory next to the JSON file holding one file per model class, or
+per class and hash bucket of the object id.
+
+    file.json.d/User.json           one bucket per class
+    file.json.d/Review.0.json       several buckets per class
+    file.json.d/Review.1.json
+
+Functions:
+- shard_of(key, buckets): Returns the shard a storage key belongs to.
+- shard_path(directory, shard): Returns the file of a shard.
+- list_shards(directory): Returns the shard files found in a directory.
+"""
+
+import os
+from zlib import crc32
+
+SHARD_SUFFIX = ".json"
+
+
+def shard_of(key, buckets):
+    """
+    Returns the shard a storage key belongs to.
+
+    The bucket is a CRC-32 of the id, stable across processes (unlike
+    hash(), which is salted per process).
+
+    Parameters:
+        key (str): A "<class name>.<id>" storage key.
+        buckets (int): Number of buckets per class.
+
+    Returns:
+        str: "<class name>" or "<class name>.<bucket>".
+    """
+    class_name, obj_id = key.split(".", 1)
+    if buckets <= 1:
+        return class_name
+    return f"{class_name}.{crc32(obj_id.encode('utf-8')) % buckets}"
+
+
+def shard_path(directory, shard):
+    """
+    Returns the file of a shard.
+
+    Parameters:
+        directory (str): The shard directory.
+        shard (str): A shard name from shard_of().
+
+    Returns:
+        str: Path of the shard file.
+    """
+    return os.path.join(directory, shard + SHARD_SUFFIX)
+
+
+def list_shards(directory):
+    """
+    Returns the shard files found in a directory.
+
+    Parameters:
+        directory (str): The shard directory.
+
+    Returns:
+        tuple: ({class name: [paths]}, buckets), buckets being the number
+        of buckets per class the files were written with.
+    """
+    shards = {}
+    buckets = 1
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(SHARD_SUFFIX):
+            continue
+        parts = entry.name[:-len(SHARD_SUFFIX)].split(".")
+        if len(parts) == 2 and parts[1].isdigit():
+            buckets = max(buckets, int(parts[1]) + 1)
+        elif len(parts) != 1:
+            continue
+        shards.setdefault(parts[0], []).append(entry.path)
+    return shards, buckets
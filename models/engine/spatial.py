@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+
+"""
+Module: spatial
+
+This module defines GridIndex, a spatial index over the latitude and
+longitude of one model class.
+
+The globe is cut into square cells of a fixed number of degrees; each
+object is filed under the cell holding its coordinates, so a query only
+visits the cells overlapping its area.
+
+Classes:
+- GridIndex: Fixed-size latitude/longitude grid.
+
+Functions:
+- haversine(lat1, lon1, lat2, lon2): Great-circle distance in km.
+"""
+
+from math import asin, cos, floor, radians, sin, sqrt
+
+from models.engine.indexes import class_name_of
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Returns the great-circle distance between two points.
+
+    Parameters:
+        lat1, lon1 (float): First point, in degrees.
+        lat2, lon2 (float): Second point, in degrees.
+
+    Returns:
+        float: Distance in kilometres.
+    """
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    a = (sin((lat2 - lat1) / 2) ** 2 +
+         cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+class GridIndex:
+    """
+    GridIndex files the objects of one class under fixed-size cells of
+    their latitude and longitude.
+
+    Objects whose coordinates are not numbers are left out.
+
+    Attributes:
+    - class_name (str): Name of the indexed class.
+    - lat_name (str): Name of the latitude attribute.
+    - lon_name (str): Name of the longitude attribute.
+    - cell_size (float): Width and height of a cell, in degrees.
+    - width (int): Number of cells around a parallel.
+    - cells (dict): (row, column) -> {key: (lat, lon)}.
+    - positions (dict): key -> (lat, lon, cell) of every indexed object.
+    """
+
+    def __init__(self, cls, lat_name="latitude", lon_name="longitude",
+                 cell_size=0.5):
+        """
+        Creates an empty grid.
+
+        Parameters:
+            cls: The model class or class name to index.
+            lat_name (str): The latitude attribute.
+            lon_name (str): The longitude attribute.
+            cell_size (float): Cell size in degrees.
+        """
+        self.class_name = class_name_of(cls)
+        self.lat_name = lat_name
+        self.lon_name = lon_name
+        self.cell_size = cell_size
+        self.width = int(round(360 / cell_size))
+        self.clear()
+
+    def __cell(self, lat, lon):
+        """Returns the (row, column) cell holding a point."""
+        return (floor((lat + 90) / self.cell_size),
+                floor((lon + 180) / self.cell_size) % self.width)
+
+    def __position(self, obj):
+        """Returns the (lat, lon) of obj, None if they are not numbers."""
+        try:
+            lat = float(getattr(obj, self.lat_name))
+            lon = float(getattr(obj, self.lon_name))
+        except (AttributeError, TypeError, ValueError):
+            return None
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return None
+        return lat, lon
+
+    def add(self, key, obj):
+        """Files obj under the cell of its coordinates."""
+        if class_name_of(obj) != self.class_name:
+            return
+        self.remove(key, obj)
+        position = self.__position(obj)
+        if position is None:
+            return
+        cell = self.__cell(*position)
+        self.cells.setdefault(cell, {})[key] = position
+        self.positions[key] = (*position, cell)
+
+    def remove(self, key, obj):
+        """Removes obj from its cell."""
+        entry = self.positions.pop(key, None)
+        if entry is None:
+            return
+        cell = entry[2]
+        bucket = self.cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self.cells[cell]
+
+    def update(self, key, obj, name, old):
+        """Moves obj when one of its coordinates changed."""
+        if name in (self.lat_name, self.lon_name):
+            self.add(key, obj)
+
+    def clear(self):
+        """Empties the grid."""
+        self.cells = {}
+        self.positions = {}
+
+    def __scan(self, min_lat, max_lat, min_lon, max_lon):
+        """Yields (key, lat, lon) for every point in the covering cells."""
+        first_row, first_column = self.__cell(max(min_lat, -90),
+                                              max(min_lon, -180))
+        last_row, last_column = self.__cell(min(max_lat, 90),
+                                            min(max_lon, 180))
+        if max_lon - min_lon >= 360:
+            columns = range(self.width)
+        elif first_column <= last_column:
+            columns = range(first_column, last_column + 1)
+        else:
+            columns = [*range(first_column, self.width),
+                       *range(0, last_column + 1)]
+        for row in range(first_row, last_row + 1):
+            for column in columns:
+                bucket = self.cells.get((row, column))
+                if bucket:
+                    for key, (lat, lon) in bucket.items():
+                        yield key, lat, lon
+
+    def within(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Returns the keys of the points inside a bounding box.
+
+        A box with min_lon greater than max_lon crosses the antimeridian.
+
+        Parameters:
+            min_lat, min_lon, max_lat, max_lon (float): Box, in degrees.
+
+        Returns:
+            list: Storage keys of the points in the box.
+        """
+        if min_lon <= max_lon:
+            boxes = [(min_lon, max_lon)]
+        else:
+            boxes = [(min_lon, 180), (-180, max_lon)]
+        keys = {}
+        for low, high in boxes:
+            for key, lat, lon in self.__scan(min_lat, max_lat, low, high):
+                if min_lat <= lat <= max_lat and low <= lon <= high:
+                    keys[key] = None
+        return list(keys)
+
+    def nearby(self, lat, lon, radius):
+        """
+        Returns the points within radius km of (lat, lon), nearest first.
+
+        Parameters:
+            lat, lon (float): Centre, in degrees.
+            radius (float): Radius, in kilometres.
+
+        Returns:
+            list: (key, distance in km) pairs sorted by distance.
+        """
+        lat_span = radius / KM_PER_DEGREE
+        min_lat, max_lat = lat - lat_span, lat + lat_span
+        shrink = min(cos(radians(max(abs(min_lat), abs(max_lat)))), 1.0)
+        if min_lat <= -90 or max_lat >= 90 or shrink <= 0:
+            min_lon, max_lon = -180, 180
+        else:
+            lon_span = lat_span / shrink
+            if lon_span >= 180:
+                min_lon, max_lon = -180, 180
+            else:
+                min_lon, max_lon = lon - lon_span, lon + lon_span
+        if min_lon < -180:
+            scans = [(min_lon + 360, 180), (-180, max_lon)]
+        elif max_lon > 180:
+            scans = [(min_lon, 180), (-180, max_lon - 360)]
+        else:
+            scans = [(min_lon, max_lon)]
+        found = {}
+        for low, high in scans:
+            for key, point_lat, point_lon in self.__scan(min_lat, max_lat,
+                                                         low, high):
+                distance = haversine(lat, lon, point_lat, point_lon)
+                if distance <= radius:
+                    found[key] = distance
+        return sorted(found.items(), key=lambda item: item[1])
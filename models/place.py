@@ -11,6 +11,7 @@ managing and storing instances from models.base_model import BaseModel
 """
 
 
+import models
 from models.base_model import BaseModel
 
 
@@ -31,6 +32,8 @@ class Place(BaseModel):
     - longitude (float): The longitude coordinate of the place.
     - amenity_ids (list): A list of identifiers for amenities associated
       with the place.
+    - reviews (list): The reviews of the place (read-only).
+    - amenities (list): The amenities listed in amenity_ids (read-only).
     """
     city_id = ""
     user_id = ""
@@ -43,3 +46,16 @@ class Place(BaseModel):
     latitude = 0.0
     longitude = 0.0
     amenity_ids = []
+
+    @property
+    def reviews(self):
+        """The Review objects whose place_id is the id of this place."""
+        return list(models.storage.find("Review", "place_id",
+                                        self.id).values())
+
+    @property
+    def amenities(self):
+        """The stored Amenity objects listed in amenity_ids, in order."""
+        amenities = (models.storage.get("Amenity", amenity_id)
+                     for amenity_id in self.amenity_ids)
+        return [amenity for amenity in amenities if amenity is not None]
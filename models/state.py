@@ -8,6 +8,7 @@ It is a subclass of the BaseModel class, providing common
 functionality for managing and storing instances.
 """
 
+import models
 from models.base_model import BaseModel
 
 
@@ -17,5 +18,11 @@ class State(BaseModel):
 
     Attributes:
     - name (str): The name of the state.
+    - cities (list): The cities of the state (read-only).
     """
     name = ""
+
+    @property
+    def cities(self):
+        """The City objects whose state_id is the id of this state."""
+        return list(models.storage.find("City", "state_id", self.id).values())
@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+
+"""
+This module contains unit tests for the console commands.
+"""
+
+import ast
+import io
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import models
+from console import HBNBCommand
+from models import storage
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestConsole(unittest.TestCase):
+    """
+    Unit tests for the console, reading what the commands print.
+    """
+
+    def setUp(self):
+        """
+        Set up five places in an empty store, saved so that the commands
+        do not reload it.
+        """
+        self.file_path = "console_file.json"
+        self.saved_path = FileStorage._FileStorage__file_path
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        storage.disable_fsync()
+        self.places = []
+        for i, (price, latitude) in enumerate(((80, 5.5), (200, 5.6),
+                                               (50, 40.0), (120, 5.55),
+                                               (90, -10.0))):
+            place = Place()
+            place.name = "place {}".format(i)
+            place.price_by_night = price
+            place.latitude = latitude
+            place.longitude = 0.0
+            place.city_id = "north" if latitude > 0 else "south"
+            self.places.append(place)
+        self.places[0].description = "cozy loft near the river"
+        self.places[1].description = "big loft downtown"
+        storage.save()
+
+    def tearDown(self):
+        """
+        Clean up test fixtures.
+        """
+        while storage.commit():
+            pass
+        storage.enable_fsync()
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__file_path = self.saved_path
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def run_command(self, line):
+        """
+        Runs a console command and returns what it printed.
+        """
+        with patch("sys.stdout", new_callable=io.StringIO) as output:
+            HBNBCommand().onecmd(line)
+        return output.getvalue()
+
+    def listed(self, places):
+        """
+        Returns the output of printing the list of places.
+        """
+        return str([str(place) for place in places]) + "\n"
+
+    def test_all_prints_the_list(self):
+        """
+        Test that all prints what printing the whole list used to.
+        """
+        self.assertEqual(self.run_command("all Place"),
+                         self.listed(storage.all("Place").values()))
+        self.assertEqual(self.run_command("all"),
+                         self.listed(storage.all().values()))
+        self.assertEqual(self.run_command("all Amenity"), "[]\n")
+        self.assertEqual(self.run_command("Place.all()"),
+                         self.listed(storage.all("Place").values()))
+
+    def test_all_pages(self):
+        """
+        Test --limit, --offset and --page.
+        """
+        places = list(storage.all("Place").values())
+        self.assertEqual(self.run_command("all Place --limit 2"),
+                         self.listed(places[:2]))
+        self.assertEqual(self.run_command("all Place --offset 1 --limit 3"),
+                         self.listed(places[1:4]))
+        self.assertEqual(self.run_command("all Place --limit 2 --page 2"),
+                         self.listed(places[2:4]))
+        self.assertEqual(self.run_command("all Place --limit 2 --page 3"),
+                         self.listed(places[4:]))
+        self.assertEqual(self.run_command("all Place --limit 2 --page 4"),
+                         "[]\n")
+        self.assertEqual(self.run_command("all Place --offset 1 --page 2 "
+                                          "--limit 2"),
+                         self.listed(places[3:5]))
+        with patch("console.PAGE_SIZE", 3):
+            self.assertEqual(self.run_command("all Place --page 2"),
+                             self.listed(places[3:]))
+
+    def test_all_option_forms(self):
+        """
+        Test that --opt=value and --opt value are the same option.
+        """
+        for spaced, joined in (("--limit 2", "--limit=2"),
+                               ("--offset 3", "--offset=3"),
+                               ("--page 2 --limit 2", "--page=2 --limit=2")):
+            with self.subTest(option=spaced):
+                self.assertEqual(
+                        self.run_command("all Place " + spaced),
+                        self.run_command("all Place " + joined))
+
+    def test_all_json_lines(self):
+        """
+        Test that --json prints the to_dict() of one instance per line.
+        """
+        lines = self.run_command("all Place --json --limit 2").splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [place.to_dict() for place
+                          in list(storage.all("Place").values())[:2]])
+
+    def test_all_errors(self):
+        """
+        Test the error messages of the all command.
+        """
+        for line, message in (
+                ("all Place --limit x", "** --limit requires a number **"),
+                ("all Place --limit=-1", "** --limit requires a number **"),
+                ("all Place --offset", "** --offset requires a number **"),
+                ("all Place --page 0", "** pages are numbered from 1 **"),
+                ("all Place --bogus", "** unknown option: --bogus **"),
+                ("all Nope", "** class doesn't exist **")):
+            with self.subTest(line=line):
+                self.assertEqual(self.run_command(line), message + "\n")
+
+    def test_begin_and_commit(self):
+        """
+        Test that a batch writes its changes on commit only.
+        """
+        self.assertEqual(self.run_command("begin"), "")
+        place = Place()
+        place.save()
+        with open(self.file_path, encoding="utf-8") as file:
+            self.assertNotIn(place.id, file.read())
+        self.assertEqual(self.run_command("commit"), "")
+        with open(self.file_path, encoding="utf-8") as file:
+            self.assertIn(place.id, file.read())
+        self.assertEqual(self.run_command("commit"),
+                         "** no batch in progress **\n")
+        self.assertEqual(self.run_command("begin many"),
+                         "** max_saves must be an integer **\n")
+
+    def test_where(self):
+        """
+        Test the query syntax and its errors.
+        """
+        self.assertEqual(
+                self.run_command('Place.where(price_by_night__gte=90)'
+                                 '.order_by("-price_by_night").limit(2)'),
+                "".join(str(self.places[i]) + "\n" for i in (1, 3)))
+        self.assertEqual(self.run_command('Place.where(name="none")'), "")
+        self.assertEqual(self.run_command("Place.where(price=len)"),
+                         "** invalid query **\n")
+        self.assertEqual(self.run_command("Nope.where(name=1)"),
+                         "** class doesn't exist **\n")
+        self.assertTrue(self.run_command("Place.where(price__near=1)")
+                        .startswith("** invalid query: "))
+
+    def test_aggregates(self):
+        """
+        Test the aggregate syntax and its errors.
+        """
+        self.assertEqual(self.run_command('Place.avg("price_by_night")'),
+                         "108.0\n")
+        self.assertEqual(
+                self.run_command('Place.max("price_by_night", '
+                                 'by="city_id")'),
+                str({"north": 200, "south": 90}) + "\n")
+        self.assertEqual(self.run_command('Place.count(by="city_id")'),
+                         str({"north": 4, "south": 1}) + "\n")
+        self.assertEqual(self.run_command("Place.avg()"),
+                         "** invalid aggregate: avg needs an attribute **\n")
+        self.assertEqual(self.run_command('Place.avg("a").max("b")'),
+                         "** invalid aggregate **\n")
+
+    def test_search(self):
+        """
+        Test the search command and its errors.
+        """
+        self.assertEqual(self.run_command('search Place "cozy loft"'),
+                         self.listed(self.places[:2]))
+        self.assertEqual(self.run_command('search Place "loft" 1'),
+                         self.listed(self.places[1:2]))
+        for line, message in (
+                ("search", "** class name missing **"),
+                ("search Nope loft", "** class doesn't exist **"),
+                ("search City loft", "** City has no text to search **"),
+                ("search Place", "** search terms missing **"),
+                ('search Place "loft', "** unbalanced quotes **"),
+                ("search Place loft many", "** limit must be a number **")):
+            with self.subTest(line=line):
+                self.assertEqual(self.run_command(line), message + "\n")
+
+    def test_nearby_and_within(self):
+        """
+        Test the spatial commands and their errors.
+        """
+        self.assertEqual(self.run_command("nearby 5.5 0 20"),
+                         self.listed([self.places[i] for i in (0, 3, 1)]))
+        self.assertEqual(
+                sorted(ast.literal_eval(self.run_command("within 5 -1 6 1"))),
+                sorted(str(self.places[i]) for i in (0, 1, 3)))
+        for line, message in (
+                ("nearby 5.5 0",
+                 "** latitude, longitude and radius required **"),
+                ("nearby 5.5 0 far",
+                 "** coordinates and radius must be numbers **"),
+                ("within 5 -1 6",
+                 "** min_lat, min_lon, max_lat and max_lon required **"),
+                ("within 5 -1 6 east", "** coordinates must be numbers **")):
+            with self.subTest(line=line):
+                self.assertEqual(self.run_command(line), message + "\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
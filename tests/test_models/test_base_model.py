@@ -14,6 +14,7 @@ import uuid
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
+import models
 from models import storage
 from models.base_model import BaseModel
 
@@ -160,6 +161,18 @@ class TestBaseModel(unittest.TestCase):
         with self.assertRaises(ValueError):
             BaseModel(**model_dict)
 
+    def test_instantiation_from_dict_without_microseconds(self):
+        """
+        Test that timestamps whose isoformat() has no microseconds are
+        parsed back.
+        """
+        model_dict = self.base_model_1.to_dict()
+        model_dict['created_at'] = '2024-02-03T04:05:06'
+        new_model = BaseModel(**model_dict)
+        self.assertEqual(new_model.created_at, datetime(2024, 2, 3, 4, 5, 6))
+        self.assertEqual(new_model.to_dict()['created_at'],
+                         model_dict['created_at'])
+
     def test_updated_created_data_types_from_dict(self):
         """
         Test that the 'updated_at' and 'created_at' attributes are datetime
@@ -188,6 +201,7 @@ class TestBaseModel(unittest.TestCase):
         with self.assertRaises(TypeError):
             self.base_model_1.save(123)
 
+    @unittest.skipIf(models.storage_t == "db", "not testing file storage")
     def test_json_file_created_on_save(self):
         """
         Test that a JSON file is created upon calling the save method.
@@ -196,6 +210,7 @@ class TestBaseModel(unittest.TestCase):
         self.base_model_1.save()
         self.assertTrue(os.path.exists("file.json"))
 
+    @unittest.skipIf(models.storage_t == "db", "not testing file storage")
     def test_storage_instance_type(self):
         """
         Test that the stored instances in the JSON file are of type dict.
@@ -281,6 +296,7 @@ class Test_BaseModel(unittest.TestCase):
         self.assertEqual(printb,
                          "[BaseModel] ({}) {}".format(b.id, b.__dict__))
 
+    @unittest.skipIf(models.storage_t == "db", "not testing file storage")
     def test_save(self):
         """
         Test the save method, checking for file creation and attribute updates.
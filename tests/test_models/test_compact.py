@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+
+"""
+This module contains unit tests for the compact model representation.
+"""
+
+import os
+import unittest
+
+import models
+from models.compact import CompactModel, compact_model
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.user import User
+
+
+class TestCompactModel(unittest.TestCase):
+    """
+    Unit tests for the __slots__-backed model classes.
+    """
+
+    def setUp(self):
+        """
+        Set up test fixtures.
+        """
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.place = Place()
+        self.place.name = "loft"
+        self.record = self.place.to_dict()
+
+    def tearDown(self):
+        """
+        Clean up test fixtures.
+        """
+        self.storage.disable_compact()
+        FileStorage._FileStorage__objects = {}
+        try:
+            os.remove(FileStorage._FileStorage__file_path)
+        except FileNotFoundError:
+            pass
+
+    def test_class_shape(self):
+        """
+        Test that compact classes keep the name and have no __dict__.
+        """
+        compact = compact_model(Place)
+        self.assertIs(compact, compact_model(Place))
+        self.assertEqual(compact.__name__, "Place")
+        self.assertTrue(issubclass(compact, CompactModel))
+        self.assertFalse(hasattr(compact(**self.record), "__dict__"))
+
+    def test_to_dict_and_str_contract(self):
+        """
+        Test that to_dict and __str__ match the regular representation.
+        """
+        obj = compact_model(Place)(**self.record)
+        self.assertEqual(obj.to_dict(), self.record)
+        self.assertEqual(str(obj), str(self.place))
+
+    def test_str_keeps_the_order_attributes_were_set_in(self):
+        """
+        Test that attributes set out of declaration order are listed like
+        the regular representation lists them.
+        """
+        self.place.max_guest = 4
+        self.place.city_id = "c1"
+        record = self.place.to_dict()
+        obj = compact_model(Place)(**record)
+        self.assertEqual(str(obj), str(self.place))
+        self.assertEqual(list(obj.to_dict()), list(record))
+        obj.nickname = "loft"
+        obj.description = "big"
+        self.place.nickname = "loft"
+        self.place.description = "big"
+        self.assertEqual(str(obj), str(self.place))
+        fresh = compact_model(Place)(**self.record)
+        fresh.number_rooms = 2
+        fresh.user_id = "u1"
+        self.assertEqual(list(fresh.attributes())[-2:],
+                         ["number_rooms", "user_id"])
+
+    def test_defaults_and_extra_attributes(self):
+        """
+        Test class defaults and the fallback dict for ad-hoc attributes.
+        """
+        obj = compact_model(User)(**self.record)
+        self.assertEqual(obj.email, "")
+        self.assertNotIn("email", obj.to_dict())
+        obj.nickname = "ada"
+        self.assertEqual(obj.nickname, "ada")
+        self.assertEqual(obj.to_dict()["nickname"], "ada")
+        with self.assertRaises(AttributeError):
+            obj.missing
+
+    @unittest.skipIf(models.storage_t == "db", "not testing file storage")
+    def test_reload_builds_compact_instances(self):
+        """
+        Test that storage reloads compact instances when enabled.
+        """
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.enable_compact()
+        self.storage.reload()
+        obj = self.storage.get(Place, self.place.id)
+        self.assertIsInstance(obj, CompactModel)
+        self.assertEqual(obj.to_dict(), self.record)
+        obj.city_id = "city"
+        self.assertIn("Place." + obj.id,
+                      self.storage.find(Place, "city_id", "city"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+
+
+"""Unittest cases for the asyncio storage facade"""
+
+
+import asyncio
+import json
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+import models
+from models.engine.async_storage import AsyncStorage
+from models.engine.atomic import write_files
+from models.engine.db_storage import DBStorage
+from models.engine.file_storage import FileStorage
+from models.city import City
+from models.place import Place
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestAsyncStorage(unittest.IsolatedAsyncioTestCase):
+    """Tests for AsyncStorage over a FileStorage of its own file."""
+
+    async def asyncSetUp(self):
+        self.file_path = "async_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.storage.disable_fsync()
+        self.facade = AsyncStorage(self.storage)
+
+    async def asyncTearDown(self):
+        await self.facade.aclose()
+        self.storage.enable_fsync()
+        FileStorage._FileStorage__objects = {}
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    async def test_save_and_get(self):
+        place = Place()
+        place.name = "loft"
+        await self.facade.asave()
+        with open(self.file_path, encoding="utf-8") as file:
+            self.assertIn("Place." + place.id, json.load(file))
+        FileStorage._FileStorage__objects = {}
+        await self.facade.areload()
+        self.assertEqual((await self.facade.aget(Place, place.id)).name,
+                         "loft")
+        self.assertEqual(await self.facade.acount(Place), 1)
+        self.assertEqual(list(await self.facade.aall(Place)),
+                         ["Place." + place.id])
+
+    async def test_concurrent_saves_are_coalesced(self):
+        with mock.patch.object(self.storage, "save",
+                               wraps=self.storage.save) as save:
+            cities = [City() for _ in range(20)]
+            await asyncio.gather(*(self.facade.asave() for _ in cities))
+            self.assertLessEqual(save.call_count, 2)
+        with open(self.file_path, encoding="utf-8") as file:
+            self.assertEqual(len(json.load(file)), 20)
+
+    async def test_changes_do_not_wait_for_writes(self):
+        place = Place()
+        await self.facade.asave()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_write(files, fsync=True):
+            started.set()
+            # Times out if the loop is blocked, failing the test instead
+            # of hanging it
+            release.wait(2)
+            write_files(files, fsync)
+        target = "models.engine.file_storage.write_files"
+        with mock.patch(target, side_effect=slow_write):
+            place.name = "loft"
+            saving = asyncio.ensure_future(self.facade.asave())
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            start = time.perf_counter()
+            place.name = "attic"
+            self.assertLess(time.perf_counter() - start, 1)
+            release.set()
+            await saving
+        await self.facade.asave()
+        with open(self.file_path, encoding="utf-8") as file:
+            self.assertEqual(
+                    json.load(file)["Place." + place.id]["name"], "attic")
+
+    async def test_save_errors_reach_every_caller(self):
+        City()
+        with mock.patch("os.replace", side_effect=OSError("disk full")):
+            results = await asyncio.gather(
+                    self.facade.asave(), self.facade.asave(),
+                    return_exceptions=True)
+        for result in results:
+            self.assertIsInstance(result, OSError)
+
+
+class TestAsyncDBStorage(unittest.IsolatedAsyncioTestCase):
+    """Tests for AsyncStorage over a DBStorage."""
+
+    async def asyncSetUp(self):
+        self.db_path = "test_async_storage.db"
+        self.storage = DBStorage(self.db_path)
+        self.storage.reload()
+        self.facade = AsyncStorage(self.storage)
+
+    async def asyncTearDown(self):
+        await self.facade.aclose()
+        self.storage.close()
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    async def test_save_and_get(self):
+        city = City()
+        self.storage.new(city)
+        await self.facade.asave()
+        self.storage.close()
+        self.assertEqual((await self.facade.aget(City, city.id)).id, city.id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+
+
+"""Unittest cases for the SQLite storage engine"""
+
+
+import os
+import sqlite3
+import unittest
+from models.engine.db_storage import DBStorage
+from models.base_model import BaseModel
+from models.city import City
+from models.place import Place
+from models.state import State
+
+
+class TestDBStorage(unittest.TestCase):
+    """Tests for DBStorage, on a database of its own."""
+
+    def setUp(self):
+        self.db_path = "test_db_storage.db"
+        self.storage = DBStorage(self.db_path)
+        self.storage.reload()
+
+    def tearDown(self):
+        self.storage.close()
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = DBStorage(self.db_path)
+        self.storage.reload()
+
+    def test_round_trip(self):
+        place = Place()
+        place.name = "loft"
+        place.max_guest = 3
+        place.latitude = 5.6
+        place.amenity_ids = ["a", "b"]
+        place.city_id = 12
+        place.nickname = "extra attribute"
+        BaseModel()
+        self.storage.new(place)
+        self.storage.save()
+        self.reopen()
+        self.assertEqual(self.storage.get(Place, place.id).to_dict(),
+                         place.to_dict())
+        self.assertEqual(self.storage.count(), 1)
+
+    def test_tables_and_indexes(self):
+        connection = sqlite3.connect(self.db_path)
+        names = {row[0] for row in connection.execute(
+                "SELECT name FROM sqlite_master")}
+        connection.close()
+        self.assertLessEqual({"User", "State", "City", "Place", "Review",
+                              "Amenity", "BaseModel"}, names)
+        self.assertLessEqual({"City_state_id", "Place_city_id",
+                              "Place_user_id", "Review_place_id",
+                              "Review_user_id"}, names)
+
+    def test_all_count_get_delete(self):
+        state, city = State(), City()
+        for obj in (state, city):
+            self.storage.new(obj)
+        self.assertEqual(self.storage.count(), 2)
+        self.assertEqual(list(self.storage.all(City)), ["City." + city.id])
+        self.assertIs(self.storage.get("State", state.id), state)
+        self.assertTrue(self.storage.delete(state))
+        self.assertFalse(self.storage.delete(state))
+        self.storage.save()
+        self.reopen()
+        self.assertIsNone(self.storage.get(State, state.id))
+        self.assertEqual(len(self.storage.all()), 1)
+
+    def test_find_uses_columns_and_defaults(self):
+        state = State()
+        linked, unlinked = City(), City()
+        linked.state_id = state.id
+        for obj in (state, linked, unlinked):
+            self.storage.new(obj)
+        self.storage.save()
+        self.reopen()
+        self.assertEqual(list(self.storage.find(City, "state_id", state.id)),
+                         ["City." + linked.id])
+        self.assertEqual(list(self.storage.find(City, "state_id", "")),
+                         ["City." + unlinked.id])
+
+    def test_batch_commits_once(self):
+        other = sqlite3.connect(self.db_path)
+        with self.storage.batch():
+            for i in range(3):
+                city = City()
+                self.storage.new(city)
+                self.storage.save()
+            self.assertEqual(self.storage.count(City), 3)
+            self.assertEqual(other.execute(
+                    'SELECT COUNT(*) FROM "City"').fetchone()[0], 0)
+        self.assertEqual(other.execute(
+                'SELECT COUNT(*) FROM "City"').fetchone()[0], 3)
+        other.close()
+
+    def test_refresh_sees_other_connections(self):
+        self.assertFalse(self.storage.refresh())
+        writer = DBStorage(self.db_path)
+        city = City()
+        writer.new(city)
+        writer.close()
+        self.assertTrue(self.storage.refresh())
+        self.assertEqual(self.storage.get(City, city.id).id, city.id)
+
+    def test_filter_nearby_within(self):
+        cheap, dear, unplaced = Place(), Place(), Place()
+        cheap.price_by_night, cheap.latitude, cheap.longitude = 80, 5.6, -0.2
+        dear.price_by_night, dear.latitude, dear.longitude = 300, 6.7, -1.6
+        for place in (cheap, dear, unplaced):
+            self.storage.new(place)
+        self.assertEqual(sorted(self.storage.filter(
+                Place, price_by_night=(50, None))),
+                sorted([cheap.id, dear.id]))
+        self.assertEqual(self.storage.filter(Place, price_by_night=(1, 100)),
+                         [cheap.id])
+        self.assertEqual([place_id for place_id, _ in
+                          self.storage.nearby(5.6, -0.2, 200)],
+                         [cheap.id, dear.id])
+        self.assertEqual(self.storage.within(5, -1, 6, 1), [cheap.id])
+        self.assertIn(unplaced.id, self.storage.within(-1, -1, 1, 1))
+
+    def test_query(self):
+        for price in (120, 40, 90, 60):
+            place = Place()
+            place.price_by_night = price
+            place.city_id = "city"
+            self.storage.new(place)
+        self.storage.new(Place())
+        self.assertEqual([place.price_by_night for place in
+                          self.storage.query(Place)
+                          .where(price_by_night__lt=100)
+                          .order_by("-price_by_night").offset(1)],
+                         [60, 40, 0])
+        self.assertEqual(self.storage.query("Place")
+                         .where(city_id="city").count(), 4)
+
+    def test_search(self):
+        loft, cabin = Place(), Place()
+        loft.description = "cozy loft near the river"
+        cabin.name, cabin.description = "Cabin", "quiet and cozy"
+        for place in (loft, cabin, Place()):
+            self.storage.new(place)
+        self.assertEqual([obj_id for obj_id, _ in
+                          self.storage.search(Place, "loft cozy")],
+                         [loft.id, cabin.id])
+        self.assertEqual(self.storage.search("Place", "cabin", 1)[0][0],
+                         cabin.id)
+
+    def test_aggregate(self):
+        for i in range(6):
+            place = Place()
+            place.price_by_night = i * 10
+            if i % 2:
+                place.city_id = "city"
+            place.amenity_ids = [str(i)]
+            self.storage.new(place)
+        self.storage.new(Place())
+        self.assertEqual(self.storage.aggregate(Place, "count"), 7)
+        self.assertEqual(self.storage.aggregate(
+                Place, "avg", "price_by_night", by="city_id"),
+                {"": 15, "city": 30})
+        self.assertEqual(self.storage.aggregate(
+                "Place", "max", "price_by_night", by="city_id"),
+                {"": 40, "city": 50})
+        self.assertEqual(self.storage.aggregate(
+                Place, "count", by="amenity_ids"), {})
+        self.assertIsNone(self.storage.aggregate(Place, "min", "name"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,14 +4,28 @@
 """Unittest cases for file storage"""
 
 
+import multiprocessing
+import threading
+import tracemalloc
 import unittest
+from unittest import mock
+from models.engine.atomic import write_files
 from models.engine.file_storage import FileStorage
+from models.engine.locking import ConflictError
+from models.engine.parallel import decode_chunk, decode_chunks
+from models.engine.search import TextIndex
+from models.engine.formats import FORMATS
 from models.base_model import BaseModel
+from models.city import City
+from models.place import Place
+from models.state import State
+import models
 from models import storage
 import os
 import json
 
 
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
 class Test_File_Storage(unittest.TestCase):
     """
     Class for testing File storage class.
@@ -86,6 +100,7 @@ class Test_File_Storage(unittest.TestCase):
         self.assertEqual(getattr(FileStorage, "_FileStorage__objects"), {})
 
 
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
 class TestFileStorageMethods(unittest.TestCase):
 
     def setUp(self):
@@ -146,5 +161,1225 @@ class TestFileStorageMethods(unittest.TestCase):
         self.assertTrue(os.path.exists(new_file_path))
 
 
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageJournal(unittest.TestCase):
+    """Tests for the append-only write-ahead log mode."""
+
+    def setUp(self):
+        self.file_path = "journal_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.storage.enable_journal(limit=5)
+
+    def tearDown(self):
+        self.storage.disable_journal()
+        FileStorage._FileStorage__objects = {}
+        for path in (self.file_path, self.file_path + ".log"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_save_appends_to_log(self):
+        obj = BaseModel()
+        obj.save()
+        self.assertFalse(os.path.exists(self.file_path))
+        with open(self.file_path + ".log", "r") as file:
+            lines = file.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["key"], "BaseModel." + obj.id)
+
+    def test_reload_replays_log(self):
+        kept = BaseModel()
+        gone = BaseModel()
+        self.storage.save()
+        kept.name = "kept"
+        kept.save()
+        self.storage.delete(gone)
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        objects = self.storage.all()
+        self.assertEqual(objects["BaseModel." + kept.id].name, "kept")
+        self.assertNotIn("BaseModel." + gone.id, objects)
+
+    def test_save_logs_attribute_updates(self):
+        obj = BaseModel()
+        obj.save()
+        obj.name = "updated"
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.get(BaseModel, obj.id).name, "updated")
+
+    def test_appends_after_torn_record(self):
+        before = BaseModel()
+        before.save()
+        with open(self.file_path + ".log", "a") as file:
+            file.write('{"key": "BaseModel.torn", "obj": {"id"')
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        first = BaseModel()
+        first.save()
+        second = BaseModel()
+        second.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(set(self.storage.all()),
+                         {"BaseModel." + obj.id
+                          for obj in (before, first, second)})
+
+    def test_compaction_after_limit(self):
+        obj = BaseModel()
+        for _ in range(6):
+            obj.save()
+        self.assertTrue(os.path.exists(self.file_path))
+        self.assertFalse(os.path.exists(self.file_path + ".log"))
+        with open(self.file_path, "r") as file:
+            self.assertIn("BaseModel." + obj.id, json.load(file))
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageIndexes(unittest.TestCase):
+    """Tests for the class and attribute indexes."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_all_and_count_by_class(self):
+        state = State()
+        city = City()
+        BaseModel()
+        self.assertEqual(self.storage.all(City), {"City." + city.id: city})
+        self.assertEqual(self.storage.all("State"),
+                         {"State." + state.id: state})
+        self.assertEqual(self.storage.count("BaseModel"), 1)
+        self.assertEqual(self.storage.count(Place), 0)
+        self.assertEqual(self.storage.count(), 3)
+
+    def test_attribute_index_follows_updates(self):
+        city = City()
+        city.state_id = "first"
+        self.assertEqual(self.storage.find(City, "state_id", "first"),
+                         {"City." + city.id: city})
+        city.state_id = "second"
+        self.assertEqual(self.storage.find(City, "state_id", "first"), {})
+        self.assertIn("City." + city.id,
+                      self.storage.find(City, "state_id", "second"))
+        self.storage.delete(city)
+        self.assertEqual(self.storage.find(City, "state_id", "second"), {})
+
+    def test_declared_index(self):
+        place = Place()
+        place.name = "loft"
+        self.storage.add_index(Place, "name")
+        self.assertIn("Place." + place.id,
+                      self.storage.find(Place, "name", "loft"))
+        place.name = "barn"
+        self.assertEqual(self.storage.find(Place, "name", "loft"), {})
+
+    def test_indexes_rebuilt_after_reset(self):
+        City()
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(self.storage.count(City), 0)
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageLazyReload(unittest.TestCase):
+    """Tests for the lazy reload mode."""
+
+    def setUp(self):
+        self.file_path = "lazy_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.city = City()
+        self.state = State()
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload(lazy=True)
+
+    def tearDown(self):
+        self.storage.reload(lazy=False)
+        FileStorage._FileStorage__objects = {}
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_records_not_built_until_accessed(self):
+        self.assertEqual(self.storage._FileStorage__objects, {})
+        self.assertEqual(self.storage.count(), 2)
+        self.assertEqual(self.storage.count(City), 1)
+
+    def test_get_builds_one_instance(self):
+        city = self.storage.get(City, self.city.id)
+        self.assertEqual(city.to_dict(), self.city.to_dict())
+        self.assertEqual(list(self.storage._FileStorage__objects),
+                         ["City." + self.city.id])
+
+    def test_all_builds_every_instance(self):
+        self.assertEqual(len(self.storage.all()), 2)
+        self.assertEqual(self.storage.count(), 2)
+
+    def test_save_keeps_unbuilt_records(self):
+        self.storage.get(City, self.city.id).save()
+        with open(self.file_path, "r") as file:
+            self.assertIn("State." + self.state.id, json.load(file))
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageRefresh(unittest.TestCase):
+    """Tests for reloading only when the files changed on disk."""
+
+    def setUp(self):
+        self.file_path = "refresh_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.city = City()
+        self.storage.save()
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_unchanged_file_is_not_reloaded(self):
+        self.assertFalse(self.storage.refresh())
+        self.assertIs(self.storage.get(City, self.city.id), self.city)
+
+    def test_external_change_is_reloaded(self):
+        with open(self.file_path, "r") as file:
+            content = json.load(file)
+        del content["City." + self.city.id]
+        content["State.external"] = State(**{
+            "id": "external", "created_at": self.city.to_dict()["created_at"],
+            "updated_at": self.city.to_dict()["updated_at"]}).to_dict()
+        with open(self.file_path, "w") as file:
+            json.dump(content, file)
+        self.assertTrue(self.storage.refresh())
+        self.assertIsNone(self.storage.get(City, self.city.id))
+        self.assertIsNotNone(self.storage.get(State, "external"))
+        self.assertFalse(self.storage.refresh())
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageBatch(unittest.TestCase):
+    """Tests for deferred saves inside batches."""
+
+    def setUp(self):
+        self.file_path = "batch_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+
+    def tearDown(self):
+        while self.storage.commit():
+            pass
+        FileStorage._FileStorage__objects = {}
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_batch_writes_once_on_exit(self):
+        with self.storage.batch():
+            for _ in range(3):
+                BaseModel().save()
+            self.assertFalse(os.path.exists(self.file_path))
+        with open(self.file_path, "r") as file:
+            self.assertEqual(len(json.load(file)), 3)
+
+    def test_nested_batches_write_on_outermost_commit(self):
+        self.storage.begin()
+        with self.storage.batch():
+            BaseModel().save()
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertTrue(self.storage.commit())
+        self.assertTrue(os.path.exists(self.file_path))
+        self.assertFalse(self.storage.commit())
+
+    def test_max_saves_flushes_early(self):
+        with self.storage.batch(max_saves=2):
+            BaseModel().save()
+            self.assertFalse(os.path.exists(self.file_path))
+            BaseModel().save()
+            self.assertTrue(os.path.exists(self.file_path))
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageFormats(unittest.TestCase):
+    """Tests for the pluggable snapshot formats."""
+
+    def setUp(self):
+        self.file_path = "format_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+
+    def tearDown(self):
+        self.storage.set_format(None)
+        FileStorage._FileStorage__disk_format = "json"
+        FileStorage._FileStorage__objects = {}
+        for path in (self.file_path, self.file_path + ".idx"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_round_trip_and_detection(self):
+        city = City()
+        city.name = "Accra"
+        BaseModel()
+        expected = {key: obj.to_dict()
+                    for key, obj in self.storage.all().items()}
+        for name, fmt in FORMATS.items():
+            with self.subTest(format=name):
+                self.storage.migrate(name)
+                # Unsafe formats are only read once selected
+                self.storage.set_format(name if fmt.unsafe else None)
+                FileStorage._FileStorage__objects = {}
+                self.storage.reload()
+                self.assertEqual(
+                    {key: obj.to_dict()
+                     for key, obj in self.storage.all().items()}, expected)
+
+    def test_reload_keeps_detected_format(self):
+        BaseModel()
+        self.storage.migrate("records")
+        self.storage.set_format(None)
+        self.storage.reload()
+        BaseModel().save()
+        with open(self.file_path, "rb") as file:
+            self.assertTrue(file.read().startswith(b"HBNBREC1"))
+
+    def test_reload_keeps_compact_json(self):
+        BaseModel()
+        self.storage.migrate("compact-json")
+        self.storage.set_format(None)
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        BaseModel().save()
+        with open(self.file_path, "rb") as file:
+            self.assertTrue(file.read().startswith(b'{"'))
+
+    def test_pickle_needs_opt_in(self):
+        city = City()
+        self.storage.migrate("pickle")
+        self.storage.set_format(None)
+        FileStorage._FileStorage__objects = {}
+        with self.assertRaisesRegex(ValueError, "HBNB_STORAGE_FORMAT"):
+            self.storage.reload()
+        self.assertEqual(self.storage.all(), {})
+        chunk = (self.file_path, None, 0, None)
+        with self.assertRaises(ValueError):
+            decode_chunk(chunk)
+        self.assertIn("City." + city.id, decode_chunk(chunk, ("pickle",)))
+        self.storage.set_format("pickle")
+        self.storage.reload()
+        self.assertIsNotNone(self.storage.get(City, city.id))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.storage.set_format("xml")
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageColumns(unittest.TestCase):
+    """Tests for the Place numeric columns and filter()."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.places = []
+        for price, guests, latitude in ((80, 4, 5.5), (200, 6, 5.6),
+                                        (50, 2, 40.0)):
+            place = Place()
+            place.price_by_night = price
+            place.max_guest = guests
+            place.latitude = latitude
+            self.places.append(place)
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_filter_ranges(self):
+        cheap, dear, far = self.places
+        self.assertEqual(self.storage.filter(
+            Place, price_by_night=(None, 100), max_guest=(4, None)),
+            [cheap.id])
+        self.assertEqual(sorted(self.storage.filter(
+            Place, latitude=(5, 6))), sorted([cheap.id, dear.id]))
+
+    def test_filter_follows_updates_and_deletes(self):
+        cheap, dear, far = self.places
+        dear.price_by_night = 90
+        self.storage.delete(cheap)
+        self.assertEqual(sorted(self.storage.filter(
+            Place, price_by_night=(None, 100))), sorted([dear.id, far.id]))
+
+    def test_filter_without_columns_scans(self):
+        city = City()
+        self.assertEqual(self.storage.filter(City), [city.id])
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageSpatial(unittest.TestCase):
+    """Tests for the Place spatial index."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.accra = self.place(5.6037, -0.1870)
+        self.tema = self.place(5.6698, -0.0166)
+        self.fiji = self.place(-17.7, 179.9)
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    @staticmethod
+    def place(lat, lon):
+        place = Place()
+        place.latitude = lat
+        place.longitude = lon
+        return place
+
+    def test_nearby_sorted_by_distance(self):
+        found = self.storage.nearby(5.60, -0.18, 30)
+        self.assertEqual([place_id for place_id, _ in found],
+                         [self.accra.id, self.tema.id])
+        self.assertLess(found[0][1], found[1][1])
+        self.assertEqual(self.storage.nearby(5.60, -0.18, 5)[0][0],
+                         self.accra.id)
+
+    def test_nearby_across_antimeridian(self):
+        found = self.storage.nearby(-17.7, -179.9, 50)
+        self.assertEqual([place_id for place_id, _ in found], [self.fiji.id])
+
+    def test_within_follows_moves(self):
+        self.assertEqual(sorted(self.storage.within(5, -1, 6, 0)),
+                         sorted([self.accra.id, self.tema.id]))
+        self.tema.longitude = 1.5
+        self.assertEqual(self.storage.within(5, -1, 6, 0), [self.accra.id])
+        self.assertEqual(self.storage.within(-20, 170, -10, -170),
+                         [self.fiji.id])
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageDirtyTracking(unittest.TestCase):
+    """Tests for re-encoding only the objects changed since the last save."""
+
+    def setUp(self):
+        self.file_path = "dirty_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.city = City()
+        self.state = State()
+        self.storage.save()
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_only_changed_objects_are_encoded(self):
+        self.city.name = "Kumasi"
+        with mock.patch.object(State, "to_dict") as state_to_dict:
+            self.storage.save()
+        state_to_dict.assert_not_called()
+        with open(self.file_path, "r") as file:
+            content = json.load(file)
+        self.assertEqual(content["City." + self.city.id]["name"], "Kumasi")
+        self.assertIn("State." + self.state.id, content)
+
+    def test_snapshot_matches_full_dump(self):
+        self.state.name = "Ashanti"
+        self.state.save()
+        with open(self.file_path, "r") as file:
+            written = file.read()
+        expected = {key: obj.to_dict()
+                    for key, obj in self.storage.all().items()}
+        self.assertEqual(written, json.dumps(expected, indent=4))
+
+    def test_deleted_objects_leave_the_snapshot(self):
+        self.storage.delete(self.state)
+        self.storage.save()
+        with open(self.file_path, "r") as file:
+            self.assertNotIn("State." + self.state.id, json.load(file))
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageSharding(unittest.TestCase):
+    """Tests for the sharded on-disk layout."""
+
+    def setUp(self):
+        self.file_path = "shard_file.json"
+        self.directory = self.file_path + ".d"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.city = City()
+        self.state = State()
+        self.storage.save()
+
+    def tearDown(self):
+        self.storage.disable_sharding()
+        self.storage.reload(lazy=False)
+        FileStorage._FileStorage__objects = {}
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def shard_mtimes(self):
+        return {name: os.stat(os.path.join(self.directory, name)).st_mtime_ns
+                for name in os.listdir(self.directory)}
+
+    def test_one_file_per_class(self):
+        self.storage.enable_sharding()
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["City.json", "State.json"])
+
+    def test_only_touched_shard_is_rewritten(self):
+        self.storage.enable_sharding()
+        before = self.shard_mtimes()
+        self.city.name = "Tamale"
+        self.city.save()
+        after = self.shard_mtimes()
+        self.assertEqual(before["State.json"], after["State.json"])
+        self.assertNotEqual(before["City.json"], after["City.json"])
+
+    def test_buckets_and_reload(self):
+        self.storage.enable_sharding(buckets=3)
+        self.assertEqual(len(os.listdir(self.directory)), 6)
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.get(City, self.city.id).to_dict(),
+                         self.city.to_dict())
+        self.assertEqual(self.storage.count(), 2)
+
+    def test_lazy_reload_reads_only_needed_classes(self):
+        self.storage.enable_sharding()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload(lazy=True)
+        self.assertEqual(sorted(self.storage._FileStorage__unread),
+                         ["City", "State"])
+        self.assertEqual(len(self.storage.all(City)), 1)
+        self.assertNotIn("City", self.storage._FileStorage__unread)
+        self.assertIn("State", self.storage._FileStorage__unread)
+        BaseModel().save()
+        self.assertIn("State", self.storage._FileStorage__unread)
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload(lazy=False)
+        self.assertEqual(self.storage.count(), 3)
+
+    def test_disable_sharding_restores_single_file(self):
+        self.storage.enable_sharding(buckets=2)
+        self.storage.disable_sharding()
+        self.assertFalse(os.path.exists(self.directory))
+        with open(self.file_path, "r") as file:
+            self.assertEqual(len(json.load(file)), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageMappedRecords(unittest.TestCase):
+    """Tests for the memory-mapped records format."""
+
+    def setUp(self):
+        self.file_path = "records_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.city = City()
+        self.city.name = "Kumasi"
+        self.state = State()
+        self.storage.migrate("records")
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload(lazy=True)
+
+    def tearDown(self):
+        self.storage.reload(lazy=False)
+        self.storage.set_format(None)
+        FileStorage._FileStorage__disk_format = "json"
+        FileStorage._FileStorage__objects = {}
+        for path in (self.file_path, self.file_path + ".idx"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def raw(self, class_name):
+        return self.storage._FileStorage__raw[class_name]
+
+    def test_reload_maps_the_file(self):
+        self.assertEqual(type(self.raw("City")).__name__, "MappedRecords")
+        self.assertEqual(self.storage._FileStorage__objects, {})
+        self.assertEqual(self.storage.count(), 2)
+        self.assertEqual(self.raw("City").loaded, {})
+
+    def test_get_decodes_one_record(self):
+        city = self.storage.get(City, self.city.id)
+        self.assertEqual(city.to_dict(), self.city.to_dict())
+        self.assertEqual(len(self.raw("State")), 1)
+
+    def test_missing_or_stale_index(self):
+        os.remove(self.file_path + ".idx")
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.get(City, self.city.id).name, "Kumasi")
+        with open(self.file_path + ".idx", "w") as file:
+            json.dump({"file": [0, 0, 0], "classes": {}}, file)
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.count(City), 1)
+
+    def test_save_keeps_mapped_records(self):
+        city = self.storage.get(City, self.city.id)
+        city.name = "Tamale"
+        city.save()
+        self.assertEqual(self.storage.count(State), 1)
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.get(City, self.city.id).name, "Tamale")
+        self.assertIsNotNone(self.storage.get(State, self.state.id))
+
+    def test_log_replays_over_mapped_records(self):
+        self.storage.enable_journal()
+        try:
+            self.storage.get(State, self.state.id).save()
+            self.storage.delete(self.storage.get(City, self.city.id))
+            self.storage.save()
+            FileStorage._FileStorage__objects = {}
+            self.storage.reload()
+            self.assertIsNone(self.storage.get(City, self.city.id))
+            self.assertEqual(self.storage.count(), 1)
+        finally:
+            self.storage.disable_journal()
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageAtomicSave(unittest.TestCase):
+    """Tests for the temp file, fsync and rename saves."""
+
+    def setUp(self):
+        self.file_path = "atomic_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.city = City()
+        self.storage.save()
+        with open(self.file_path, "rb") as file:
+            self.saved = file.read()
+
+    def tearDown(self):
+        self.storage.enable_fsync()
+        self.storage.disable_sharding()
+        FileStorage._FileStorage__objects = {}
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_failed_write_keeps_previous_file(self):
+        State()
+        with mock.patch("os.fsync", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.storage.save()
+        with open(self.file_path, "rb") as file:
+            self.assertEqual(file.read(), self.saved)
+        self.assertEqual([name for name in os.listdir(".")
+                          if name.startswith(self.file_path + ".")], [])
+
+    def test_fsync_can_be_disabled(self):
+        with mock.patch("os.fsync") as fsync:
+            self.storage.save()
+            self.assertGreaterEqual(fsync.call_count, 1)
+            fsync.reset_mock()
+            self.storage.disable_fsync()
+            self.storage.save()
+            fsync.assert_not_called()
+
+    def test_shards_are_replaced_together(self):
+        self.storage.enable_sharding(2)
+        directory = self.file_path + ".d"
+        before = {name: os.stat(os.path.join(directory, name)).st_ino
+                  for name in os.listdir(directory)}
+        State()
+        with mock.patch("os.fsync", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.storage.save()
+        self.assertEqual({name: os.stat(os.path.join(directory, name)).st_ino
+                          for name in os.listdir(directory)}, before)
+
+
+def _increment(file_path, counter_id, times):
+    """Adds times to a shared counter and creates as many cities, from a
+    process of its own."""
+    FileStorage._FileStorage__file_path = file_path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage()
+    storage.disable_fsync()
+    storage.reload()
+    # Held across the merges of the retries, which reset it in place
+    counter = storage.get(BaseModel, counter_id)
+    for i in range(times):
+        City()
+        while True:
+            counter.hits += 1
+            try:
+                counter.save()
+                break
+            except ConflictError:
+                pass
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageConcurrency(unittest.TestCase):
+    """Tests for processes sharing a store."""
+
+    def setUp(self):
+        self.file_path = "concurrent_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.storage.disable_fsync()
+        self.context = multiprocessing.get_context("fork")
+
+    def tearDown(self):
+        self.storage.enable_fsync()
+        FileStorage._FileStorage__objects = {}
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def run_process(self, target, *args):
+        process = self.context.Process(target=target, args=args)
+        process.start()
+        return process
+
+    def test_conflicting_save_keeps_other_version(self):
+        city = City()
+        city.name = "first"
+        self.storage.save()
+
+        def rename():
+            city.name = "other"
+            self.storage.save()
+        self.run_process(rename).join()
+        city.name = "this"
+        state = State()
+        with self.assertRaises(ConflictError) as error:
+            self.storage.save()
+        self.assertEqual(error.exception.keys, ["City." + city.id])
+        self.assertEqual(city.name, "other")
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.get(City, city.id).name, "other")
+        self.assertIsNotNone(self.storage.get(State, state.id))
+
+    def saved_place(self, place_id):
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        return self.storage.get(Place, place_id)
+
+    def test_held_instance_is_saved_after_merge(self):
+        place = Place()
+        place.save()
+
+        def other():
+            State().save()
+        self.run_process(other).join()
+        State().save()
+        self.assertIs(self.storage.get(Place, place.id), place)
+        place.name = "local change"
+        self.storage.save()
+        self.assertEqual(self.saved_place(place.id).name, "local change")
+
+    def test_held_instance_sees_merged_changes(self):
+        place = Place()
+        place.name = "a"
+        place.save()
+
+        def rename():
+            place.name = "b"
+            place.save()
+        self.run_process(rename).join()
+        State().save()
+        self.assertEqual(place.name, "b")
+        place.max_guest = 4
+        place.save()
+        saved = self.saved_place(place.id)
+        self.assertEqual((saved.name, saved.max_guest), ("b", 4))
+
+    def test_instance_deleted_elsewhere_is_detached(self):
+        place = Place()
+        place.save()
+
+        def remove():
+            self.storage.delete(place)
+            self.storage.save()
+        self.run_process(remove).join()
+        State().save()
+        with self.assertRaises(ConflictError):
+            place.name = "gone"
+        with self.assertRaises(ConflictError):
+            place.save()
+        self.assertIsNone(self.saved_place(place.id))
+
+    def test_saving_a_copy_replaces_the_stored_instance(self):
+        model = BaseModel()
+        model.save()
+        copy = BaseModel(**model.to_dict())
+        copy.name = "copy"
+        copy.save()
+        self.assertIs(self.storage.get(BaseModel, model.id), copy)
+        model.name = "original"
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.get(BaseModel, model.id).name, "copy")
+
+    def test_concurrent_saves_lose_nothing(self):
+        counter = BaseModel()
+        counter.hits = 0
+        self.storage.save()
+        processes = [self.run_process(_increment, self.file_path,
+                                      counter.id, 10) for _ in range(4)]
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.get(BaseModel, counter.id).hits, 40)
+        self.assertEqual(self.storage.count(City), 40)
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageThreading(unittest.TestCase):
+    """Tests for the thread-safe mode and its writer thread."""
+
+    def setUp(self):
+        self.file_path = "threaded_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.storage.disable_fsync()
+        self.storage.enable_threading()
+
+    def tearDown(self):
+        self.storage.disable_threading()
+        self.storage.enable_fsync()
+        FileStorage._FileStorage__objects = {}
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_threads_lose_nothing(self):
+        def create():
+            for i in range(50):
+                City().save()
+                self.assertIsInstance(self.storage.all(), dict)
+        threads = [threading.Thread(target=create) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.storage.flush()
+        self.storage.disable_threading()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.count(City), 200)
+
+    def test_saves_are_coalesced(self):
+        target = "models.engine.file_storage.write_files"
+        with mock.patch(target, wraps=write_files) as write:
+            with FileStorage._FileStorage__mutex:
+                for i in range(20):
+                    City().save()
+                write.assert_not_called()
+            self.storage.flush()
+            self.assertLessEqual(write.call_count, 2)
+        with open(self.file_path, encoding="utf-8") as file:
+            self.assertEqual(len(json.load(file)), 20)
+
+    def test_changes_do_not_wait_for_writes(self):
+        city = City()
+        city.save()
+        self.storage.flush()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_write(files, fsync=True):
+            started.set()
+            release.wait(10)
+            write_files(files, fsync)
+
+        def change():
+            city.name = "Paris"
+            self.storage.all(City)
+        target = "models.engine.file_storage.write_files"
+        with mock.patch(target, side_effect=slow_write):
+            city.name = "Lyon"
+            city.save()
+            self.assertTrue(started.wait(10))
+            changer = threading.Thread(target=change)
+            changer.start()
+            changer.join(5)
+            waited = changer.is_alive()
+            release.set()
+            changer.join()
+            self.assertFalse(waited)
+            self.storage.flush()
+        with open(self.file_path, encoding="utf-8") as file:
+            self.assertNotIn("Paris", file.read())
+        city.save()
+        self.storage.flush()
+        with open(self.file_path, encoding="utf-8") as file:
+            self.assertIn("Paris", file.read())
+
+    def test_flush_reports_write_errors(self):
+        City().save()
+        self.storage.flush()
+        with mock.patch("os.replace", side_effect=OSError("disk full")):
+            City().save()
+            with self.assertRaises(OSError):
+                self.storage.flush()
+        self.storage.flush()
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageParallelReload(unittest.TestCase):
+    """Tests for reload() decoding the files in worker processes."""
+
+    def setUp(self):
+        self.file_path = "parallel_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.storage.disable_fsync()
+        for i in range(60):
+            place = Place()
+            # Looks like the start of a member of the pretty JSON file
+            place.name = 'loft,\n    "Place.x": {'
+            City()
+        self.expected = {key: obj.to_dict()
+                         for key, obj in self.storage.all().items()}
+        patcher = mock.patch("models.engine.parallel.MIN_PARALLEL_SIZE", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.storage.disable_parallel_reload()
+        self.storage.disable_sharding()
+        self.storage.migrate("json")
+        self.storage.enable_fsync()
+        FileStorage._FileStorage__objects = {}
+        for path in (self.file_path, self.file_path + ".idx"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def reload_in_parallel(self):
+        self.storage.enable_parallel_reload(2)
+        FileStorage._FileStorage__objects = {}
+        with mock.patch("models.engine.file_storage.decode_chunks",
+                        wraps=decode_chunks) as decode:
+            self.storage.reload()
+            self.assertEqual(decode.call_count, 1)
+            self.assertGreater(len(decode.call_args[0][0]), 1)
+        self.assertEqual({key: obj.to_dict()
+                          for key, obj in self.storage.all().items()},
+                         self.expected)
+
+    def test_json_snapshot(self):
+        self.storage.migrate("json")
+        self.reload_in_parallel()
+
+    def test_records_snapshot(self):
+        self.storage.migrate("records")
+        self.reload_in_parallel()
+
+    def test_shards(self):
+        self.storage.enable_sharding(2)
+        self.reload_in_parallel()
+
+    def test_pickle_shards_need_opt_in(self):
+        self.storage.migrate("pickle")
+        self.storage.enable_sharding(2)
+        self.storage.set_format(None)
+        self.storage.enable_parallel_reload(2)
+        FileStorage._FileStorage__objects = {}
+        with self.assertRaisesRegex(ValueError, "pickle"):
+            self.storage.reload()
+        self.storage.set_format("pickle")
+        self.reload_in_parallel()
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageStreamingReload(unittest.TestCase):
+    """Tests for reload() reading the file one record at a time."""
+
+    def setUp(self):
+        self.file_path = "streaming_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        for i in range(2000):
+            Place().description = "x" * 1000
+        self.storage.save()
+        self.size = os.path.getsize(self.file_path)
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+        os.remove(self.file_path)
+
+    def test_peak_memory_stays_near_final_size(self):
+        for lazy in (False, True):
+            with self.subTest(lazy=lazy):
+                FileStorage._FileStorage__objects = {}
+                tracemalloc.start()
+                self.storage.reload(lazy=lazy)
+                final, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.assertLess(peak - final, self.size / 4)
+                self.assertEqual(self.storage.count(Place), 2000)
+        self.storage.reload(lazy=False)
+
+    def test_records_match_whole_decode(self):
+        for name in FORMATS:
+            with self.subTest(format=name):
+                self.storage.migrate(name)
+                with open(self.file_path, "rb") as file:
+                    data = file.read()
+                    file.seek(0)
+                    self.assertEqual(list(FORMATS[name].stream(file)),
+                                     list(FORMATS[name].decode(data).items()))
+        self.storage.migrate("json")
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageQuery(unittest.TestCase):
+    """Tests for query() and its chained conditions, order and pages."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.places = []
+        for i in range(100):
+            place = Place()
+            place.price_by_night = (i * 37) % 100
+            place.city_id = "city{}".format(i % 4)
+            self.places.append(place)
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_where_order_limit_offset(self):
+        expected = sorted((place for place in self.places
+                           if place.price_by_night < 60),
+                          key=lambda place: place.price_by_night)[40:50]
+        query = (self.storage.query(Place)
+                 .where(price_by_night__lt=60)
+                 .order_by("price_by_night").limit(10).offset(40))
+        self.assertEqual(query.all(), expected)
+
+    def test_descending_order_and_lookups(self):
+        query = self.storage.query("Place").where(
+            city_id="city1", price_by_night__gte=50)
+        prices = [place.price_by_night
+                  for place in query.order_by("-price_by_night")]
+        self.assertEqual(prices, sorted(
+            (place.price_by_night for place in self.places
+             if place.city_id == "city1" and place.price_by_night >= 50),
+            reverse=True))
+        self.assertEqual(self.storage.query(Place).where(
+            city_id__in=("city0", "city3")).count(), 50)
+        self.assertEqual(self.storage.query(Place).where(
+            city_id__ne="city0", price_by_night=37).count(), 1)
+
+    def test_queries_are_lazy_and_reusable(self):
+        query = self.storage.query(Place).where(price_by_night__gt=90)
+        place = Place()
+        place.price_by_night = 95
+        self.assertIn(place, query.all())
+        self.assertEqual(query.limit(2).count(), 2)
+        self.assertIsNone(query.limit(0).first())
+        self.assertEqual(query.order_by("price_by_night").first()
+                         .price_by_night, 91)
+
+    def test_indexes_answer_conditions(self):
+        target = "models.engine.file_storage.VECTORIZED"
+        with mock.patch.object(FileStorage, "all",
+                               side_effect=AssertionError("scanned")):
+            self.assertEqual(self.storage.query(Place).where(
+                city_id="city2").count(), 25)
+            with mock.patch(target, True):
+                self.assertEqual(self.storage.query(Place).where(
+                    price_by_night__gte=10, price_by_night__lt=20).count(),
+                    10)
+
+    def test_ranges_are_scanned_without_numpy(self):
+        target = "models.engine.file_storage.VECTORIZED"
+        with mock.patch(target, False), \
+                mock.patch.object(FileStorage, "filter",
+                                  side_effect=AssertionError("filtered")):
+            self.assertEqual(self.storage.query(Place).where(
+                price_by_night__gte=10, price_by_night__lt=20).count(), 10)
+
+    def test_unknown_lookup(self):
+        with self.assertRaises(ValueError):
+            self.storage.query(Place).where(price_by_night__near=1)
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageSearch(unittest.TestCase):
+    """Tests for search() and the text indexes."""
+
+    def setUp(self):
+        self.file_path = "search_file.json"
+        FileStorage._FileStorage__file_path = self.file_path
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.storage.disable_fsync()
+        self.places = []
+        for description in ("cozy loft near the river", "big loft downtown",
+                            "quiet cabin, cozy and warm"):
+            place = Place()
+            place.description = description
+            self.places.append(place)
+
+    def tearDown(self):
+        self.storage.enable_fsync()
+        FileStorage._FileStorage__objects = {}
+        for path in (self.file_path, self.file_path + ".Place.search"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def ids(self, text, limit=None):
+        return [obj_id for obj_id, _
+                in self.storage.search(Place, text, limit)]
+
+    def test_ranking(self):
+        loft, downtown, cabin = self.places
+        self.assertEqual(self.ids("Cozy LOFT"),
+                         [loft.id, downtown.id, cabin.id])
+        self.assertEqual(self.ids("loft", 1), [downtown.id])
+        self.assertEqual(self.ids("the"), [])
+        with self.assertRaises(KeyError):
+            self.storage.search(City, "loft")
+
+    def test_follows_changes(self):
+        loft, downtown, cabin = self.places
+        self.assertEqual(self.ids("cabin"), [cabin.id])
+        cabin.description = "small flat"
+        downtown.name = "Downtown cabin"
+        self.storage.delete(loft)
+        place = Place()
+        place.description = "log cabin"
+        self.assertEqual(sorted(self.ids("cabin")),
+                         sorted([downtown.id, place.id]))
+        self.assertEqual(self.ids("cozy"), [])
+
+    def test_saved_index_is_reused(self):
+        loft, downtown, cabin = self.places
+        self.ids("loft")
+        self.storage.compact()
+        self.assertTrue(os.path.exists(self.file_path + ".Place.search"))
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        changed = self.storage.get(Place, cabin.id)
+        changed.__dict__["description"] = "loft with a view"
+        with mock.patch("models.engine.search.tokenize",
+                        wraps=models.engine.search.tokenize) as tokenize:
+            self.assertEqual(sorted(self.ids("loft")),
+                             sorted([loft.id, downtown.id, cabin.id]))
+        # The changed place and the search terms only
+        self.assertEqual(tokenize.call_count, 2)
+
+    def test_saves_do_not_write_the_index(self):
+        loft, downtown, cabin = self.places
+        self.ids("loft")
+        self.storage.compact()
+        path = self.file_path + ".Place.search"
+        os.remove(path)
+        with mock.patch.object(FileStorage,
+                               "_FileStorage__text_limit", 3):
+            with mock.patch.object(TextIndex, "dump", autospec=True,
+                                   side_effect=TextIndex.dump) as dump:
+                loft.name = "Loft"
+                loft.save()
+                self.assertFalse(os.path.exists(path))
+                dump.assert_not_called()
+                # Each rename removes and adds a document: 4 changes
+                downtown.name = "Downtown"
+                downtown.save()
+                self.assertEqual(dump.call_count, 1)
+                cabin.name = "Cabin"
+                cabin.save()
+                self.storage.compact()
+                self.assertEqual(dump.call_count, 2)
+        self.assertTrue(os.path.exists(path))
+
+
+@unittest.skipIf(models.storage_t == "db", "not testing file storage")
+class TestFileStorageAggregates(unittest.TestCase):
+    """Tests for aggregate() and its materialized aggregates."""
+
+    def setUp(self):
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage()
+        self.places = []
+        for i in range(9):
+            place = Place()
+            place.price_by_night = i * 10
+            place.city_id = "city{}".format(i % 3)
+            self.places.append(place)
+
+    def tearDown(self):
+        FileStorage._FileStorage__objects = {}
+
+    def test_functions(self):
+        aggregate = self.storage.aggregate
+        self.assertEqual(aggregate(Place, "count"), 9)
+        self.assertEqual(aggregate(Place, "sum", "price_by_night"), 360)
+        self.assertEqual(aggregate("Place", "avg", "price_by_night"), 40)
+        self.assertEqual(aggregate(Place, "min", "price_by_night"), 0)
+        self.assertEqual(aggregate(Place, "max", "price_by_night"), 80)
+        self.assertEqual(aggregate(Place, "avg", "price_by_night",
+                                   by="city_id"),
+                         {"city0": 30, "city1": 40, "city2": 50})
+        self.assertEqual(aggregate(State, "count"), 0)
+        self.assertIsNone(aggregate(State, "max", "name"))
+        with self.assertRaises(ValueError):
+            aggregate(Place, "median", "price_by_night")
+        with self.assertRaises(ValueError):
+            aggregate(Place, "avg")
+
+    def test_follows_changes(self):
+        aggregate = self.storage.aggregate
+        by_city = ("max", "price_by_night")
+        self.assertEqual(aggregate(Place, *by_city, by="city_id"),
+                         {"city0": 60, "city1": 70, "city2": 80})
+        self.places[8].price_by_night = 5
+        self.places[0].city_id = "city3"
+        self.places[0].price_by_night = "free"
+        self.storage.delete(self.places[7])
+        self.assertEqual(aggregate(Place, *by_city, by="city_id"),
+                         {"city0": 60, "city1": 40, "city2": 50,
+                          "city3": None})
+        self.assertEqual(aggregate(Place, "count", by="city_id"),
+                         {"city0": 2, "city1": 2, "city2": 3, "city3": 1})
+
+    def test_sum_survives_transient_values(self):
+        aggregate = self.storage.aggregate
+        FileStorage._FileStorage__objects = {}
+        first, second = Place(), Place()
+        first.price_by_night = 0.1
+        self.assertEqual(aggregate(Place, "sum", "price_by_night"), 0.1)
+        second.price_by_night = 1e17
+        second.price_by_night = 0
+        self.assertEqual(aggregate(Place, "sum", "price_by_night"), 0.1)
+        self.assertEqual(aggregate(Place, "avg", "price_by_night"), 0.05)
+
+    def test_repeated_calls_do_not_scan(self):
+        self.storage.aggregate(Place, "sum", "price_by_night", by="city_id")
+        with mock.patch.object(Place, "__getattribute__",
+                               side_effect=AssertionError("scanned")):
+            self.assertEqual(self.storage.aggregate(
+                Place, "avg", "price_by_night", by="city_id"),
+                {"city0": 30, "city1": 40, "city2": 50})
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+
+"""
+This module contains unit tests for the relationship accessors of the
+models: state.cities, city.places, place.reviews and place.amenities.
+"""
+
+import os
+import unittest
+
+import models
+from models.amenity import Amenity
+from models.city import City
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.review import Review
+from models.state import State
+
+
+class TestRelationships(unittest.TestCase):
+    """
+    Unit tests for the accessors, on the storage engine in use.
+    """
+
+    def setUp(self):
+        """
+        Builds a state with two cities, a place with a review and two
+        amenities, and unrelated objects of each class.
+        """
+        if models.storage_t != "db":
+            FileStorage._FileStorage__file_path = "relationships.json"
+            FileStorage._FileStorage__objects = {}
+        self.state, self.other_state = State(), State()
+        self.city, self.empty_city = City(), City()
+        self.city.state_id = self.state.id
+        self.empty_city.state_id = self.state.id
+        self.place, self.other_place = Place(), Place()
+        self.place.city_id = self.city.id
+        self.review, self.other_review = Review(), Review()
+        self.review.place_id = self.place.id
+        self.other_review.place_id = self.other_place.id
+        self.wifi, self.pool = Amenity(), Amenity()
+        self.place.amenity_ids = [self.pool.id, "deleted", self.wifi.id]
+        self.created = [self.state, self.other_state, self.city,
+                        self.empty_city, self.place, self.other_place,
+                        self.review, self.other_review, self.wifi, self.pool]
+
+    def tearDown(self):
+        """
+        Removes the objects created by the test.
+        """
+        for obj in self.created:
+            models.storage.delete(obj)
+        if models.storage_t != "db":
+            FileStorage._FileStorage__objects = {}
+            if os.path.exists("relationships.json"):
+                os.remove("relationships.json")
+
+    def test_state_cities(self):
+        """
+        Test that a state lists the cities pointing at it.
+        """
+        self.assertCountEqual([city.id for city in self.state.cities],
+                              [self.city.id, self.empty_city.id])
+        self.assertEqual(self.other_state.cities, [])
+
+    def test_city_places_and_place_reviews(self):
+        """
+        Test the cities -> places -> reviews chain.
+        """
+        self.assertEqual([place.id for place in self.city.places],
+                         [self.place.id])
+        self.assertEqual(self.empty_city.places, [])
+        self.assertEqual([review.id for review in self.place.reviews],
+                         [self.review.id])
+        reviews = [review.id for city in self.state.cities
+                   for place in city.places for review in place.reviews]
+        self.assertEqual(reviews, [self.review.id])
+
+    def test_place_amenities(self):
+        """
+        Test that amenities follow amenity_ids, skipping missing ones.
+        """
+        self.assertEqual([amenity.id for amenity in self.place.amenities],
+                         [self.pool.id, self.wifi.id])
+        self.assertEqual(self.other_place.amenities, [])
+
+    def test_accessors_follow_updates(self):
+        """
+        Test that moving or deleting an object updates the accessors.
+        """
+        self.place.city_id = self.empty_city.id
+        self.assertEqual(self.city.places, [])
+        self.assertEqual([place.id for place in self.empty_city.places],
+                         [self.place.id])
+        models.storage.delete(self.review)
+        self.assertEqual(self.place.reviews, [])
+
+    def test_accessors_are_not_stored(self):
+        """
+        Test that the accessors stay out of to_dict().
+        """
+        for name in ("cities", "places", "reviews", "amenities"):
+            self.assertNotIn(name, self.state.to_dict())
+            self.assertNotIn(name, self.place.to_dict())
+
+    @unittest.skipIf(models.storage_t == "db", "not testing file storage")
+    def test_compact_instances(self):
+        """
+        Test that compact instances have the accessors too.
+        """
+        models.storage.save()
+        models.storage.enable_compact()
+        try:
+            FileStorage._FileStorage__objects = {}
+            models.storage.reload()
+            state = models.storage.get(State, self.state.id)
+            self.assertNotIsInstance(state, State)
+            self.assertEqual(len(state.cities), 2)
+            place = models.storage.get(Place, self.place.id)
+            self.assertEqual(len(place.amenities), 2)
+        finally:
+            models.storage.disable_compact()
+
+
+if __name__ == "__main__":
+    unittest.main()